@@ -0,0 +1,103 @@
+# ● async_search.py — asyncio-API поиска: выделенный пул потоков + пул соединений MySQL
+
+import os
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql_connector
+from mysql_connector import with_connection, search_films_matching, PAGE_SIZE, POOL_MAX_SIZE
+from log_writer import log_search, log_error
+
+ASYNC_WORKERS = int(os.getenv("ASYNC_WORKERS", str(POOL_MAX_SIZE)))     # потоков для запросов к MySQL
+
+# блокирующий драйвер не должен занимать поток цикла событий — запросы идут в отдельный пул потоков,
+# каждый на своём соединении из пула mysql_connector
+_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="async-mysql")
+
+EVERYWHERE_FIELDS = ("keyword", "description", "actor")     # название, описание, имя актёра
+
+
+async def run_query(func, *args, **kwargs):
+    """
+    Выполняет функцию поиска mysql_connector в выделенном пуле потоков на соединении из пула.
+        :param func: функция вида func(connection, *args, **kwargs)
+        :return: результат функции или None, если соединение получить не удалось
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(with_connection, func, *args, **kwargs))
+
+
+def _make_async(func):
+    """ Создаёт асинхронную версию функции mysql_connector (без параметра connection). """
+    async def wrapper(*args, **kwargs):
+        return await run_query(func, *args, **kwargs)
+    wrapper.__name__ = func.__name__
+    wrapper.__qualname__ = func.__name__
+    wrapper.__doc__ = (f"Асинхронная версия mysql_connector.{func.__name__}: те же параметры "
+                       f"без connection (соединение берётся из пула).")
+    return wrapper
+
+
+search_films_by_keyword = _make_async(mysql_connector.search_films_by_keyword)
+search_films_by_genre_and_years = _make_async(mysql_connector.search_films_by_genre_and_years)
+get_all_genres = _make_async(mysql_connector.get_all_genres)
+get_release_year_range = _make_async(mysql_connector.get_release_year_range)
+search_films_by_actor = _make_async(mysql_connector.search_films_by_actor)
+get_film_count_by_year = _make_async(mysql_connector.get_film_count_by_year)
+search_films_by_description = _make_async(mysql_connector.search_films_by_description)
+search_films_by_keyword_page = _make_async(mysql_connector.search_films_by_keyword_page)
+search_films_by_genre_and_years_page = _make_async(mysql_connector.search_films_by_genre_and_years_page)
+search_films_by_actor_page = _make_async(mysql_connector.search_films_by_actor_page)
+search_films_by_description_page = _make_async(mysql_connector.search_films_by_description_page)
+search_films_filtered_page = _make_async(mysql_connector.search_films_filtered_page)
+
+
+async def log_search_async(query_type, parameters, result_count, duration_ms=None):
+    """
+    Асинхронная запись поискового запроса в журнал (не блокирует цикл событий,
+    даже если очередь логов настроена на режим "block").
+        :return: None
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, log_search, query_type, parameters, result_count, duration_ms)
+
+
+async def search_everywhere(term, limit=PAGE_SIZE):
+    """
+    Ищет термин одновременно в названии, описании и именах актёров.
+    Три запроса выполняются параллельно, поэтому задержка определяется самым медленным из них.
+    Результаты объединяются по film_id без дублей. В журнал записывается число фильмов
+    в объединённом результате — то, что увидел пользователь (фильм, найденный по нескольким
+    полям, учитывается один раз).
+        :param term: искомая строка
+        :param limit: максимальное количество фильмов в каждом из запросов и в итоге
+        :return: список словарей {film_id, title, release_year, matched_by: [поля]},
+                 упорядоченный по (title, film_id), или None, если все три запроса завершились ошибкой
+    """
+    term = term.strip()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_query(search_films_matching, field, term, limit)
+                                     for field in EVERYWHERE_FIELDS))
+    if all(rows is None for rows in results):
+        log_error("search_everywhere", "Все запросы объединённого поиска = None")
+        return None
+
+    merged = {}
+    for field, rows in zip(EVERYWHERE_FIELDS, results):
+        for film_id, title, release_year in rows or ():         # поле с ошибкой пропускается
+            film = merged.setdefault(film_id, {"film_id": film_id, "title": title,
+                                               "release_year": release_year, "matched_by": []})
+            film["matched_by"].append(field)
+    films = sorted(merged.values(), key=lambda f: (f["title"].lower(), f["film_id"]))[:limit]
+    await log_search_async("everywhere", {"term": term}, len(films), (time.perf_counter() - started) * 1000)
+    return films
+
+
+def close_async_executor():
+    """
+    Останавливает пул потоков асинхронного API (дожидается выполняющихся запросов).
+        :return: None
+    """
+    _executor.shutdown(wait=True)
@@ -0,0 +1,286 @@
+# ● batch.py — неинтерактивный пакетный режим: запросы из JSONL, параллельное выполнение, вывод JSONL/CSV
+
+import sys
+import csv
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from mysql_connector import (
+    init_pool,
+    close_pool,
+    with_connection,
+    search_films_by_keyword_page,
+    search_films_by_genre_and_years_page,
+    search_films_by_actor_page,
+    search_films_by_description_page,
+    search_films_filtered_page,
+    normalize_film_filters,
+    FILM_FILTERS,
+    FILTERED_COLUMNS )
+from log_writer import log_search, log_error, flush_logs
+
+# тип запроса -> (функция поиска, параметры в порядке аргументов, названия столбцов результата);
+# у "filters" параметры — необязательные фильтры FILM_FILTERS, функция получает их одним словарём
+QUERY_TYPES = {
+    "keyword": (search_films_by_keyword_page, ("keyword",),
+                ("film_id", "title", "release_year", "rating", "length")),
+    "genre_year": (search_films_by_genre_and_years_page, ("genre", "year_start", "year_end"),
+                   ("film_id", "title", "release_year", "genre")),
+    "actor": (search_films_by_actor_page, ("actor_name",),
+              ("title", "release_year", "actor")),
+    "description": (search_films_by_description_page, ("keyword",),
+                    ("title", "release_year", "description")),
+    "filters": (search_films_filtered_page, FILM_FILTERS, FILTERED_COLUMNS),
+}
+
+CSV_FIELDS = ["index", "query_type", "parameters", "total", "error",
+              "film_id", "title", "release_year", "rating", "length", "genre", "actor", "description"]
+
+# параметры-строки: функции поиска вызывают у них .strip()/.lower(), число на их месте — ошибка запроса
+TEXT_PARAMETERS = {"keyword", "genre", "actor_name", "title", "actor", "description", "rating"}
+
+DEFAULT_LIMIT = 10      # строк на запрос по умолчанию (одна страница)
+MAX_PAGE_SIZE = 100
+
+
+def parse_spec(line):
+    """
+    Разбирает строку JSONL с описанием запроса.
+    Формат: {"type": "keyword", "keyword": "ace", "limit": 10}; параметры — как в log_search:
+        keyword: keyword; genre_year: genre, year_start, year_end; actor: actor_name; description: keyword;
+        filters: любое сочетание FILM_FILTERS (title, genre, year_start, ..., length_max), хотя бы один.
+    limit — сколько строк вернуть (0 — все).
+        :param line: строка JSON
+        :return: кортеж (тип запроса, словарь параметров, limit)
+        :raises ValueError: если описание некорректно
+    """
+    spec = json.loads(line)
+    if not isinstance(spec, dict):
+        raise ValueError("описание запроса должно быть объектом JSON")
+    query_type = spec.get("type")
+    if query_type not in QUERY_TYPES:
+        raise ValueError(f"неизвестный тип запроса: {query_type!r}")
+    names = QUERY_TYPES[query_type][1]
+    wrong = [name for name in names
+             if name in TEXT_PARAMETERS and spec.get(name) is not None and not isinstance(spec[name], str)]
+    if wrong:
+        raise ValueError(f"параметры должны быть строками: {', '.join(wrong)}")
+    if query_type == "filters":
+        parameters = normalize_film_filters({name: spec[name] for name in names if name in spec})
+        return query_type, parameters, _parse_limit(spec)
+    missing = [name for name in names if spec.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"не заданы параметры: {', '.join(missing)}")
+    parameters = {name: spec[name] for name in names}
+    if query_type == "genre_year":
+        parameters["year_start"] = int(parameters["year_start"])
+        parameters["year_end"] = int(parameters["year_end"])
+    return query_type, parameters, _parse_limit(spec)
+
+
+def _parse_limit(spec):
+    """ limit из описания запроса (по умолчанию DEFAULT_LIMIT, 0 — все строки). """
+    limit = int(spec.get("limit", DEFAULT_LIMIT))
+    if limit < 0:
+        raise ValueError("limit не может быть отрицательным")
+    return limit
+
+
+def run_query(index, line):
+    """
+    Выполняет один запрос пакета (постранично через keyset-пагинацию). Первая страница
+    (с общим числом совпадений) читается сразу, в потоке пула; следующие — по мере того,
+    как writer читает result["rows"], поэтому строки не копятся в памяти даже при limit = 0.
+    Запрос записывается в лог, когда строки прочитаны до конца.
+        :param index: порядковый номер запроса во входных данных
+        :param line: строка JSONL с описанием запроса
+        :return: словарь результата: index, query_type, parameters, total, rows (итератор словарей),
+                 error, row_count и duration_ms (последние три окончательны после чтения rows)
+    """
+    started = time.perf_counter()
+    result = {"index": index, "query_type": None, "parameters": None, "total": None,
+              "rows": iter(()), "row_count": 0, "error": None}
+    try:
+        query_type, parameters, limit = parse_spec(line)
+    except (ValueError, TypeError) as e:
+        log_error("batch", f"Запрос #{index}: {e}")
+        result["error"] = str(e)
+        result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    search_func, names, columns = QUERY_TYPES[query_type]
+    args = [parameters] if query_type == "filters" else [parameters[name] for name in names]
+    result.update(query_type=query_type, parameters=parameters)
+    page_size = MAX_PAGE_SIZE if limit == 0 else min(limit, MAX_PAGE_SIZE)
+    page = _fetch_page(result, search_func, args, None, page_size, with_total=True)
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    if page is None:
+        return result
+    result["total"] = page[2]
+    result["rows"] = _stream_rows(result, search_func, args, page, page_size, limit, columns)
+    return result
+
+
+def _fetch_page(result, search_func, args, page_token, page_size, with_total=False):
+    """
+    Читает одну страницу запроса. Ошибка (в том числе исключение функции поиска) записывается
+    в result["error"] и не прерывает остальные запросы пакета.
+        :return: страница (rows, next_page_token[, total]) или None в случае ошибки
+    """
+    try:
+        page = with_connection(search_func, *args, page_token, page_size, with_total=with_total)
+    except Exception as e:
+        log_error("batch", f"Запрос #{result['index']} ({result['query_type']}): {e!r}")
+        result["error"] = f"ошибка выполнения запроса: {e}"
+        return None
+    if page is None:
+        log_error("batch", f"Запрос #{result['index']} ({result['query_type']}) = None")
+        result["error"] = "ошибка выполнения запроса"
+    return page
+
+
+def _stream_rows(result, search_func, args, page, page_size, limit, columns):
+    """
+    Отдаёт строки результата, дочитывая следующие страницы по мере чтения.
+    Страницы со второй читаются последовательно в потоке, который пишет результат (а не в пуле
+    run_batch), поэтому при limit = 0 или limit больше страницы параллельна только первая страница
+    каждого запроса, а длинные выдачи читаются по одной.
+    В duration_ms учитывается только время запросов страниц, а не запись результата.
+        :return: генератор словарей строк (столбцы — columns)
+    """
+    duration_ms = result["duration_ms"]
+    while True:
+        rows, page_token = page[0], page[1]
+        if limit:
+            rows = rows[:limit - result["row_count"]]
+        result["row_count"] += len(rows)
+        yield from (dict(zip(columns, row)) for row in rows)
+        if page_token is None or (limit and result["row_count"] >= limit):
+            break
+        started = time.perf_counter()
+        page = _fetch_page(result, search_func, args, page_token, page_size)
+        duration_ms += (time.perf_counter() - started) * 1000
+        if page is None:
+            break
+    result["duration_ms"] = round(duration_ms, 3)
+    if result["error"] is None:
+        log_search(result["query_type"], result["parameters"], result["total"], result["duration_ms"])
+
+
+def run_batch(lines, workers=4, ordered=True):
+    """
+    Выполняет запросы параллельно пулом из workers потоков. В работе одновременно не больше
+    workers * 4 запросов, поэтому память не зависит от размера входных данных.
+        :param lines: итерируемое строк JSONL (пустые строки пропускаются)
+        :param workers: число потоков
+        :param ordered: True — результаты в порядке входных данных, False — по мере готовности
+        :return: генератор словарей результата (см. run_query)
+    """
+    window = max(1, workers * 4)
+    specs = ((i, line) for i, line in enumerate(lines) if line.strip())
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+        pending = deque()
+        for index, line in specs:
+            pending.append(executor.submit(run_query, index, line))
+            while len(pending) >= window:
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        yield future.result()
+        while pending:
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+
+
+def write_jsonl(results, out):
+    """
+    Пишет результаты построчно в JSONL (один объект на запрос). Строки запроса пишутся
+    по мере чтения, поэтому error и duration_ms идут в объекте после rows.
+    """
+    for result in results:
+        head = {key: result[key] for key in ("index", "query_type", "parameters", "total")}
+        out.write(json.dumps(head, ensure_ascii=False, default=str)[:-1] + ', "rows": [')
+        for i, row in enumerate(result["rows"]):
+            out.write((", " if i else "") + json.dumps(row, ensure_ascii=False, default=str))
+        tail = {key: result[key] for key in ("error", "duration_ms")}
+        out.write("], " + json.dumps(tail, ensure_ascii=False, default=str)[1:] + "\n")
+        yield result
+
+
+def write_csv(results, out):
+    """
+    Пишет результаты в CSV (одна строка на найденный фильм; запрос без строк — одна строка;
+    ошибка при чтении следующих страниц — дополнительная строка с error).
+    """
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for result in results:
+        base = {
+            "index": result["index"],
+            "query_type": result["query_type"],
+            "parameters": json.dumps(result["parameters"], ensure_ascii=False),
+            "total": result["total"],
+        }
+        for row in result["rows"]:
+            writer.writerow({**base, **row})
+        if not result["row_count"] or result["error"] is not None:
+            writer.writerow({**base, "error": result["error"]})
+        yield result
+
+
+def main(argv=None):
+    """
+    Точка входа пакетного режима.
+        :param argv: аргументы командной строки (по умолчанию sys.argv[1:])
+        :return: код завершения (0 — все запросы выполнены, 1 — были ошибки, 2 — нет подключения)
+    """
+    parser = argparse.ArgumentParser(description="Пакетный поиск фильмов по запросам из JSONL.")
+    parser.add_argument("input", nargs="?", default="-", help="файл JSONL с запросами ('-' — stdin)")
+    parser.add_argument("-o", "--output", default="-", help="файл результатов ('-' — stdout)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--order", choices=("input", "completion"), default="input",
+                        help="порядок вывода: как во входных данных или по мере готовности")
+    parser.add_argument("--workers", type=int, default=4, help="число параллельных потоков")
+    args = parser.parse_args(argv)
+
+    if not init_pool(max_size=args.workers + 1):        # + соединение для дочитывания страниц при выводе
+        print("Пакетный режим завершён из-за ошибки подключения.", file=sys.stderr)
+        return 2
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    writer = write_csv if args.format == "csv" else write_jsonl
+    started = time.perf_counter()
+    queries = rows = failed = 0
+    try:
+        for result in writer(run_batch(source, args.workers, args.order == "input"), out):
+            queries += 1
+            rows += result["row_count"]
+            failed += result["error"] is not None
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        close_pool()
+        flush_logs(timeout=10)
+
+    elapsed = time.perf_counter() - started
+    print(f"Запросов: {queries}, строк: {rows}, ошибок: {failed}, время: {elapsed:.2f} c, "
+          f"пропускная способность: {queries / elapsed if elapsed else 0:.1f} запр./с", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
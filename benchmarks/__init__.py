@@ -0,0 +1 @@
+# ● benchmarks — воспроизводимые замеры производительности поиска на синтетических данных Sakila
@@ -0,0 +1,89 @@
+# ● benchmarks/compare.py — сравнение двух файлов результатов harness.py и поиск регрессий
+
+import sys
+import json
+import argparse
+
+DEFAULT_THRESHOLD = 1.25        # замедление медианы более чем на 25% считается регрессией
+DEFAULT_MIN_DELTA_MS = 1.0      # разница меньше этой величины — шум измерений
+
+
+def _key(result):
+    """ Ключ замера: тип запроса, сценарий, селективность, параметры и глубина. """
+    return (result["query_type"], result["case"], result.get("selectivity"),
+            json.dumps(result.get("params"), ensure_ascii=False), result.get("depth"))
+
+
+def load_results(path):
+    """
+    Загружает файл результатов.
+        :param path: путь к JSON-файлу harness.py
+        :return: кортеж (meta, {ключ замера: результат})
+    """
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return report.get("meta", {}), {_key(result): result for result in report["results"]}
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS,
+            metric="median_ms"):
+    """
+    Сравнивает замеры по метрике.
+        :param baseline: словарь результатов базового прогона
+        :param current: словарь результатов нового прогона
+        :param threshold: допустимое отношение current / baseline
+        :param min_delta_ms: минимальная абсолютная разница для регрессии, мс
+        :param metric: сравниваемое поле (median_ms, p95_ms, min_ms)
+        :return: список словарей {key, baseline, current, ratio, status}, где status —
+                 regression, improvement, ok, missing (нет в новом прогоне) или new
+    """
+    rows = []
+    for key in sorted(set(baseline) | set(current), key=str):
+        before, after = baseline.get(key), current.get(key)
+        if before is None or after is None:
+            rows.append({"key": key, "baseline": before and before[metric], "current": after and after[metric],
+                         "ratio": None, "status": "new" if before is None else "missing"})
+            continue
+        old, new = before[metric], after[metric]
+        ratio = new / old if old else None
+        if ratio is not None and ratio > threshold and new - old >= min_delta_ms:
+            status = "regression"
+        elif ratio is not None and ratio < 1 / threshold and old - new >= min_delta_ms:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append({"key": key, "baseline": old, "current": new, "ratio": ratio, "status": status})
+    return rows
+
+
+def print_report(rows, only_changes=False):
+    """ Выводит таблицу сравнения в консоль. """
+    for row in rows:
+        if only_changes and row["status"] == "ok":
+            continue
+        query_type, case, selectivity, params, depth = row["key"]
+        name = f"{query_type}/{case} [{selectivity or '-'}] {params} p{depth or '-'}"
+        ratio = f"x{row['ratio']:.2f}" if row["ratio"] is not None else "—"
+        print(f"{row['status']:<12} {name:<70} {row['baseline']!s:>10} -> {row['current']!s:>10} {ratio}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарка с базовым прогоном.")
+    parser.add_argument("baseline", help="JSON базового прогона")
+    parser.add_argument("current", help="JSON нового прогона")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое отношение новой медианы к базовой")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS)
+    parser.add_argument("--metric", default="median_ms", choices=("median_ms", "p95_ms", "min_ms"))
+    parser.add_argument("--only-changes", action="store_true", help="не выводить замеры без изменений")
+    args = parser.parse_args()
+
+    base_meta, base = load_results(args.baseline)
+    new_meta, new = load_results(args.current)
+    if base_meta.get("films") != new_meta.get("films"):
+        print(f"Внимание: разный объём данных ({base_meta.get('films')} и {new_meta.get('films')} фильмов).")
+    report = compare(base, new, args.threshold, args.min_delta_ms, args.metric)
+    print_report(report, args.only_changes)
+    regressions = sum(row["status"] == "regression" for row in report)
+    print(f"Регрессий: {regressions} из {len(report)} замеров.")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,264 @@
+# ● benchmarks/generate.py — генератор синтетического каталога в форме Sakila и журнала запросов
+
+import os
+import sys
+import random
+import argparse
+from datetime import datetime, timedelta
+
+import pymysql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BENCH_MYSQL_DB = os.getenv("BENCH_MYSQL_DB", "sakila_bench")
+BENCH_MONGO_DB = os.getenv("BENCH_MONGO_DB", "sakila_bench")
+
+# словари генератора; частоты слов задают селективность поисковых терминов (см. SELECTIVITY_TERMS)
+CATEGORIES = ["Action", "Animation", "Children", "Classics", "Comedy", "Documentary", "Drama", "Family",
+              "Foreign", "Games", "Horror", "Music", "New", "Sci-Fi", "Sports", "Travel"]
+ADJECTIVES = ["ACADEMY", "BRAVE", "CHAMBER", "DESERT", "EAGLES", "FIGHT", "GOLD", "HARBOR", "ICE", "JUNGLE",
+              "KING", "LOVE", "MOON", "NIGHT", "OCEAN", "PIRATE", "QUEEN", "RIVER", "SHARK", "TITANS"]
+NOUNS = ["DINOSAUR", "AFFAIR", "BANDIT", "CASTLE", "DETECTIVE", "EMPIRE", "FLAMINGO", "GHOST", "HOLIDAY",
+         "ISLAND", "JEDI", "KNIGHT", "LEGEND", "MATRIX", "NOTORIOUS", "ORCHESTRA", "PELICAN", "QUEST",
+         "ROBOT", "SUNSET", "TROUBLE", "UNIVERSE", "VOYAGE", "WARRIOR", "WIZARD"]
+FIRST_NAMES = ["PENELOPE", "NICK", "ED", "JENNIFER", "JOHNNY", "BETTE", "GRACE", "MATTHEW", "JOE", "CHRISTIAN",
+               "ZERO", "KARL", "UMA", "VIVIEN", "CUBA", "FRED", "HELEN", "DAN", "BOB", "LUCILLE"]
+LAST_NAMES = ["GUINESS", "WAHLBERG", "CHASE", "DAVIS", "LOLLOBRIGIDA", "NICHOLSON", "MOSTEL", "JOHANSSON",
+              "SWANK", "GABLE", "CAGE", "BERRY", "WOOD", "BERGEN", "OLIVIER", "COSTNER", "VOIGHT", "TORN",
+              "FAWCETT", "TRACY"]
+DESCRIPTION_MOODS = ["Thoughtful", "Epic", "Fateful", "Astounding", "Intrepid", "Insightful", "Boring", "Touching"]
+DESCRIPTION_KINDS = ["Drama", "Saga", "Story", "Documentary", "Yarn", "Tale", "Reflection", "Panorama"]
+DESCRIPTION_PLACES = ["Ancient China", "A Shark Tank", "The Gulf of Mexico", "Soviet Georgia", "A Baloon",
+                      "The Outback", "A Manhattan Penthouse", "Nigeria"]
+RATINGS = ["G", "PG", "PG-13", "R", "NC-17"]
+YEARS = (2000, 2020)
+
+# термины поиска с известной селективностью: high — почти все строки, medium — единицы процентов,
+# low — доли процента
+SELECTIVITY_TERMS = {
+    "keyword": {"high": "A", "medium": ADJECTIVES[0], "low": f"{ADJECTIVES[0]} {NOUNS[0]}"},
+    "actor": {"high": "A", "medium": FIRST_NAMES[0], "low": f"{FIRST_NAMES[0]} {LAST_NAMES[0]}"},
+    "description": {"high": "A", "medium": DESCRIPTION_KINDS[0],
+                    "low": f"{DESCRIPTION_MOODS[0]} {DESCRIPTION_KINDS[0]}"},
+    "genre_year": {"high": ("Action", YEARS[0], YEARS[1]), "medium": ("Action", 2010, 2012),
+                   "low": ("Action", 2010, 2010)},
+}
+
+SCHEMA = [
+    """
+    CREATE TABLE category (
+        category_id SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+        name VARCHAR(25) NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE film (
+        film_id INT UNSIGNED NOT NULL PRIMARY KEY,
+        title VARCHAR(128) NOT NULL,
+        description TEXT,
+        release_year YEAR,
+        rating ENUM('G','PG','PG-13','R','NC-17') DEFAULT 'G',
+        length SMALLINT UNSIGNED,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_title (title)
+    )
+    """,
+    """
+    CREATE TABLE film_category (
+        film_id INT UNSIGNED NOT NULL,
+        category_id SMALLINT UNSIGNED NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (film_id, category_id),
+        KEY fk_film_category_category (category_id)
+    )
+    """,
+    """
+    CREATE TABLE actor (
+        actor_id INT UNSIGNED NOT NULL PRIMARY KEY,
+        first_name VARCHAR(45) NOT NULL,
+        last_name VARCHAR(45) NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_actor_last_name (last_name)
+    )
+    """,
+    """
+    CREATE TABLE film_actor (
+        actor_id INT UNSIGNED NOT NULL,
+        film_id INT UNSIGNED NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (actor_id, film_id),
+        KEY idx_fk_film_id (film_id)
+    )
+    """,
+]
+
+
+def _mysql_config():
+    """ Параметры подключения к MySQL для базы бенчмарка (сервер — как у приложения). """
+    return {
+        "host": os.getenv("MYSQL_HOST"),
+        "user": os.getenv("MYSQL_USER"),
+        "password": os.getenv("MYSQL_PASSWORD"),
+    }
+
+
+def _check_target(database, production):
+    """ Не даёт случайно перезаписать рабочую базу. """
+    if database == production:
+        raise SystemExit(f"База бенчмарка '{database}' совпадает с рабочей базой — задайте другую.")
+
+
+def _insert_chunks(cursor, sql, rows, chunk_size):
+    """ Вставляет строки пачками executemany (генератор rows не материализуется целиком). """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            cursor.executemany(sql, chunk)
+            chunk.clear()
+    if chunk:
+        cursor.executemany(sql, chunk)
+
+
+def _films(rng, count):
+    """ Генератор строк film (film_id, title, description, release_year, rating, length). """
+    for film_id in range(1, count + 1):
+        title = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {film_id}"
+        description = (f"A {rng.choice(DESCRIPTION_MOODS)} {rng.choice(DESCRIPTION_KINDS)} of a "
+                       f"{rng.choice(NOUNS).title()} And a {rng.choice(NOUNS).title()} who must Meet a "
+                       f"{rng.choice(NOUNS).title()} in {rng.choice(DESCRIPTION_PLACES)}")
+        yield (film_id, title, description, rng.randint(*YEARS), rng.choice(RATINGS), rng.randint(46, 185))
+
+
+def _film_actors(rng, films, actors, per_film):
+    """ Генератор строк film_actor: в среднем per_film актёров на фильм, без повторов в фильме. """
+    for film_id in range(1, films + 1):
+        cast = rng.sample(range(1, actors + 1), min(actors, max(1, round(rng.gauss(per_film, 2)))))
+        for actor_id in cast:
+            yield (actor_id, film_id)
+
+
+def seed_mysql(films, seed=42, chunk_size=5000, actors_per_film=5.4):
+    """
+    Пересоздаёт базу BENCH_MYSQL_DB и заполняет её синтетическими данными в форме Sakila.
+        :param films: количество фильмов (10^3 — 10^7)
+        :param seed: зерно генератора случайных чисел (одинаковое зерно — одинаковые данные)
+        :param chunk_size: размер пачки вставки
+        :param actors_per_film: среднее число актёров в фильме
+        :return: словарь с количеством строк по таблицам
+    """
+    _check_target(BENCH_MYSQL_DB, os.getenv("MYSQL_DB"))
+    rng = random.Random(seed)
+    actors = max(200, films // 5)
+    connection = pymysql.connect(**_mysql_config(), autocommit=False)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{BENCH_MYSQL_DB}`")
+            cursor.execute(f"CREATE DATABASE `{BENCH_MYSQL_DB}` CHARACTER SET utf8mb4")
+            cursor.execute(f"USE `{BENCH_MYSQL_DB}`")
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany("INSERT INTO category (category_id, name) VALUES (%s, %s)",
+                               list(enumerate(CATEGORIES, start=1)))
+            _insert_chunks(cursor, "INSERT INTO actor (actor_id, first_name, last_name) VALUES (%s, %s, %s)",
+                           ((i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for i in range(1, actors + 1)),
+                           chunk_size)
+            _insert_chunks(cursor, """
+                INSERT INTO film (film_id, title, description, release_year, rating, length)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, _films(rng, films), chunk_size)
+            _insert_chunks(cursor, "INSERT INTO film_category (film_id, category_id) VALUES (%s, %s)",
+                           ((i, rng.randint(1, len(CATEGORIES))) for i in range(1, films + 1)), chunk_size)
+            _insert_chunks(cursor, "INSERT INTO film_actor (actor_id, film_id) VALUES (%s, %s)",
+                           _film_actors(rng, films, actors, actors_per_film), chunk_size)
+            connection.commit()
+            counts = {}
+            for table in ("category", "film", "film_category", "actor", "film_actor"):
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                counts[table] = cursor.fetchone()[0]
+            return counts
+    finally:
+        connection.close()
+
+
+def _query_logs(rng, count, distinct):
+    """ Генератор документов журнала запросов; популярность запросов — по закону Ципфа. """
+    specs = []
+    for i in range(distinct):
+        kind = i % 4
+        if kind == 0:
+            specs.append(("keyword", {"keyword": f"{ADJECTIVES[i % len(ADJECTIVES)].lower()}{i}"}))
+        elif kind == 1:
+            specs.append(("actor", {"actor_name": f"{FIRST_NAMES[i % len(FIRST_NAMES)].lower()} {i}"}))
+        elif kind == 2:
+            specs.append(("description", {"keyword": f"{DESCRIPTION_KINDS[i % len(DESCRIPTION_KINDS)]} {i}"}))
+        else:
+            year = YEARS[0] + i % (YEARS[1] - YEARS[0] + 1)
+            specs.append(("genre_year", {"genre": CATEGORIES[i % len(CATEGORIES)], "year_start": year,
+                                         "year_end": year, "n": i}))
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    start = datetime.now() - timedelta(days=30)
+    step = timedelta(days=30) / max(1, count)
+    for i in range(count):
+        query_type, parameters = rng.choices(specs, weights)[0]
+        yield {"query_type": query_type, "parameters": parameters,
+               "result_count": rng.randint(0, 500), "timestamp": start + step * i}
+
+
+def seed_mongo(queries, errors=None, seed=42, chunk_size=10000, distinct=None):
+    """
+    Пересоздаёт коллекции журнала в базе BENCH_MONGO_DB и заполняет их синтетическими записями.
+        :param queries: количество записей журнала запросов
+        :param errors: количество записей журнала ошибок (по умолчанию queries // 100)
+        :param seed: зерно генератора случайных чисел
+        :param chunk_size: размер пачки insert_many
+        :param distinct: число различных запросов (по умолчанию queries // 20, не меньше 10)
+        :return: словарь с количеством документов по коллекциям
+    """
+    _check_target(BENCH_MONGO_DB, os.getenv("MONGO_DB"))
+    from mongo_connector import (get_mongo_client, QUERIES_COLLECTION, ERRORS_COLLECTION, QUERY_STATS_COLLECTION,
+                                 QUERY_STATS_META_COLLECTION)
+    database = get_mongo_client()[BENCH_MONGO_DB]       # база бенчмарка явно, без подмены MONGO_DB
+
+    rng = random.Random(seed)
+    errors = queries // 100 if errors is None else errors
+    distinct = max(10, queries // 20) if distinct is None else distinct
+    for name in (QUERIES_COLLECTION, ERRORS_COLLECTION, QUERY_STATS_COLLECTION, QUERY_STATS_META_COLLECTION):
+        database[name].drop()
+
+    chunk = []
+    for doc in _query_logs(rng, queries, distinct):
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            database[QUERIES_COLLECTION].insert_many(chunk, ordered=False)
+            chunk = []
+    if chunk:
+        database[QUERIES_COLLECTION].insert_many(chunk, ordered=False)
+
+    start = datetime.now() - timedelta(days=30)
+    error_docs = [{"source": rng.choice(["search_films_by_keyword_page", "genre_year_search", "connect_db"]),
+                   "message": f"synthetic error {i % 50}", "timestamp": start + timedelta(minutes=i)}
+                  for i in range(errors)]
+    for i in range(0, len(error_docs), chunk_size):
+        database[ERRORS_COLLECTION].insert_many(error_docs[i:i + chunk_size], ordered=False)
+    return {QUERIES_COLLECTION: queries, ERRORS_COLLECTION: errors}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных для бенчмарка.")
+    parser.add_argument("--films", type=int, default=1000, help="количество фильмов (10^3 — 10^7)")
+    parser.add_argument("--queries", type=int, default=None,
+                        help="записей журнала запросов (по умолчанию = --films)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-mysql", action="store_true")
+    parser.add_argument("--skip-mongo", action="store_true")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if not args.skip_mysql:
+        print(f"MySQL ({BENCH_MYSQL_DB}):", seed_mysql(args.films, args.seed))
+    if not args.skip_mongo:
+        print(f"MongoDB ({BENCH_MONGO_DB}):",
+              seed_mongo(args.films if args.queries is None else args.queries, seed=args.seed))
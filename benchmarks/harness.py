@@ -0,0 +1,214 @@
+# ● benchmarks/harness.py — замеры времени поиска (глубина страницы × селективность) и отчётов log_stats
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate import BENCH_MYSQL_DB, BENCH_MONGO_DB, SELECTIVITY_TERMS
+
+import mysql_connector
+import result_cache
+from mysql_connector import PAGE_SIZE
+from mongo_connector import set_mongo_database
+import log_stats
+
+DEPTHS = (1, 10, 100)           # номера страниц, на которых измеряется выборка
+DEFAULT_REPEAT = 5
+DEFAULT_WARMUP = 1
+
+# тип запроса -> (функция со смещением, функция keyset-страницы, параметры по термину)
+SEARCHES = {
+    "keyword": (mysql_connector.search_films_by_keyword, mysql_connector.search_films_by_keyword_page,
+                lambda term: (term,)),
+    "actor": (mysql_connector.search_films_by_actor, mysql_connector.search_films_by_actor_page,
+              lambda term: (term,)),
+    "description": (mysql_connector.search_films_by_description,
+                    mysql_connector.search_films_by_description_page, lambda term: (term,)),
+    "genre_year": (mysql_connector.search_films_by_genre_and_years,
+                   mysql_connector.search_films_by_genre_and_years_page, lambda term: tuple(term)),
+}
+
+
+def time_call(func, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP, setup=None):
+    """
+    Замеряет время вызова func() в миллисекундах.
+        :param func: функция без аргументов; её результат — число строк или список строк
+        :param repeat: количество замеров
+        :param warmup: количество прогревочных вызовов (в статистику не входят)
+        :param setup: функция, вызываемая перед каждым вызовом вне замера (например, сброс кэша)
+        :return: словарь rows, runs, min_ms, median_ms, p95_ms, max_ms
+    """
+    result = None
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    rows = result if isinstance(result, int) else len(result or [])
+    return {
+        "rows": rows,
+        "runs": repeat,
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def _token_at(connection, page_func, args, depth):
+    """
+    Проходит keyset-страницы до указанной (вне замера) и возвращает её токен.
+        :return: токен страницы depth (None для первой) или False, если результатов меньше
+    """
+    token = None
+    for _ in range(depth - 1):
+        page = page_func(connection, *args, token, PAGE_SIZE)
+        if page is None or page[1] is None:
+            return False
+        token = page[1]
+    return token
+
+
+def bench_searches(connection, types=None, depths=DEPTHS, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP):
+    """
+    Замеряет функции поиска: постраничный вывод через OFFSET и через keyset-токен на разной глубине,
+    а также первую страницу с подсчётом общего числа совпадений (кэш счётчиков сбрасывается).
+        :param connection: подключение к базе бенчмарка
+        :param types: типы запросов из SEARCHES (по умолчанию все)
+        :param depths: номера страниц
+        :return: список результатов замеров
+    """
+    results = []
+    for query_type in types or SEARCHES:
+        offset_func, page_func, make_args = SEARCHES[query_type]
+        for selectivity, term in SELECTIVITY_TERMS[query_type].items():
+            args = make_args(term)
+            case = {"query_type": query_type, "selectivity": selectivity, "params": list(args)}
+            results.append({**case, "case": "first_page_total", "depth": 1, **time_call(
+                lambda: page_func(connection, *args, None, PAGE_SIZE, with_total=True)[0],
+                repeat, warmup, setup=mysql_connector.invalidate_count_cache)})
+            for depth in depths:
+                offset = (depth - 1) * PAGE_SIZE
+                results.append({**case, "case": "offset", "depth": depth, **time_call(
+                    lambda: offset_func(connection, *args, offset), repeat, warmup)})
+                token = _token_at(connection, page_func, args, depth)
+                if token is False:
+                    continue        # результатов меньше, чем страниц до этой глубины
+                results.append({**case, "case": "keyset", "depth": depth, **time_call(
+                    lambda: page_func(connection, *args, token, PAGE_SIZE)[0], repeat, warmup)})
+    return results
+
+
+def bench_log_stats(repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP, limits=(5, 50)):
+    """
+    Замеряет отчёты log_stats: сначала по сырому журналу (сводка пуста), затем по сводке популярности.
+        :param limits: значения параметра limit
+        :return: список результатов замеров
+    """
+    from mongo_connector import get_collection, QUERY_STATS_COLLECTION, QUERY_STATS_META_COLLECTION
+
+    reports = {
+        "most_frequent": log_stats.get_most_frequent_queries,
+        "last_unique": log_stats.get_last_unique_queries,
+        "last_errors": log_stats.get_last_errors,
+    }
+    results = []
+    get_collection(QUERY_STATS_COLLECTION).drop()
+    get_collection(QUERY_STATS_META_COLLECTION).drop()        # без отметки отчёты читают сырой журнал
+    for source in ("raw", "summary"):
+        if source == "summary":
+            results.append({"query_type": "log_stats", "case": "rebuild_summary", "selectivity": None,
+                            "params": [], "depth": None,
+                            **time_call(log_stats.rebuild_query_summary, 1, 0)})
+        for name, report in reports.items():
+            if name == "last_errors" and source == "summary":
+                continue        # отчёт об ошибках не зависит от сводки
+            for limit in limits:
+                results.append({"query_type": "log_stats", "case": f"{name}_{source}", "selectivity": None,
+                                "params": [limit], "depth": None,
+                                **time_call(lambda: report(limit), repeat, warmup)})
+    return results
+
+
+def _git_revision():
+    """ Текущий коммит репозитория (или None вне git). """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(types=None, depths=DEPTHS, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP, skip_mongo=False):
+    """
+    Выполняет все замеры на базах бенчмарка (BENCH_MYSQL_DB, BENCH_MONGO_DB).
+        :return: словарь {meta, results}, пригодный для сохранения в JSON и сравнения compare.py,
+                 или None при ошибке подключения к MySQL
+    """
+    connection = mysql_connector.connect_db(BENCH_MYSQL_DB)
+    if connection is None:
+        return None
+    cache_size = result_cache.RESULT_CACHE_SIZE
+    result_cache.RESULT_CACHE_SIZE = 0      # замеряются запросы к MySQL, а не кэш результатов
+    mongo_database = set_mongo_database(BENCH_MONGO_DB)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM film")
+            films = cursor.fetchone()[0]
+        results = bench_searches(connection, types, depths, repeat, warmup)
+        if not skip_mongo:
+            results += bench_log_stats(repeat, warmup)
+    finally:
+        connection.close()
+        result_cache.RESULT_CACHE_SIZE = cache_size
+        set_mongo_database(mongo_database)
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "films": films,
+            "search_backends": os.getenv("SEARCH_BACKEND", ""),
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности поиска на базе бенчмарка.")
+    parser.add_argument("-o", "--output", default="-", help="файл JSON с результатами ('-' — stdout)")
+    parser.add_argument("--types", nargs="+", choices=sorted(SEARCHES), help="типы запросов (по умолчанию все)")
+    parser.add_argument("--depths", nargs="+", type=int, default=list(DEPTHS), help="номера страниц")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--skip-mongo", action="store_true", help="не замерять отчёты log_stats")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.types, args.depths, args.repeat, args.warmup, args.skip_mongo)
+    if report is None:
+        sys.exit(2)
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Результаты сохранены: {args.output} ({len(report['results'])} замеров)", file=sys.stderr)
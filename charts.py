@@ -0,0 +1,236 @@
+# ● charts.py — графики количества фильмов по годам и объёма запросов: без окна (PNG/SVG), с кэшем по хэшу данных
+
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+
+from mysql_connector import (
+    with_connection,
+    get_film_count_by_year,
+    get_film_count_by_year_and,
+    get_film_data_version )
+from log_writer import log_error
+
+CHART_DIR = os.getenv("CHART_DIR", "charts")            # каталог готовых изображений
+CHART_FORMAT = os.getenv("CHART_FORMAT", "png")         # "png" или "svg"
+CHART_FORMATS = ("png", "svg")
+CHART_KEEP = int(os.getenv("CHART_KEEP", "10"))         # файлов одного вида графика в каталоге (0 — не удалять)
+BREAKDOWNS = {None: "Все фильмы", "genre": "По жанрам", "rating": "По рейтингам"}
+
+_data_cache = {}        # разрез -> (версия данных, данные графика)
+_data_lock = threading.Lock()
+
+
+def pivot_counts(rows):
+    """
+    Разворачивает строки (год, серия, количество) в матрицу серий по годам.
+        :param rows: список кортежей (release_year, series, film_count)
+        :return: словарь years (массив годов), labels (список серий),
+                 counts (массив len(labels) x len(years); нет строки — 0)
+    """
+    if not rows:
+        return {"years": np.array([], dtype=int), "labels": [], "counts": np.zeros((0, 0), dtype=int)}
+    years, labels, counts = zip(*rows)
+    year_values, year_index = np.unique(np.array(years, dtype=int), return_inverse=True)
+    label_values, label_index = np.unique(np.array([str(label) for label in labels]), return_inverse=True)
+    matrix = np.zeros((len(label_values), len(year_values)), dtype=int)
+    np.add.at(matrix, (label_index, year_index), np.array(counts, dtype=int))
+    return {"years": year_values, "labels": label_values.tolist(), "counts": matrix}
+
+
+def load_chart_data(connection, breakdown=None):
+    """
+    Возвращает данные графика. Пока версия данных (get_film_data_version) не изменилась,
+    повторный запрос к MySQL не выполняется.
+        :param connection: подключение к БД
+        :param breakdown: None (все фильмы), "genre" или "rating"
+        :return: словарь pivot_counts или None в случае ошибки
+    """
+    version = get_film_data_version(connection)
+    with _data_lock:
+        cached = _data_cache.get(breakdown)
+    if cached and version is not None and cached[0] == version:
+        return cached[1]
+
+    if breakdown is None:
+        rows = get_film_count_by_year(connection)
+        rows = None if rows is None else [(year, BREAKDOWNS[None], count) for year, count in rows]
+    else:
+        rows = get_film_count_by_year_and(connection, breakdown)
+    if rows is None:
+        return None
+    data = pivot_counts([row for row in rows if row[0] is not None])
+    if version is not None:
+        with _data_lock:
+            _data_cache[breakdown] = (version, data)
+    return data
+
+
+def chart_digest(data, breakdown=None, fmt=CHART_FORMAT):
+    """
+    Хэш данных и параметров графика: одинаковые данные — то же имя файла.
+        :return: hex-строка sha1
+    """
+    digest = hashlib.sha1(json.dumps([breakdown, fmt, data["labels"]], ensure_ascii=False).encode("utf-8"))
+    digest.update(np.ascontiguousarray(data["years"], dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(data["counts"], dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def _prune_charts(path):
+    """
+    Удаляет старые файлы того же вида графика (то же имя до хэша и то же расширение),
+    оставляя CHART_KEEP самых новых; path не удаляется.
+        :param path: путь только что сохранённого графика
+        :return: None
+    """
+    if CHART_KEEP <= 0:
+        return
+    out_dir, name = os.path.split(path)
+    prefix = name.rsplit("_", 1)[0] + "_"
+    ext = os.path.splitext(name)[1]
+    files = []
+    for entry in os.scandir(out_dir or "."):
+        if entry.name.startswith(prefix) and entry.name.endswith(ext) and entry.name != name:
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue            # файл уже удалил параллельный вызов
+    files.sort(reverse=True)
+    for _, old_path in files[CHART_KEEP - 1:]:
+        try:
+            os.remove(old_path)
+        except FileNotFoundError:
+            pass
+
+
+def _save_figure(figure, path, fmt):
+    """
+    Сохраняет рисунок в файл через временный файл (создаёт каталог при необходимости)
+    и удаляет устаревшие файлы того же графика (_prune_charts).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    figure.savefig(tmp_path, format=fmt)
+    os.replace(tmp_path, path)          # файл появляется целиком: параллельный вызов не увидит половину
+    _prune_charts(path)
+
+
+def render_chart(data, breakdown=None, fmt=None, out_dir=None):
+    """
+    Рисует график количества фильмов по годам в файл (без интерактивного окна).
+    Если файл для этих данных уже есть, повторная отрисовка не выполняется.
+        :param data: словарь pivot_counts
+        :param breakdown: None, "genre" или "rating" (влияет на заголовок и имя файла)
+        :param fmt: "png" или "svg" (по умолчанию CHART_FORMAT)
+        :param out_dir: каталог (по умолчанию CHART_DIR)
+        :return: путь к файлу изображения
+    """
+    fmt = fmt or CHART_FORMAT
+    out_dir = out_dir or CHART_DIR
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат графика: {fmt}")
+    path = os.path.join(out_dir, f"films_by_year_{breakdown or 'total'}_{chart_digest(data, breakdown, fmt)[:16]}.{fmt}")
+    if os.path.exists(path):
+        return path
+
+    figure = Figure(figsize=(10, 5))
+    axes = figure.subplots()
+    for label, counts in zip(data["labels"], data["counts"]):
+        axes.plot(data["years"], counts, marker='o', label=label)
+    title = "Количество фильмов по годам"
+    axes.set_title(title if breakdown is None else f"{title}: {BREAKDOWNS[breakdown].lower()}")
+    axes.set_xlabel("Год выпуска")
+    axes.set_ylabel("Количество фильмов")
+    axes.grid(True)
+    axes.xaxis.set_major_locator(MaxNLocator(integer=True))     # только целые годы на оси
+    if breakdown is not None:
+        axes.legend(loc="upper left", bbox_to_anchor=(1.01, 1), fontsize="small")
+    figure.tight_layout()
+    _save_figure(figure, path, fmt)
+    return path
+
+
+def films_by_year_chart(breakdown=None, fmt=None, out_dir=None):
+    """
+    Строит (или берёт из кэша) график количества фильмов по годам.
+        :param breakdown: None (все фильмы), "genre" или "rating"
+        :param fmt: "png" или "svg"
+        :param out_dir: каталог изображений
+        :return: путь к файлу, "" если данных нет, или None в случае ошибки
+    """
+    data = with_connection(load_chart_data, breakdown)
+    if data is None:
+        return None
+    if not data["labels"]:
+        return ""
+    try:
+        return render_chart(data, breakdown, fmt, out_dir)
+    except (OSError, ValueError) as e:
+        print("Не удалось сохранить график.")
+        log_error("films_by_year_chart", str(e))
+        return None
+
+
+def query_volume_chart(rows, unit, fmt=None, out_dir=None):
+    """
+    Рисует (или берёт готовый) график объёма запросов по интервалам времени:
+    количество запросов по типам и доля запросов без результатов.
+        :param rows: список словарей log_stats.get_query_volume()
+        :param unit: "minute", "hour" или "day" (влияет на заголовок и имя файла)
+        :param fmt: "png" или "svg" (по умолчанию CHART_FORMAT)
+        :param out_dir: каталог (по умолчанию CHART_DIR)
+        :return: путь к файлу, "" если данных нет, или None в случае ошибки
+    """
+    if not rows:
+        return ""
+    fmt = fmt or CHART_FORMAT
+    out_dir = out_dir or CHART_DIR
+    try:
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат графика: {fmt}")
+        starts = sorted({row["start"] for row in rows})
+        labels = sorted({row["query_type"] for row in rows})
+        counts = np.zeros((len(labels), len(starts)), dtype=int)
+        zero_results = np.zeros(len(starts), dtype=int)
+        for row in rows:
+            column = starts.index(row["start"])
+            counts[labels.index(row["query_type"]), column] += row["count"]
+            zero_results[column] += row["zero_results"]
+
+        digest = hashlib.sha1(json.dumps(
+            [unit, fmt, labels, [start.isoformat() for start in starts]], ensure_ascii=False).encode("utf-8"))
+        digest.update(counts.astype(np.int64).tobytes())
+        digest.update(zero_results.astype(np.int64).tobytes())
+        path = os.path.join(out_dir, f"query_volume_{unit}_{digest.hexdigest()[:16]}.{fmt}")
+        if os.path.exists(path):
+            return path
+
+        figure = Figure(figsize=(10, 6))
+        volume_axes, zero_axes = figure.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+        for label, series in zip(labels, counts):
+            volume_axes.plot(starts, series, marker='o', label=label)
+        volume_axes.set_title(f"Объём запросов по интервалам ({unit})")
+        volume_axes.set_ylabel("Запросов")
+        volume_axes.grid(True)
+        volume_axes.yaxis.set_major_locator(MaxNLocator(integer=True))
+        volume_axes.legend(loc="upper left", bbox_to_anchor=(1.01, 1), fontsize="small")
+        totals = counts.sum(axis=0)
+        zero_axes.plot(starts, np.divide(zero_results, totals, out=np.zeros(len(starts)), where=totals > 0),
+                       color="tab:red", marker='o')
+        zero_axes.set_ylabel("Без результатов")
+        zero_axes.set_ylim(0, 1)
+        zero_axes.grid(True)
+        figure.autofmt_xdate()
+        figure.tight_layout()
+        _save_figure(figure, path, fmt)
+        return path
+    except (OSError, ValueError) as e:
+        print("Не удалось сохранить график.")
+        log_error("query_volume_chart", str(e))
+        return None
@@ -0,0 +1,104 @@
+# ● exporter.py — потоковая выгрузка полных результатов поиска в CSV/JSONL с ограниченной памятью
+
+import sys
+import csv
+import json
+import argparse
+from itertools import chain, islice
+
+import pymysql
+from mysql_connector import init_pool, close_pool, pooled_connection, iter_search_results, EXPORT_COLUMNS
+from log_writer import log_error, flush_logs
+from formatter import compute_widths, render_table
+
+EXPORT_CHUNK_SIZE = 1000        # строк в порции чтения и записи
+TABLE_MAX_WIDTH = 100           # макс. ширина столбца текстовой таблицы (длинные значения переносятся)
+
+
+def write_rows(rows, columns, out, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Пишет строки в поток по мере поступления; буфер потока сбрасывается каждые chunk_size строк.
+        :param rows: итерируемое кортежей
+        :param columns: названия столбцов
+        :param out: текстовый поток для записи
+        :param fmt: "csv", "jsonl" или "table" (текстовая таблица; ширины столбцов — по первым chunk_size строкам)
+        :param chunk_size: через сколько строк сбрасывать буфер (flush)
+        :return: количество записанных строк
+    """
+    count = 0
+    if fmt == "table":
+        table_columns = [(name, "l", TABLE_MAX_WIDTH) for name in columns]
+        rows = iter(rows)
+        head = list(islice(rows, chunk_size))
+        widths = compute_widths(table_columns, [[str(value) for value in row] for row in head])
+        count, _ = render_table(table_columns, chain(head, rows), out, widths=widths, chunk_rows=chunk_size)
+        out.flush()
+        return count
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        write = writer.writerow
+    else:
+        def write(row):
+            out.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n")
+    for row in rows:
+        write(row)
+        count += 1
+        if count % chunk_size == 0:
+            out.flush()
+    out.flush()
+    return count
+
+
+def export_search(query_type, params, out, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Выгружает все строки результата поиска в поток, не загружая их в память целиком.
+    На время выгрузки из пула берётся отдельное соединение (серверный курсор занимает его).
+        :param query_type: тип запроса: keyword, genre_year, actor, description, film_count_by_year
+                           или filters (комбинированный поиск, параметры — FILM_FILTERS)
+        :param params: словарь параметров (как в log_search)
+        :param out: текстовый поток для записи
+        :param fmt: "csv", "jsonl" или "table"
+        :param chunk_size: размер порции чтения с сервера и сброса буфера
+        :return: количество выгруженных строк или None в случае ошибки
+    """
+    if query_type not in EXPORT_COLUMNS:
+        print(f"Неизвестный тип выгрузки: {query_type}")
+        log_error("export_search", f"Неизвестный тип выгрузки: {query_type}")
+        return None
+    with pooled_connection() as connection:
+        if connection is None:
+            return None
+        try:
+            rows = iter_search_results(connection, query_type, params, chunk_size)
+            return write_rows(rows, EXPORT_COLUMNS[query_type], out, fmt, chunk_size)
+        except (pymysql.MySQLError, KeyError, ValueError) as e:
+            log_error("export_search", f"Выгрузка {query_type} прервана: {e!r}")
+            print("Выгрузка прервана из-за ошибки.")
+            return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка результатов поиска фильмов.")
+    parser.add_argument("query_type", choices=sorted(EXPORT_COLUMNS))
+    parser.add_argument("--params", default="{}",
+                        help='параметры в JSON, например \'{"keyword": "ace"}\'')
+    parser.add_argument("--format", choices=("csv", "jsonl", "table"), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument("-o", "--output", default="-", help="файл результата ('-' — stdout)")
+    args = parser.parse_args()
+
+    if not init_pool(min_size=1, max_size=1):
+        print("Выгрузка завершена из-за ошибки подключения.", file=sys.stderr)
+        sys.exit(2)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        total = export_search(args.query_type, json.loads(args.params), out, args.format, args.chunk_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        close_pool()
+        flush_logs(timeout=10)
+    if total is None:
+        sys.exit(1)
+    print(f"Выгружено строк: {total}", file=sys.stderr)
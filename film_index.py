@@ -0,0 +1,267 @@
+# ● film_index.py — локальный n-граммный (триграммный) индекс для поиска по названию и описанию
+
+import os
+import time
+import threading
+from array import array
+from bisect import bisect_right
+
+import pymysql
+from log_writer import log_error
+from mysql_connector import PAGE_SIZE, encode_page_token, decode_page_token, get_data_versions
+
+NGRAM = 3                                                           # длина n-граммы
+CHECK_SECONDS = float(os.getenv("FILM_INDEX_CHECK_SECONDS", "60"))  # как часто сверять индекс с таблицей film
+
+_index = None                   # текущий индекс (словарь), заменяется целиком при перестроении
+_lock = threading.Lock()
+_build_lock = threading.Lock()      # индекс строит один поток, остальные ждут и берут готовый
+
+
+def _ngrams(text):
+    """
+    Возвращает множество n-грамм строки.
+        :param text: строка в нижнем регистре
+        :return: множество подстрок длины NGRAM
+    """
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def _build_postings(texts):
+    """
+    Строит инвертированный индекс: n-грамма -> компактный отсортированный список позиций строк.
+        :param texts: список строк в нижнем регистре (позиция = номер строки в отсортированном каталоге)
+        :return: словарь {n-грамма: array('I')}
+    """
+    postings = {}
+    for pos, text in enumerate(texts):
+        for gram in _ngrams(text):
+            plist = postings.get(gram)
+            if plist is None:
+                plist = postings[gram] = array("I")
+            plist.append(pos)       # позиции добавляются по возрастанию — список уже отсортирован
+    return postings
+
+
+def _table_version(connection, fresh=False):
+    """
+    Получает «версию» таблицы film из общей сверки mysql_connector.get_data_versions.
+        :param connection: подключение к БД
+        :param fresh: True — сверить сразу (перед загрузкой), а не взять результат фоновой сверки
+        :return: кортеж (max_last_update, film_count) или None, если версия неизвестна
+    """
+    versions = get_data_versions(connection, fresh)
+    return None if versions is None else versions["film"]
+
+
+def load_film_index(connection):
+    """
+    Загружает таблицу film одним запросом и строит триграммный индекс по названию и описанию.
+        :param connection: подключение к БД
+        :return: словарь индекса или None в случае ошибки
+    """
+    global _index
+    try:
+        version = _table_version(connection, fresh=True)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT film_id, title, description, release_year, rating, length
+                FROM film;
+            """)
+            rows = list(cursor.fetchall())
+    except pymysql.MySQLError as e:
+        print("Ошибка загрузки каталога фильмов для локального индекса.")
+        print(f"MySQL Error: {e}")
+        log_error("load_film_index", str(e))
+        return None
+
+    rows.sort(key=lambda r: ((r[1] or "").lower(), r[0]))      # тот же порядок, что ORDER BY title, film_id
+    titles = [(r[1] or "").lower() for r in rows]
+    descriptions = [(r[2] or "").lower() for r in rows]
+    index = {
+        "rows": rows,
+        "keys": [(titles[i], rows[i][0]) for i in range(len(rows))],
+        "title": (titles, _build_postings(titles)),
+        "description": (descriptions, _build_postings(descriptions)),
+        "version": version,
+        "checked_at": time.monotonic(),
+    }
+    with _lock:
+        _index = index
+    return index
+
+
+def refresh_film_index(connection):
+    """
+    Перестраивает индекс (хук для вызова после изменения таблицы film).
+        :param connection: подключение к БД
+        :return: словарь индекса или None в случае ошибки
+    """
+    with _build_lock:
+        return load_film_index(connection)
+
+
+def get_film_index(connection):
+    """
+    Возвращает индекс, при необходимости загружая его или перестраивая,
+    если таблица film изменилась (проверка не чаще раза в CHECK_SECONDS).
+    Строит индекс один поток (_build_lock); одновременные вызовы получают уже построенный.
+        :param connection: подключение к БД или None (MySQL недоступен)
+        :return: словарь индекса или None в случае ошибки
+    """
+    index = _index
+    if index is None:
+        if connection is None:
+            return None
+        with _build_lock:
+            if _index is None:          # другой поток мог построить индекс, пока мы ждали
+                return load_film_index(connection)
+            return _index
+    if connection is None or time.monotonic() - index["checked_at"] < CHECK_SECONDS:
+        return index                # без MySQL — отвечаем по последнему индексу
+    version = _table_version(connection)
+    if version is None:
+        return index                # версия неизвестна — отвечаем по последнему индексу
+    if version != index["version"]:
+        with _build_lock:
+            if _index is not index:     # индекс уже перестроил другой поток
+                return _index
+            return load_film_index(connection) or index
+    index["checked_at"] = time.monotonic()
+    return index
+
+
+def _match(index, field, keyword):
+    """
+    Находит позиции строк, у которых поле содержит подстроку (аналог LIKE '%keyword%').
+        :param index: словарь индекса
+        :param field: "title" или "description"
+        :param keyword: искомая подстрока
+        :return: отсортированный список позиций
+    """
+    texts, postings = index[field]
+    needle = keyword.lower()
+    if len(needle) < NGRAM:
+        return [pos for pos, text in enumerate(texts) if needle in text]
+
+    lists = []
+    for gram in _ngrams(needle):
+        plist = postings.get(gram)
+        if plist is None:
+            return []
+        lists.append(plist)
+    lists.sort(key=len)
+    candidates = set(lists[0])
+    for plist in lists[1:]:
+        candidates.intersection_update(plist)
+        if not candidates:
+            return []
+    # n-граммы не гарантируют порядок символов — проверяем подстроку
+    return sorted(pos for pos in candidates if needle in texts[pos])
+
+
+def _has_wildcards(keyword):
+    """
+    True, если строка содержит символы шаблона LIKE или экранирующий символ \\
+    (такие запросы обслуживает MySQL).
+    """
+    return "%" in keyword or "_" in keyword or "\\" in keyword
+
+
+def _page_after(index, positions, after, page_size):
+    """
+    Выбирает страницу позиций после ключа (title, film_id) из токена.
+        :return: кортеж (позиции страницы, есть ли следующая страница)
+    """
+    start = 0
+    if after:
+        boundary = bisect_right(index["keys"], ((after[0] or "").lower(), after[1]))
+        start = bisect_right(positions, boundary - 1)
+    page = positions[start:start + page_size]
+    return page, start + page_size < len(positions)
+
+
+# Функция 1 (локальный индекс)
+def search_films_by_keyword(connection, keyword, offset):
+    """
+    Поиск фильмов по части названия в локальном индексе.
+        :return: список фильмов (film_id, title, release_year, rating, length), NotImplemented
+                 для шаблонов LIKE или None в случае ошибки
+    """
+    if _has_wildcards(keyword):
+        return NotImplemented
+    index = get_film_index(connection)
+    if index is None:
+        return NotImplemented if connection is None else None
+    rows = index["rows"]
+    positions = _match(index, "title", keyword)[int(offset):int(offset) + PAGE_SIZE]
+    return [(rows[p][0], rows[p][1], rows[p][3], rows[p][4], rows[p][5]) for p in positions]
+
+
+# Функция 7 (локальный индекс)
+def search_films_by_description(connection, keyword, offset):
+    """
+    Поиск фильмов по ключевому слову в описании в локальном индексе.
+        :return: список фильмов (title, release_year, description), NotImplemented
+                 для шаблонов LIKE или None в случае ошибки
+    """
+    if _has_wildcards(keyword):
+        return NotImplemented
+    index = get_film_index(connection)
+    if index is None:
+        return NotImplemented if connection is None else None
+    rows = index["rows"]
+    positions = _match(index, "description", keyword)[int(offset):int(offset) + PAGE_SIZE]
+    return [(rows[p][1], rows[p][3], rows[p][2]) for p in positions]
+
+
+def search_films_by_keyword_page(connection, keyword, page_token=None, page_size=PAGE_SIZE,
+                                 with_total=False):
+    """
+    Поиск фильмов по части названия в локальном индексе с keyset-пагинацией.
+        :return: кортеж (список фильмов, токен следующей страницы или None[, общее число совпадений]),
+                 NotImplemented для шаблонов LIKE или None в случае ошибки
+    """
+    if _has_wildcards(keyword):
+        return NotImplemented
+    try:
+        after = decode_page_token("keyword", page_token, 2)
+    except ValueError as e:
+        print("Некорректный токен страницы.")
+        log_error("search_films_by_keyword_page", str(e))
+        return None
+    index = get_film_index(connection)
+    if index is None:
+        return NotImplemented if connection is None else None
+    rows = index["rows"]
+    positions = _match(index, "title", keyword)
+    page, has_more = _page_after(index, positions, after, page_size)
+    result = [(rows[p][0], rows[p][1], rows[p][3], rows[p][4], rows[p][5]) for p in page]
+    token = encode_page_token("keyword", (result[-1][1], result[-1][0])) if has_more else None
+    return (result, token, len(positions)) if with_total else (result, token)
+
+
+def search_films_by_description_page(connection, keyword, page_token=None, page_size=PAGE_SIZE,
+                                     with_total=False):
+    """
+    Поиск фильмов по ключевому слову в описании в локальном индексе с keyset-пагинацией.
+        :return: кортеж (список фильмов, токен следующей страницы или None[, общее число совпадений]),
+                 NotImplemented для шаблонов LIKE или None в случае ошибки
+    """
+    if _has_wildcards(keyword):
+        return NotImplemented
+    try:
+        after = decode_page_token("description", page_token, 2)
+    except ValueError as e:
+        print("Некорректный токен страницы.")
+        log_error("search_films_by_description_page", str(e))
+        return None
+    index = get_film_index(connection)
+    if index is None:
+        return NotImplemented if connection is None else None
+    rows = index["rows"]
+    positions = _match(index, "description", keyword)
+    page, has_more = _page_after(index, positions, after, page_size)
+    result = [(rows[p][1], rows[p][3], rows[p][2]) for p in page]
+    token = encode_page_token("description", (rows[page[-1]][1], rows[page[-1]][0])) if has_more else None
+    return (result, token, len(positions)) if with_total else (result, token)
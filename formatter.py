@@ -1,10 +1,170 @@
 # ● formatter.py — функции форматирования вывода (таблицы)
 
-from prettytable import PrettyTable
+import os
+import re
+import sys
+import textwrap
+import unicodedata
 from colorama import Fore, Style, init
+import metrics
 
 init(autoreset=True) # сброс цветного форматирования, после каждого print
 
+COLOR_OUTPUT = os.getenv("NO_COLOR") is None      # NO_COLOR=1 — вывод таблиц без цвета
+TABLE_CHUNK_ROWS = 200                            # строк таблицы в одной записи в поток
+
+_ansi_re = re.compile(r"\033\[[0-9;]*m|\033\(B")
+
+
+def _text_width(text):
+    """ Ширина строки в консоли: широкие символы (CJK) — 2, комбинируемые — 0, ANSI-коды не считаются. """
+    if text.isascii() and "\033" not in text:
+        return len(text)
+    width = 0
+    for char in _ansi_re.sub("", text):
+        if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me", "Cf"):
+            continue
+        width += 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+    return width
+
+
+def _justify(text, width, align):
+    """ Выравнивание ячейки: "l", "r" или "c" (по центру, как str.center). """
+    excess = width - _text_width(text)
+    if align == "l":
+        return text + " " * excess
+    if align == "r":
+        return " " * excess + text
+    left = excess // 2
+    if excess % 2 and not _text_width(text) % 2:
+        left += 1
+    return " " * left + text + " " * (excess - left)
+
+
+def _cell_width(value, max_width=None):
+    """ Ширина ячейки по самой длинной строке значения (не больше max_width). """
+    width = max(_text_width(line) for line in value.split("\n"))
+    return min(width, max_width) if max_width else width
+
+
+def compute_widths(columns, rows):
+    """
+    Ширины столбцов за один проход по строкам.
+        :param columns: список кортежей (название, выравнивание[, макс. ширина])
+        :param rows: список строк таблицы (значения уже приведены к str)
+        :return: список ширин
+    """
+    widths = [_text_width(column[0]) for column in columns]
+    limits = [column[2] if len(column) > 2 else None for column in columns]
+    for row in rows:
+        for index, value in enumerate(row):
+            width = _cell_width(value, limits[index])
+            if width > widths[index]:
+                widths[index] = width
+    return widths
+
+
+def _wrap(line, width):
+    """
+    Перенос строки по словам, как textwrap.fill. Частый случай — слова через одиночный пробел,
+    без дефисов и табуляций, ни одно слово не длиннее ширины — обрабатывается без textwrap.
+    """
+    if ("  " in line or "-" in line or line[:1] == " " or line[-1:] == " "
+            or any(char in line for char in "\t\n\x0b\x0c\r")):
+        return textwrap.fill(line, width).split("\n")
+    words = line.split(" ")
+    if any(len(word) > width for word in words):
+        return textwrap.fill(line, width).split("\n")
+    lines = []
+    current = words[0]
+    for word in words[1:]:
+        if len(current) + 1 + len(word) <= width:
+            current += " " + word
+        else:
+            lines.append(current)
+            current = word
+    lines.append(current)
+    return lines
+
+
+def _row_lines(cells, widths, aligns):
+    """
+    Строки вывода для одной строки таблицы. Значения длиннее ширины столбца переносятся
+    по словам один раз; короткие столбцы дополняются пустыми строками снизу.
+    """
+    columns = []
+    for value, width in zip(cells, widths):
+        lines = []
+        for line in value.split("\n"):
+            if _text_width(line) > width:
+                lines.extend(_wrap(line, width))
+            else:
+                lines.append(line)
+        columns.append(lines)
+    height = max(len(lines) for lines in columns)
+    return ["|" + "|".join(f" {_justify(lines[y] if y < len(lines) else '', width, align)} "
+                           for lines, width, align in zip(columns, widths, aligns)) + "|"
+            for y in range(height)]
+
+
+def render_table(columns, rows, out=None, color=None, widths=None, chunk_rows=TABLE_CHUNK_ROWS):
+    """
+    Выводит таблицу в стиле PrettyTable (рамка из +, - и |; заголовок выравнивается как столбец),
+    записывая её в поток частями по chunk_rows строк, а не одной строкой целиком.
+    Если ширины заданы, строки не загружаются в память: подходит для выгрузок любого размера.
+        :param columns: список кортежей (название, выравнивание "l"/"c"/"r"[, макс. ширина])
+        :param rows: итерируемое строк таблицы (кортежи значений)
+        :param out: текстовый поток (по умолчанию sys.stdout)
+        :param color: цвет colorama для всей таблицы или None — без цвета
+        :param widths: фиксированные ширины столбцов; None — вычислить по всем строкам
+        :param chunk_rows: количество строк таблицы в одной записи в поток
+        :return: кортеж (количество строк таблицы, количество записанных символов без цветовых кодов)
+    """
+    out = out if out is not None else sys.stdout
+    prefix = color if color and COLOR_OUTPUT else ""
+    aligns = [column[1] for column in columns]
+    if widths is None:
+        rows = [[str(value) for value in row] for row in rows]
+        if not rows:
+            out.write(prefix + "\n")       # как print(str(PrettyTable())) для пустой таблицы
+            return 0, 1
+        widths = compute_widths(columns, rows)
+    else:
+        rows = ([str(value) for value in row] for row in rows)
+
+    hrule = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    header = [column[0] if _text_width(column[0]) <= width else column[0][:width]
+              for column, width in zip(columns, widths)]
+    lines = [hrule, *_row_lines(header, widths, aligns), hrule]
+    count = written = 0
+    for cells in rows:
+        lines.extend(_row_lines(cells, widths, aligns))
+        count += 1
+        if count % chunk_rows == 0:
+            text = "\n".join(lines) + "\n"
+            out.write(prefix + text)        # цвет ставится на каждую запись: colorama сбрасывает его
+            written += len(text)
+            lines = []
+    lines.append(hrule)
+    text = "\n".join(lines) + "\n"
+    out.write(prefix + text)
+    return count, written + len(text)
+
+
+def _print_table(color, columns, rows, name):
+    """
+    Выводит таблицу в консоль и записывает время отрисовки, число строк и объём текста
+    в метрику "render.<name>".
+        :param color: цвет colorama (например, Fore.YELLOW)
+        :param columns: столбцы (см. render_table)
+        :param rows: строки таблицы
+        :param name: имя функции вывода
+        :return: None
+    """
+    with metrics.measure(f"render.{name}") as sample:
+        sample["rows"], sample["bytes"] = render_table(columns, rows, color=color)
+
+
 def print_film_results_table(results):
     """
     Отображает список фильмов в виде таблицы (название, год, рейтинг, длительность).
@@ -16,15 +176,8 @@ def print_film_results_table(results):
         return
 
     print(Fore.YELLOW + "\nРезультаты поиска фильмов:")
-    table = PrettyTable()
-    table.field_names = ["Название", "Год", "Рейтинг", "Длительность (мин.)"]
-    table.align["Название"] = "l"
-    table.align["Рейтинг"] = "l"
-
-    for row in results:
-        table.add_row(row)
-
-    print(Fore.YELLOW + str(table))
+    columns = [("Название", "l"), ("Год", "c"), ("Рейтинг", "l"), ("Длительность (мин.)", "c")]
+    _print_table(Fore.YELLOW, columns, results, "print_film_results_table")
 
 
 def print_genre_results_table(data):
@@ -38,14 +191,8 @@ def print_genre_results_table(data):
         return
 
     print(Fore.YELLOW + "\nРезультаты поиска фильмов по жанру и диапазону годов:")
-    table = PrettyTable()
-    table.field_names = ["Название", "Год", "Жанр"]
-    table.align["Название"] = "l"
-
-    for title, year, genre in data:
-        table.add_row([title, year, genre])
-
-    print(Fore.YELLOW + str(table))
+    columns = [("Название", "l"), ("Год", "c"), ("Жанр", "c")]
+    _print_table(Fore.YELLOW, columns, data, "print_genre_results_table")
 
 
 def print_actor_results_table(data):
@@ -59,15 +206,8 @@ def print_actor_results_table(data):
         return
 
     print(Fore.YELLOW + "\nРезультаты поиска фильмов с участием актёра:")
-    table = PrettyTable()
-    table.field_names = ["Название", "Год", "Актёр"]
-    table.align["Название"] = "l"
-    table.align["Актёр"] = "l"
-
-    for title, year, actor in data:
-        table.add_row([title, year, actor])
-
-    print(Fore.YELLOW + str(table))
+    columns = [("Название", "l"), ("Год", "c"), ("Актёр", "l")]
+    _print_table(Fore.YELLOW, columns, data, "print_actor_results_table")
 
 
 def print_description_results_table(data):
@@ -81,16 +221,8 @@ def print_description_results_table(data):
         return
 
     print(Fore.YELLOW + "\nРезультаты поиска фильмов по описанию:")
-    table = PrettyTable()
-    table.field_names = ["Название", "Год", "Описание"]
-    table.align["Название"] = "l"
-    table.align["Описание"] = "l"
-    table.max_width["Описание"] = 100
-
-    for title, year, description in data:
-        table.add_row([title, year, description])
-
-    print(Fore.YELLOW + str(table))
+    columns = [("Название", "l"), ("Год", "c"), ("Описание", "l", 100)]
+    _print_table(Fore.YELLOW, columns, data, "print_description_results_table")
 
 
 def print_genre_and_year_info(genres, year_range):
@@ -133,49 +265,45 @@ def print_latest_queries_table(results):
         print(Fore.GREEN + "Нет данных.")
         return
 
-    table = PrettyTable()
-    table.field_names = ["Тип запроса", "Параметры", "Время"]
-    table.align["Тип запроса"] = "l"
-    table.align["Параметры"] = "l"
-
+    columns = [("Тип запроса", "l"), ("Параметры", "l"), ("Время", "c")]
+    rows = []
     for item in results:
         query_type = item["_id"]["query_type"]
         params = item["_id"]["parameters"]
         ts = item["timestamp"].strftime("%Y-%m-%d %H:%M:%S")
-        table.add_row([query_type, str(params), ts])
+        rows.append((query_type, str(params), ts))
 
     print(Fore.GREEN + "\nПоследние 5 уникальных запросов:")
-    print(Fore.GREEN + str(table))
+    _print_table(Fore.GREEN, columns, rows, "print_latest_queries_table")
 
 
 def print_error_log_table(errors):
     """
     Отображает последние 5 ошибок программы в виде таблицы.
         :param errors: список словарей с информацией об ошибках, где каждый словарь может содержать:
-        - timestamp: время возникновения ошибки (datetime или строка)
+        - timestamp: время возникновения (последнего повтора) ошибки (datetime или строка)
         - source / function: источник или название функции, вызвавшей ошибку
         - message: текст сообщения об ошибке
+        - count, first_seen: число свёрнутых повторов и время первого из них (если есть)
         :return: None (результаты выводятся в консоль; сообщение обрезается до 60 символов)
     """
     if not errors:
         print(Fore.GREEN + "Нет ошибок в журнале.")
         return
 
-    table = PrettyTable()
-    table.field_names = ["Время", "Источник", "Сообщение"]
-    table.align["Источник"] = "l"
-    table.align["Сообщение"] = "l"
-    table.max_width["Сообщение"] = 60
-
+    columns = [("Время", "c"), ("Источник", "l"), ("Повторов", "c"), ("Впервые", "c"), ("Сообщение", "l", 60)]
+    rows = []
     for err in errors:
         ts = err.get("timestamp", "N/A")
         ts_str = ts.strftime("%Y-%m-%d %H:%M:%S") if hasattr(ts, 'strftime') else str(ts)
+        first_seen = err.get("first_seen")
+        first_str = first_seen.strftime("%H:%M:%S") if hasattr(first_seen, 'strftime') else "-"
         source = err.get("function", err.get("source", "неизвестно"))
         msg = err.get("message", "")
-        table.add_row([ts_str, source, msg])
+        rows.append((ts_str, source, err.get("count", 1), first_str, msg))
 
     print(Fore.RED + "\nПоследние 5 ошибок:")
-    print(Fore.RED + str(table))
+    _print_table(Fore.RED, columns, rows, "print_error_log_table")
 
 
 def print_top_queries_table(results):
@@ -190,18 +318,97 @@ def print_top_queries_table(results):
         print(Fore.GREEN + "Нет данных.")
         return
 
-    table = PrettyTable()
-    table.field_names = ["Тип запроса", "Параметры", "Частота", "Последний вызов"]
-    table.align["Тип запроса"] = "l"
-    table.align["Параметры"] = "l"
-
+    columns = [("Тип запроса", "l"), ("Параметры", "l"), ("Частота", "c"), ("Последний вызов", "c")]
+    rows = []
     for item in results:
         query_type = item["_id"]["query_type"]
         params = item["_id"]["parameters"]
         count = item["count"]
         last_used = item.get("last_used")
         ts_str = last_used.strftime("%Y-%m-%d %H:%M:%S") if last_used else "N/A"
-        table.add_row([query_type, str(params), count, ts_str])
+        rows.append((query_type, str(params), count, ts_str))
 
     print(Fore.GREEN + "\nТОП 5 популярных запросов:")
-    print(Fore.GREEN + str(table))
+    _print_table(Fore.GREEN, columns, rows, "print_top_queries_table")
+
+
+def _ms(value):
+    """ Время в мс для таблицы производительности (N/A, если замеров нет). """
+    return "N/A" if value is None else f"{value:.1f}"
+
+
+def print_performance_table(query_stats, session_stats):
+    """
+    Отображает задержки поисковых запросов: по журналу MongoDB (по типам запросов)
+    и по метрикам текущего сеанса (запросы к БД, запись логов, вывод таблиц).
+        :param query_stats: список словарей query_type, count, p50_ms, p95_ms, p99_ms, max_ms
+        :param session_stats: список словарей metrics.get_metrics()
+        :return: None (результаты выводятся в консоль)
+    """
+    if not query_stats and not session_stats:
+        print(Fore.GREEN + "Нет данных.")
+        return
+
+    if query_stats:
+        columns = [("Тип запроса", "l"), ("Запросов", "c"), ("p50, мс", "c"), ("p95, мс", "c"),
+                   ("p99, мс", "c"), ("Макс., мс", "c")]
+        rows = [(item["query_type"], item["count"], _ms(item["p50_ms"]), _ms(item["p95_ms"]),
+                 _ms(item["p99_ms"]), _ms(item["max_ms"])) for item in query_stats]
+        print(Fore.GREEN + "\nЗадержки поисковых запросов (журнал):")
+        _print_table(Fore.GREEN, columns, rows, "print_performance_table")
+
+    if session_stats:
+        columns = [("Операция", "l"), ("Вызовов", "c"), ("Ошибок", "c"), ("p50, мс", "c"), ("p95, мс", "c"),
+                   ("p99, мс", "c"), ("Строк", "c"), ("Байт", "c")]
+        rows = [(item["name"], item["count"], item["errors"], _ms(item["p50_ms"]), _ms(item["p95_ms"]),
+                 _ms(item["p99_ms"]), item["rows"], item["bytes"]) for item in session_stats]
+        print(Fore.GREEN + "\nТекущий сеанс (гистограммы в памяти):")
+        _print_table(Fore.GREEN, columns, rows, "print_performance_table")
+
+
+def print_result_cache_stats(stats):
+    """
+    Отображает счётчики кэша результатов поиска.
+        :param stats: словарь result_cache.get_result_cache_stats()
+        :return: None (результаты выводятся в консоль)
+    """
+    rate = stats["hit_rate"]
+    rows = [
+        ("Попаданий (память)", stats["hits"]),
+        ("Попаданий (диск)", stats["disk_hits"] if stats["disk_entries"] is not None else "выключен"),
+        ("Промахов", stats["misses"]),
+        ("Доля попаданий", f"{rate:.1%}" if rate is not None else "-"),
+        ("Вытеснено (LRU)", stats["evictions"]),
+        ("Устарело (TTL)", stats["expired"]),
+        ("Сбросов при изменении данных", stats["invalidations"]),
+        ("Страниц в памяти", stats["entries"]),
+        ("Объём в памяти, байт", stats["bytes"]),
+        ("Страниц на диске", stats["disk_entries"] if stats["disk_entries"] is not None else "-"),
+    ]
+    print(Fore.GREEN + "\nКэш результатов поиска:")
+    _print_table(Fore.GREEN, [("Показатель", "l"), ("Значение", "r")], rows, "print_result_cache_stats")
+
+
+BUCKET_FORMATS = {"minute": "%Y-%m-%d %H:%M", "hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d"}
+
+
+def print_query_volume_table(rows, unit):
+    """
+    Отображает объём запросов по интервалам времени и типам запросов.
+        :param rows: список словарей log_stats.get_query_volume()
+        :param unit: "minute", "hour" или "day" (формат начала интервала)
+        :return: None (результаты выводятся в консоль; незавершённые интервалы отмечены «*»)
+    """
+    if not rows:
+        print(Fore.GREEN + "Нет данных.")
+        return
+
+    columns = [("Интервал", "l"), ("Тип запроса", "l"), ("Запросов", "r"), ("Без результатов", "r"),
+               ("Найдено в среднем", "r")]
+    rows = [(item["start"].strftime(BUCKET_FORMATS[unit]) + ("" if item["complete"] else " *"),
+             item["query_type"], item["count"],
+             f"{item['zero_rate']:.1%}" if item["zero_rate"] is not None else "-",
+             f"{item['avg_result_count']:.1f}" if item["avg_result_count"] is not None else "-")
+            for item in rows]
+    print(Fore.GREEN + "\nОбъём запросов по интервалам (* — интервал ещё не завершён):")
+    _print_table(Fore.GREEN, columns, rows, "print_query_volume_table")
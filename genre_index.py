@@ -0,0 +1,394 @@
+# ● genre_index.py — битовый индекс в памяти: битсеты по жанрам, годам выпуска и рейтингам
+
+import os
+import time
+import threading
+from bisect import bisect_right
+
+import numpy as np
+import pymysql
+from log_writer import log_error
+from mysql_connector import (PAGE_SIZE, encode_page_token, decode_page_token, normalize_film_filters,
+                             get_data_versions, year_key)
+
+CHECK_SECONDS = float(os.getenv("GENRE_INDEX_CHECK_SECONDS", "60"))     # как часто сверять индекс с таблицами
+OVERLAP_SECONDS = 60            # перекрытие окна last_update при дочитывании film_category
+BITMAP_FILTERS = {"genre", "year_start", "year_end", "rating"}          # фильтры, которые обслуживает индекс
+
+_index = None                   # текущий индекс (словарь), заменяется целиком при перестроении
+_lock = threading.Lock()
+_build_lock = threading.Lock()      # индекс строит один поток, остальные ждут и берут готовый
+
+
+def _table_version(connection, fresh=False):
+    """
+    Получает «версию» таблиц film, category и film_category из общей сверки
+    mysql_connector.get_data_versions: (MAX(last_update), COUNT(*)) каждой.
+        :param connection: подключение к БД
+        :param fresh: True — сверить сразу (перед загрузкой), а не взять результат фоновой сверки
+        :return: словарь {таблица: (max_last_update, count)} или None, если версия неизвестна
+    """
+    versions = get_data_versions(connection, fresh)
+    if versions is None:
+        return None
+    return {table: versions[table] for table in ("film", "category", "film_category")}
+
+
+def _bit_masks(positions):
+    """
+    Байты и маски битов для позиций в упакованном битсете (порядок битов — как у np.packbits).
+        :param positions: последовательность позиций фильмов
+        :return: кортеж (массив номеров байтов, массив масок uint8)
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    return positions >> 3, (0x80 >> (positions & 7)).astype(np.uint8)
+
+
+def _empty_bits(rows, size):
+    """ Пустые упакованные битсеты: массив uint8 формы (rows, ceil(size / 8)). """
+    return np.zeros((rows, (size + 7) // 8), dtype=np.uint8)
+
+
+def _bitsets(positions_by_key, size):
+    """
+    Строит упакованные битсеты (бит = позиция фильма в отсортированном каталоге).
+    Биты ставятся прямо в массив uint8, без промежуточной матрицы bool.
+        :param positions_by_key: словарь {ключ: список позиций}
+        :param size: количество фильмов
+        :return: кортеж (список ключей, массив uint8 формы (len(ключей), ceil(size / 8)))
+    """
+    keys = sorted(positions_by_key, key=str)
+    bits = _empty_bits(len(keys), size)
+    for row, key in enumerate(keys):
+        byte_index, masks = _bit_masks(positions_by_key[key])
+        np.bitwise_or.at(bits[row], byte_index, masks)
+    return keys, bits
+
+
+def _set_genre_bits(index, genre_bits, pairs):
+    """
+    Ставит биты жанров по парам (film_id, category_id) в упакованном массиве;
+    фильмы, которых нет в каталоге индекса, пропускаются.
+        :return: None (genre_bits изменяется на месте)
+    """
+    row_of = {category_id: row for row, category_id in enumerate(index["category_ids"])}
+    rows, positions = [], []
+    for film_id, category_id in pairs:
+        pos = index["pos_of"].get(film_id)
+        row = row_of.get(category_id)
+        if pos is not None and row is not None:
+            rows.append(row)
+            positions.append(pos)
+    if positions:
+        byte_index, masks = _bit_masks(positions)
+        np.bitwise_or.at(genre_bits, (np.array(rows, dtype=np.int64), byte_index), masks)
+
+
+def _genre_bitsets(index, pairs):
+    """
+    Битсеты жанров по парам (film_id, category_id); фильмы, которых нет в каталоге индекса, пропускаются.
+        :return: массив uint8 формы (len(index["category_ids"]), ceil(size / 8))
+    """
+    genre_bits = _empty_bits(len(index["category_ids"]), index["size"])
+    _set_genre_bits(index, genre_bits, pairs)
+    return genre_bits
+
+
+def _all_bits(size):
+    """ Битсет «все фильмы»: size единичных битов, хвост последнего байта — нули. """
+    bits = np.full((size + 7) // 8, 0xFF, dtype=np.uint8)
+    if size % 8:
+        bits[-1] = (0xFF << (8 - size % 8)) & 0xFF
+    return bits
+
+
+def load_genre_index(connection):
+    """
+    Загружает каталог фильмов, жанры и связи film_category и строит битовый индекс.
+    Позиция фильма — его место в порядке (release_year, title, film_id), поэтому позиции
+    из битсета уже отсортированы так, как ORDER BY в search_films_by_genre_and_years.
+        :param connection: подключение к БД
+        :return: словарь индекса или None в случае ошибки
+    """
+    global _index
+    version = _table_version(connection, fresh=True)
+    if version is None:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT film_id, title, release_year, rating FROM film;")
+            films = list(cursor.fetchall())
+            cursor.execute("SELECT category_id, name FROM category;")
+            categories = list(cursor.fetchall())
+            cursor.execute("SELECT film_id, category_id FROM film_category;")
+            pairs = list(cursor.fetchall())
+    except pymysql.MySQLError as e:
+        print("Ошибка загрузки данных для битового индекса жанров.")
+        print(f"MySQL Error: {e}")
+        log_error("load_genre_index", str(e))
+        return None
+
+    # NULL-год — первым, как в ORDER BY MySQL
+    films.sort(key=lambda r: (year_key(r[2]), (r[1] or "").lower(), r[0]))
+    size = len(films)
+    rows_by_year, rows_by_rating = {}, {}
+    for pos, (film_id, title, year, rating) in enumerate(films):
+        if year is not None:
+            rows_by_year.setdefault(int(year), []).append(pos)
+        if rating is not None:
+            rows_by_rating.setdefault(str(rating), []).append(pos)
+    year_keys, year_bits = _bitsets(rows_by_year, size)
+    rating_keys, rating_bits = _bitsets(rows_by_rating, size)
+    by_title = sorted(range(size), key=lambda p: ((films[p][1] or "").lower(), films[p][0]))
+    title_rank = np.empty(size, dtype=np.int64)
+    title_rank[by_title] = np.arange(size)
+
+    names = {}
+    for category_id, name in categories:
+        names.setdefault(name.lower(), []).append((category_id, name))
+    index = {
+        "size": size,
+        "films": films,                                         # (film_id, title, release_year, rating)
+        "pos_of": {film[0]: pos for pos, film in enumerate(films)},
+        "keys": [(year_key(f[2]), (f[1] or "").lower(), f[0]) for f in films],
+        "title_keys": [((films[p][1] or "").lower(), films[p][0]) for p in by_title],
+        "by_title": np.array(by_title, dtype=np.int64),         # ранг по (title, film_id) -> позиция
+        "title_rank": title_rank,                               # позиция -> ранг по (title, film_id)
+        "all": _all_bits(size),
+        "years": np.array(year_keys, dtype=np.int64),
+        "year_bits": year_bits,
+        "ratings": {rating: row for row, rating in enumerate(rating_keys)},
+        "rating_bits": rating_bits,
+        "genres": names,                                        # жанр в нижнем регистре -> [(category_id, name)]
+        "category_ids": [category_id for category_id, _ in categories],
+        "version": version,
+        "checked_at": time.monotonic(),
+    }
+    index["genre_bits"] = _genre_bitsets(index, pairs)
+    with _lock:
+        _index = index
+    return index
+
+
+def _reload_genres(connection, index, version):
+    """ Перечитывает film_category целиком и строит битсеты жанров заново. """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT film_id, category_id FROM film_category;")
+        return dict(index, genre_bits=_genre_bitsets(index, cursor.fetchall()),
+                    version=version, checked_at=time.monotonic())
+
+
+def _refresh_genres(connection, index, version):
+    """
+    Обновляет только битсеты жанров, когда изменилась лишь film_category: перечитываются связи фильмов,
+    у которых есть строки с last_update не раньше прежнего MAX(last_update) (вставки и изменения),
+    их биты снимаются и ставятся заново. Удаления last_update не отражает: если число установленных
+    битов не сошлось с COUNT(*), film_category перечитывается целиком.
+    Каталог фильмов, битсеты годов и рейтингов и порядок сортировки не перестраиваются.
+        :return: новый словарь индекса
+    """
+    old_max, _ = index["version"]["film_category"]
+    if old_max is None:
+        return _reload_genres(connection, index, version)
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT film_id FROM film_category
+            WHERE last_update >= %s - INTERVAL %s SECOND;
+        """, (old_max, OVERLAP_SECONDS))
+        film_ids = [row[0] for row in cursor.fetchall() if row[0] in index["pos_of"]]
+        pairs = []
+        if film_ids:
+            cursor.execute(f"""
+                SELECT film_id, category_id FROM film_category
+                WHERE film_id IN ({", ".join(["%s"] * len(film_ids))});
+            """, film_ids)
+            pairs = list(cursor.fetchall())
+    genre_bits = index["genre_bits"].copy()
+    if film_ids:
+        byte_index, masks = _bit_masks([index["pos_of"][film_id] for film_id in film_ids])
+        for row in genre_bits:                  # связи изменённых фильмов ставятся заново
+            np.bitwise_and.at(row, byte_index, ~masks)
+        _set_genre_bits(index, genre_bits, pairs)
+    if int(np.bitwise_count(genre_bits).sum()) != version["film_category"][1]:
+        return _reload_genres(connection, index, version)      # были удаления
+    return dict(index, genre_bits=genre_bits, version=version, checked_at=time.monotonic())
+
+
+def get_genre_index(connection):
+    """
+    Возвращает индекс, при необходимости загружая его. Не чаще раза в CHECK_SECONDS сверяет версии таблиц:
+    изменения film или category перестраивают индекс целиком, изменения film_category — только битсеты жанров.
+    Строит и обновляет индекс один поток (_build_lock); одновременные вызовы получают уже построенный.
+        :param connection: подключение к БД или None (MySQL недоступен)
+        :return: словарь индекса или None
+    """
+    global _index
+    index = _index
+    if index is None:
+        if connection is None:
+            return None
+        with _build_lock:
+            if _index is None:          # другой поток мог построить индекс, пока мы ждали
+                return load_genre_index(connection)
+            return _index
+    if connection is None or time.monotonic() - index["checked_at"] < CHECK_SECONDS:
+        return index                # без MySQL — отвечаем по последнему индексу
+    version = _table_version(connection)
+    if version is None:
+        return index                # версия неизвестна — отвечаем по последнему индексу
+    if version == index["version"]:
+        index["checked_at"] = time.monotonic()
+        return index
+    with _build_lock:
+        if _index is not index:         # индекс уже обновил другой поток
+            return _index
+        try:
+            if version["film"] != index["version"]["film"] or version["category"] != index["version"]["category"]:
+                return load_genre_index(connection) or index
+            index = _refresh_genres(connection, index, version)
+        except pymysql.MySQLError as e:
+            log_error("get_genre_index", str(e))
+            return index            # сервер недоступен — отвечаем по последнему индексу
+        with _lock:
+            _index = index
+    return index
+
+
+def _match(index, genre=None, year_start=None, year_end=None, rating=None):
+    """
+    Пересекает битсеты (побитовые AND/OR над массивами numpy) и возвращает позиции фильмов.
+        :param genre: название жанра или None
+        :param year_start: начальный год или None
+        :param year_end: конечный год или None
+        :param rating: рейтинг или None
+        :return: кортеж (отсортированный массив позиций, название жанра из БД или None)
+                 или None, если жанру соответствует несколько категорий (такой запрос выполнит MySQL)
+    """
+    mask = index["all"]
+    name = None
+    if genre is not None:
+        matches = index["genres"].get(genre.rstrip(" ").lower(), [])     # хвостовые пробелы MySQL не учитывает
+        if len(matches) > 1:
+            return None
+        if not matches:
+            return np.array([], dtype=np.int64), None
+        category_id, name = matches[0]
+        mask = mask & index["genre_bits"][index["category_ids"].index(category_id)]
+    if year_start is not None or year_end is not None:
+        years = index["years"]
+        selected = np.ones(len(years), dtype=bool)
+        if year_start is not None:
+            selected &= years >= int(year_start)
+        if year_end is not None:
+            selected &= years <= int(year_end)
+        if not selected.any():
+            return np.array([], dtype=np.int64), name
+        mask = mask & np.bitwise_or.reduce(index["year_bits"][selected], axis=0)
+    if rating is not None:
+        row = index["ratings"].get(rating)
+        if row is None:
+            return np.array([], dtype=np.int64), name
+        mask = mask & index["rating_bits"][row]
+    return np.flatnonzero(np.unpackbits(mask, count=index["size"])), name
+
+
+# Функция 2 (битовый индекс)
+def search_films_by_genre_and_years(connection, genre, year_start, year_end, offset):
+    """
+    Поиск фильмов по жанру и диапазону годов выпуска по битовому индексу.
+        :return: список фильмов (film_id, title, release_year, genre) или NotImplemented
+    """
+    if not genre.isascii():
+        return NotImplemented       # сравнение без учёта акцентов (*_ai_ci) выполняет MySQL
+    index = get_genre_index(connection)
+    if index is None:
+        return NotImplemented
+    matched = _match(index, genre, year_start, year_end)
+    if matched is None:
+        return NotImplemented
+    positions, name = matched
+    films = index["films"]
+    return [(films[p][0], films[p][1], films[p][2], name)
+            for p in positions[int(offset):int(offset) + PAGE_SIZE]]
+
+
+def search_films_by_genre_and_years_page(connection, genre, year_start, year_end,
+                                         page_token=None, page_size=PAGE_SIZE, with_total=False):
+    """
+    Поиск фильмов по жанру и диапазону годов по битовому индексу с keyset-пагинацией
+    по ключу (release_year, title, film_id). Строки страницы берутся из каталога индекса.
+        :return: кортеж (список фильмов (film_id, title, release_year, genre),
+                 токен следующей страницы или None[, общее число совпадений]) или NotImplemented
+    """
+    if not genre.isascii():
+        return NotImplemented
+    try:
+        after = decode_page_token("genre_year", page_token, 3)
+    except ValueError:
+        return NotImplemented       # сообщение об ошибке выдаст MySQL-версия функции
+    index = get_genre_index(connection)
+    if index is None:
+        return NotImplemented
+    matched = _match(index, genre, year_start, year_end)
+    if matched is None:
+        return NotImplemented
+    positions, name = matched
+    start = 0
+    if after:
+        boundary = bisect_right(index["keys"], (after[0], (after[1] or "").lower(), after[2]))
+        start = int(np.searchsorted(positions, boundary))
+    films = index["films"]
+    page = [(films[p][0], films[p][1], films[p][2], name) for p in positions[start:start + page_size]]
+    token = None
+    if start + page_size < len(positions):
+        token = encode_page_token("genre_year", (year_key(page[-1][2]), page[-1][1], page[-1][0]))
+    return (page, token, len(positions)) if with_total else (page, token)
+
+
+def search_films_filtered_page(connection, filters, page_token=None, page_size=PAGE_SIZE, with_total=False):
+    """
+    Комбинированный поиск по битовому индексу, если заданы только жанр, годы и рейтинг.
+    Отбор и сортировка по (title, film_id) выполняются в памяти, из MySQL читаются
+    только строки итоговой страницы (по первичному ключу).
+        :return: кортеж (список фильмов (film_id, title, release_year, rating, length),
+                 токен следующей страницы или None[, общее число совпадений]) или NotImplemented
+    """
+    try:
+        filters = normalize_film_filters(filters)
+        after = decode_page_token("filters", page_token, 2)
+    except ValueError:
+        return NotImplemented
+    if connection is None or not set(filters) <= BITMAP_FILTERS or not filters.get("genre", "").isascii():
+        return NotImplemented
+    index = get_genre_index(connection)
+    if index is None:
+        return NotImplemented
+    matched = _match(index, filters.get("genre"), filters.get("year_start"), filters.get("year_end"),
+                     filters.get("rating"))
+    if matched is None:
+        return NotImplemented
+    ranks = np.sort(index["title_rank"][matched[0]])
+    start = 0
+    if after:
+        start = int(np.searchsorted(ranks, bisect_right(index["title_keys"], ((after[0] or "").lower(), after[1]))))
+    film_ids = [index["films"][p][0] for p in index["by_title"][ranks[start:start + page_size]]]
+    rows = []
+    if film_ids:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT film_id, title, release_year, rating, length
+                    FROM film
+                    WHERE film_id IN ({", ".join(["%s"] * len(film_ids))});
+                """, film_ids)
+                by_id = {row[0]: row for row in cursor.fetchall()}
+        except pymysql.MySQLError as e:
+            log_error("genre_index.search_films_filtered_page", str(e))
+            return NotImplemented
+        if len(by_id) != len(film_ids):
+            return NotImplemented   # фильм удалён после сверки индекса — запрос выполнит MySQL
+        rows = [by_id[film_id] for film_id in film_ids]
+    token = None
+    if start + page_size < len(ranks):
+        token = encode_page_token("filters", (rows[-1][1], rows[-1][0]))
+    return (rows, token, len(ranks)) if with_total else (rows, token)
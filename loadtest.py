@@ -0,0 +1,114 @@
+# ● loadtest.py — нагрузочный тест HTTP-сервиса (server.py): пропускная способность и задержки p50/p99
+
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+# набор запросов по умолчанию: смесь всех типов поиска, справочников и статистики
+DEFAULT_REQUESTS = [
+    ("/films/keyword", {"keyword": "ace"}),
+    ("/films/keyword", {"keyword": "love"}),
+    ("/films/genre-year", {"genre": "Action", "year_start": 2006, "year_end": 2006}),
+    ("/films/actor", {"actor_name": "penelope"}),
+    ("/films/description", {"keyword": "drama"}),
+    ("/genres", {}),
+    ("/years", {}),
+    ("/films/count-by-year", {}),
+    ("/stats/top-queries", {}),
+    ("/stats/errors", {}),
+]
+
+
+def percentile(sorted_values, pct):
+    """
+    Перцентиль по отсортированному списку (метод ближайшего ранга).
+        :param sorted_values: отсортированный список чисел
+        :param pct: перцентиль, 0..100
+        :return: значение перцентиля или None для пустого списка
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_load(base_url, requests, concurrency=8, total=1000, timeout=10.0):
+    """
+    Отправляет total запросов из concurrency потоков (запросы берутся из списка по кругу).
+        :param base_url: адрес сервиса, например http://127.0.0.1:8000
+        :param requests: список кортежей (путь, параметры)
+        :param concurrency: число параллельных клиентов
+        :param total: общее число запросов
+        :param timeout: таймаут одного запроса, сек.
+        :return: словарь итогов: requests, errors, statuses, elapsed_s, throughput_rps, p50_ms, p99_ms, max_ms
+    """
+    urls = [f"{base_url.rstrip('/')}{path}" + (f"?{urlencode(params)}" if params else "")
+            for path, params in requests]
+    counter = iter(range(total))
+    lock = threading.Lock()
+    latencies = []
+    statuses = {}
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            try:
+                with urlopen(urls[i % len(urls)], timeout=timeout) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            except (URLError, OSError):
+                status = "connection_error"
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status != 200),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест HTTP-сервиса поиска фильмов.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="адрес сервиса")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000, help="общее число запросов")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--requests-file", help="JSON-список [путь, параметры] вместо набора по умолчанию")
+    args = parser.parse_args()
+
+    requests = DEFAULT_REQUESTS
+    if args.requests_file:
+        with open(args.requests_file, encoding="utf-8") as f:
+            requests = [tuple(item) for item in json.load(f)]
+    summary = run_load(args.url, requests, args.concurrency, args.requests, args.timeout)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    sys.exit(0 if summary["errors"] == 0 else 1)
@@ -1,20 +1,61 @@
-# ● log_stats.py — получение статистики из MongoDB (частые и последние запросы)
+# ● log_stats.py — получение статистики из MongoDB (частые и последние запросы, объём по интервалам)
 
-from mongo_connector import get_mongo_connection
+import os
+import argparse
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from mongo_connector import (get_collection, QUERIES_COLLECTION, ERRORS_COLLECTION, QUERY_STATS_COLLECTION,
+                             QUERY_STATS_META_COLLECTION, QUERY_BUCKETS_COLLECTION)
+from log_writer import summarize_queries, ensure_query_summary_indexes, update_query_summary
+from metrics import percentiles
+
+# интервалы объёма запросов ($dateTrunc): единица -> длительность интервала
+BUCKET_UNITS = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+BUCKET_DEFAULT_COUNT = {"minute": 60, "hour": 24, "day": 30}     # интервалов на экране по умолчанию
+# запись журнала может прийти позже своего времени (фоновая запись логов) — такой хвост пересчитывается
+QUERY_BUCKETS_LATE_SECONDS = int(os.getenv("QUERY_BUCKETS_LATE_SECONDS", "60"))
+
+
+def _summary_to_stats(doc, time_field):
+    """
+    Приводит документ сводки к формату результатов $group по сырому журналу
+    ({"_id": {"query_type", "parameters"}, ...}), который ожидает formatter.
+    """
+    return {
+        "_id": {"query_type": doc.get("query_type"), "parameters": doc.get("parameters")},
+        "count": doc.get("count", 0),
+        time_field: doc.get("last_used"),
+    }
+
+
+SUMMARY_MARKER = "query_summary"        # _id отметки в QUERY_STATS_META_COLLECTION
+
+
+def _summary_ready():
+    """
+    True, если сводка популярности хоть раз перестроена по всему журналу (rebuild_query_summary
+    оставляет отметку). До этого в сводке только запросы, записанные после развёртывания,
+    поэтому статистика считается по сырому журналу.
+    """
+    return get_collection(QUERY_STATS_META_COLLECTION).find_one({"_id": SUMMARY_MARKER}) is not None
 
-db = get_mongo_connection()
-queries = db["final_project_queries_170225_DETKOV"]
-errors = db["final_project_errors_170225_DETKOV"]
 
 def get_most_frequent_queries(limit = 5):
     """
     Получает список самых популярных поисковых запросов из MongoDB.
+    Читает top-N из сводки популярности по индексу count; пока сводка пуста —
+    агрегирует сырой журнал запросов.
         :param limit: максимальное количество запросов для вывода (по умолчанию 5)
-        :return: список словарей с информацией о запросах, 
+        :return: список словарей с информацией о запросах,
                  включая тип запроса, параметры, количество повторов и время последнего использования
     """
+    if _summary_ready():
+        return [
+            _summary_to_stats(doc, "last_used")
+            for doc in get_collection(QUERY_STATS_COLLECTION).find().sort("count", -1).limit(limit)
+        ]
     return list(
-        queries.aggregate([
+        get_collection(QUERIES_COLLECTION).aggregate([
             {
                 "$group": {
                     "_id": {
@@ -33,13 +74,20 @@ def get_most_frequent_queries(limit = 5):
 def get_last_unique_queries(limit = 5):
     """
     Получает список последних уникальных поисковых запросов из MongoDB.
+    Читает сводку популярности по индексу last_used; пока сводка пуста —
+    агрегирует сырой журнал запросов.
         :param limit: максимальное количество уникальных запросов (по умолчанию 5)
         :return: список словарей с полями:
             - _id: словарь с типом запроса и параметрами
             - timestamp: время последнего выполнения данного уникального запроса
     """
+    if _summary_ready():
+        return [
+            _summary_to_stats(doc, "timestamp")
+            for doc in get_collection(QUERY_STATS_COLLECTION).find().sort("last_used", -1).limit(limit)
+        ]
     return list(
-        queries.aggregate([
+        get_collection(QUERIES_COLLECTION).aggregate([
             {
                 "$group": {
                     "_id": {
@@ -57,12 +105,188 @@ def get_last_unique_queries(limit = 5):
 def get_last_errors(limit = 5):
     """
     Получает список последних ошибок, записанных в MongoDB.
+    Повторы одной ошибки свёрнуты в документ с count/first_seen/last_seen (см. log_writer.log_error);
+    порядок — по времени последнего повтора (timestamp); сортировку обслуживает индекс timestamp,
+    который создаётся и для capped-коллекции (log_storage.ensure_log_indexes).
         :param limit: максимальное количество ошибок для вывода (по умолчанию 5)
-        :return: список словарей с информацией об ошибках, 
-            источник (source), сообщение (message) и время (timestamp)
+        :return: список словарей с информацией об ошибках,
+            источник (source), сообщение (message), время (timestamp) и, для свёрнутых, count/first_seen
     """
     return list(
-        errors.find()
+        get_collection(ERRORS_COLLECTION).find()
         .sort("timestamp", -1)
         .limit(limit)
     )
+
+def get_query_latency_stats(sample_size = 10000):
+    """
+    Считает перцентили времени выполнения поисковых запросов по типам.
+    Берутся последние sample_size записей журнала, в которых сохранено duration_ms.
+        :param sample_size: максимальное количество последних записей для расчёта
+        :return: список словарей query_type, count, p50_ms, p95_ms, p99_ms, max_ms
+                 (по убыванию числа запросов)
+    """
+    grouped = get_collection(QUERIES_COLLECTION).aggregate([
+        {"$match": {"duration_ms": {"$exists": True}}},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": sample_size},
+        {"$group": {"_id": "$query_type", "durations": {"$push": "$duration_ms"}}}
+    ])
+    stats = []
+    for item in grouped:
+        durations = item["durations"]
+        stats.append({"query_type": item["_id"], "count": len(durations),
+                      **{f"{name}_ms": value for name, value in percentiles(durations).items()},
+                      "max_ms": max(durations)})
+    stats.sort(key=lambda item: item["count"], reverse=True)
+    return stats
+
+def bucket_start(moment, unit):
+    """
+    Начало интервала, в который попадает момент времени (как $dateTrunc на стороне MongoDB).
+        :param moment: datetime
+        :param unit: "minute", "hour" или "day"
+        :return: datetime начала интервала
+    """
+    if unit == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if unit == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def update_query_buckets(unit = "hour", now = None):
+    """
+    Дополняет предагрегированные интервалы объёма запросов по журналу.
+    Пересчёт начинается с последнего сохранённого интервала (он мог быть незавершённым)
+    или с интервала, в который ещё могут прийти запоздавшие записи; более ранние
+    интервалы не перечитываются. Выборка идёт по индексу timestamp.
+        :param unit: "minute", "hour" или "day"
+        :param now: текущее время (по умолчанию datetime.now())
+        :return: количество обновлённых документов интервалов
+    """
+    if unit not in BUCKET_UNITS:
+        raise ValueError(f"Неизвестная единица интервала: {unit}")
+    now = now or datetime.now()
+    settled = bucket_start(now - timedelta(seconds=QUERY_BUCKETS_LATE_SECONDS), unit)
+    buckets = get_collection(QUERY_BUCKETS_COLLECTION)
+    last = buckets.find_one({"unit": unit}, projection={"start": 1}, sort=[("start", -1)])
+    match = {} if last is None else {"timestamp": {"$gte": min(last["start"], settled)}}
+
+    grouped = get_collection(QUERIES_COLLECTION).aggregate([
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    "start": {"$dateTrunc": {"date": "$timestamp", "unit": unit}},
+                    "query_type": "$query_type"
+                },
+                "count": {"$sum": 1},
+                "zero_results": {"$sum": {"$cond": [{"$eq": ["$result_count", 0]}, 1, 0]}},
+                "result_sum": {"$sum": {"$ifNull": ["$result_count", 0]}}
+            }
+        }
+    ], allowDiskUse=True)
+    operations = [
+        UpdateOne(
+            {"unit": unit, "start": item["_id"]["start"], "query_type": item["_id"]["query_type"]},
+            {"$set": {"count": item["count"], "zero_results": item["zero_results"],
+                      "result_sum": item["result_sum"],
+                      "complete": item["_id"]["start"] < settled}},      # интервал больше не изменится
+            upsert=True
+        )
+        for item in grouped
+    ]
+    if operations:
+        buckets.bulk_write(operations, ordered=False)
+    return len(operations)
+
+def get_query_volume(unit = "hour", count = None, now = None):
+    """
+    Возвращает объём запросов по интервалам времени и типам запросов
+    (перед чтением интервалы дополняются новыми записями журнала).
+        :param unit: "minute", "hour" или "day"
+        :param count: количество последних интервалов (по умолчанию BUCKET_DEFAULT_COUNT[unit])
+        :param now: текущее время (по умолчанию datetime.now())
+        :return: список словарей start, query_type, count, zero_results, zero_rate,
+                 avg_result_count, complete (по возрастанию start)
+    """
+    now = now or datetime.now()
+    update_query_buckets(unit, now)
+    count = count or BUCKET_DEFAULT_COUNT[unit]
+    since = bucket_start(now, unit) - BUCKET_UNITS[unit] * (count - 1)
+    docs = get_collection(QUERY_BUCKETS_COLLECTION).find(
+        {"unit": unit, "start": {"$gte": since}}
+    ).sort([("start", 1), ("query_type", 1)])
+    return [
+        {
+            "start": doc["start"],
+            "query_type": doc["query_type"],
+            "count": doc["count"],
+            "zero_results": doc["zero_results"],
+            "zero_rate": doc["zero_results"] / doc["count"] if doc["count"] else None,
+            "avg_result_count": doc["result_sum"] / doc["count"] if doc["count"] else None,
+            "complete": doc.get("complete", False),
+        }
+        for doc in docs
+    ]
+
+def rebuild_query_summary(batch_size = 1000):
+    """
+    Перестраивает сводку популярности запросов по сырому журналу.
+    Сводка собирается во временной коллекции и атомарно подменяет текущую (renameCollection
+    с dropTarget). Журнал читается до последней записи на момент начала; записи, добавленные
+    во время сборки, дочитываются во временную коллекцию перед подменой — приложение и server.py
+    останавливать не нужно (теряются лишь записи, сделанные между дочитыванием и подменой).
+    По окончании записывается отметка, после которой статистика читается из сводки.
+        :param batch_size: количество документов в одной пачке вставки
+        :return: количество уникальных запросов в новой сводке
+    """
+    journal = get_collection(QUERIES_COLLECTION)
+    last = journal.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    grouped = journal.aggregate([
+        {"$match": {"_id": {"$lte": last["_id"]}}},
+        {
+            "$group": {
+                "_id": {"query_type": "$query_type", "parameters": "$parameters"},
+                "count": {"$sum": 1},
+                "timestamp": {"$max": "$timestamp"}
+            }
+        },
+        {"$project": {"_id": 0, "query_type": "$_id.query_type", "parameters": "$_id.parameters",
+                      "count": 1, "timestamp": 1}}
+    ], allowDiskUse=True) if last else []
+    summary = summarize_queries(grouped)     # объединяет группы, совпадающие после канонизации
+
+    staging = get_collection(QUERY_STATS_COLLECTION + "_rebuild")
+    staging.drop()
+    docs = [dict(item, _id=fingerprint) for fingerprint, item in summary.items()]
+    for start in range(0, len(docs), batch_size):
+        staging.insert_many(docs[start:start + batch_size], ordered=False)
+    # записи журнала, сделанные во время сборки: в текущую сводку они уже попали, в новую — ещё нет
+    tail_filter = {"_id": {"$gt": last["_id"]}} if last else {}
+    tail = list(journal.find(tail_filter, {"query_type": 1, "parameters": 1, "timestamp": 1}))
+    for start in range(0, len(tail), batch_size):
+        update_query_summary(tail[start:start + batch_size], staging)
+    ensure_query_summary_indexes(staging)     # на пустой коллекции создаёт её — подменять есть чем
+    staging.rename(QUERY_STATS_COLLECTION, dropTarget=True)
+    total = get_collection(QUERY_STATS_COLLECTION).estimated_document_count()
+    get_collection(QUERY_STATS_META_COLLECTION).replace_one(
+        {"_id": SUMMARY_MARKER}, {"rebuilt_at": datetime.now(), "queries": total}, upsert=True)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обслуживание статистики поисковых запросов.")
+    parser.add_argument("--rebuild-summary", action="store_true",
+                        help="перестроить сводку популярности запросов по сырому журналу")
+    parser.add_argument("--update-buckets", action="store_true",
+                        help="дополнить интервалы объёма запросов (минуты, часы, дни) по журналу")
+    args = parser.parse_args()
+    if args.rebuild_summary:
+        total = rebuild_query_summary()
+        print(f"Сводка перестроена: {total} уникальных запросов.")
+    if args.update_buckets:
+        for unit in BUCKET_UNITS:
+            print(f"Интервалы ({unit}): обновлено {update_query_buckets(unit)} документов.")
+    if not (args.rebuild_summary or args.update_buckets):
+        parser.print_help()
@@ -0,0 +1,121 @@
+# ● log_storage.py — обслуживание коллекций логов: индексы, TTL-хранение, capped-коллекция ошибок
+
+import os
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from mongo_connector import (get_mongo_connection, get_collection, QUERIES_COLLECTION, ERRORS_COLLECTION,
+                             QUERY_BUCKETS_COLLECTION)
+from log_writer import ensure_query_summary_indexes
+
+# параметры хранения логов
+LOG_QUERIES_TTL_DAYS = float(os.getenv("LOG_QUERIES_TTL_DAYS", "0"))      # 0 — хранить запросы бессрочно
+LOG_ERRORS_CAPPED_SIZE = int(os.getenv("LOG_ERRORS_CAPPED_SIZE", "0"))    # байт; 0 — обычная коллекция
+LOG_ERRORS_CAPPED_MAX = int(os.getenv("LOG_ERRORS_CAPPED_MAX", "0"))      # макс. документов (0 — без лимита)
+
+TIMESTAMP_INDEX = "timestamp_1"
+
+_storage_state = {"bootstrapped": False, "errors_capped": None}
+
+
+def _ensure_timestamp_index(collection, ttl_seconds=None):
+    """
+    Создаёт индекс по timestamp; при ttl_seconds — TTL-индекс (MongoDB удаляет старые документы).
+    Если индекс уже есть с другим сроком хранения, срок меняется через collMod,
+    а при включении/выключении TTL индекс пересоздаётся.
+        :param collection: коллекция MongoDB
+        :param ttl_seconds: срок хранения документов, сек. (None — без TTL)
+        :return: None
+    """
+    existing = collection.index_information().get(TIMESTAMP_INDEX)
+    if existing is not None:
+        current_ttl = existing.get("expireAfterSeconds")
+        if current_ttl == ttl_seconds:
+            return
+        if current_ttl is not None and ttl_seconds is not None:
+            collection.database.command("collMod", collection.name, index={
+                "keyPattern": {"timestamp": 1},
+                "expireAfterSeconds": ttl_seconds,
+            })
+            return
+        collection.drop_index(TIMESTAMP_INDEX)
+    options = {"name": TIMESTAMP_INDEX}
+    if ttl_seconds is not None:
+        options["expireAfterSeconds"] = ttl_seconds
+    collection.create_index([("timestamp", ASCENDING)], **options)
+
+
+def ensure_errors_collection():
+    """
+    Готовит коллекцию ошибок. При LOG_ERRORS_CAPPED_SIZE > 0 она создаётся capped-коллекцией
+    (или существующая конвертируется), и «последние N ошибок» читаются в естественном порядке.
+        :return: True, если коллекция ошибок capped
+    """
+    db = get_mongo_connection()
+    if LOG_ERRORS_CAPPED_SIZE > 0:
+        if ERRORS_COLLECTION not in db.list_collection_names():
+            options = {"capped": True, "size": LOG_ERRORS_CAPPED_SIZE}
+            if LOG_ERRORS_CAPPED_MAX > 0:
+                options["max"] = LOG_ERRORS_CAPPED_MAX
+            db.create_collection(ERRORS_COLLECTION, **options)
+        elif not db[ERRORS_COLLECTION].options().get("capped"):
+            db.command("convertToCapped", ERRORS_COLLECTION, size=LOG_ERRORS_CAPPED_SIZE)
+    capped = bool(db[ERRORS_COLLECTION].options().get("capped"))
+    _storage_state["errors_capped"] = capped
+    return capped
+
+
+def ensure_query_bucket_indexes():
+    """
+    Создаёт уникальный индекс интервалов объёма запросов (единица, начало интервала, тип запроса).
+        :return: None
+    """
+    get_collection(QUERY_BUCKETS_COLLECTION).create_index(
+        [("unit", ASCENDING), ("start", ASCENDING), ("query_type", ASCENDING)], unique=True)
+
+
+def ensure_log_indexes():
+    """
+    Создаёт индексы коллекций логов: timestamp для запросов (TTL при LOG_QUERIES_TTL_DAYS > 0),
+    timestamp для ошибок, индексы сводки популярности запросов и интервалов объёма запросов.
+        :return: None
+    """
+    ttl = int(LOG_QUERIES_TTL_DAYS * 86400) if LOG_QUERIES_TTL_DAYS > 0 else None
+    _ensure_timestamp_index(get_collection(QUERIES_COLLECTION), ttl)
+    get_collection(ERRORS_COLLECTION).create_index([("timestamp", DESCENDING)])   # и для capped: get_last_errors
+    ensure_query_summary_indexes()
+    ensure_query_bucket_indexes()
+
+
+def bootstrap_log_storage():
+    """
+    Однократно (на процесс) готовит хранилище логов: коллекцию ошибок и индексы.
+        :return: True, если подготовка прошла успешно
+    """
+    if _storage_state["bootstrapped"]:
+        return True
+    try:
+        ensure_errors_collection()
+        ensure_log_indexes()
+    except PyMongoError as e:
+        print("Не удалось подготовить коллекции логов в MongoDB.")
+        print(f"MongoDB Error: {e}")
+        return False
+    _storage_state["bootstrapped"] = True
+    return True
+
+
+def errors_are_capped():
+    """
+    Проверяет (один раз на процесс), является ли коллекция ошибок capped.
+        :return: True для capped-коллекции
+    """
+    if _storage_state["errors_capped"] is None:
+        options = get_collection(ERRORS_COLLECTION).options()
+        _storage_state["errors_capped"] = bool(options.get("capped"))
+    return _storage_state["errors_capped"]
+
+
+if __name__ == "__main__":
+    if bootstrap_log_storage():
+        print("Индексы и параметры хранения логов применены.")
+        print(f"Коллекция ошибок capped: {errors_are_capped()}")
@@ -1,19 +1,329 @@
 # ● log_writer.py — запись поисковых запросов и ошибок в MongoDB
 
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import deque
 from datetime import datetime
-from mongo_connector import get_mongo_connection
+import metrics
+from pymongo import UpdateOne, ASCENDING, DESCENDING
+from mongo_connector import get_collection, QUERIES_COLLECTION, ERRORS_COLLECTION, QUERY_STATS_COLLECTION
+
+# параметры фоновой записи логов
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1") != "0"                      # 0 — синхронная запись, как раньше
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))          # максимум записей в очереди
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))            # запись пачкой при наборе N записей
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))  # ... или раз в N секунд
+LOG_OVERFLOW = os.getenv("LOG_QUEUE_OVERFLOW", "drop_oldest")       # "drop_oldest" или "block"
+LOG_DRAIN_TIMEOUT = float(os.getenv("LOG_DRAIN_TIMEOUT", "5"))      # ожидание дозаписи при выходе, сек.
+
+# параметры журнала ошибок: повторы одной ошибки сворачиваются в один документ на окно
+LOG_ERROR_WINDOW_SECONDS = int(os.getenv("LOG_ERROR_WINDOW_SECONDS", "300"))       # окно свёртки, сек.
+LOG_ERROR_MIN_INTERVAL = float(os.getenv("LOG_ERROR_MIN_INTERVAL", "5"))          # не чаще 1 записи на отпечаток
+
+_collections = {"queries": QUERIES_COLLECTION, "errors": ERRORS_COLLECTION}
+_buffer = deque()                   # элементы (имя коллекции, документ)
+_cond = threading.Condition()
+_state = {"worker": None, "stopping": False, "in_flight": 0, "flush_requested": False}
+_stats = {"enqueued": 0, "flushed": 0, "dropped": 0, "failed": 0, "errors_collapsed": 0}
+_summary_indexes = {"ready": False}
+_errors = {}                        # отпечаток ошибки -> накопленные повторы и время последней записи
+_errors_lock = threading.Lock()
+_ERROR_NOISE = [
+    (re.compile(r"0x[0-9a-f]+"), "0x?"),        # адреса объектов
+    (re.compile(r"\d+"), "?"),                  # числа: id, порты, номера строк, время
+    (re.compile(r"\s+"), " "),
+]
+
+
+def _canonical(value, strip=True):
+    """
+    Приводит значение параметра запроса к каноническому виду
+    (строки в нижнем регистре и без пробелов по краям, словари — рекурсивно).
+    strip=False — пробелы сохраняются: для LIKE '%ace %' и '%ace%' — разные запросы.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() if strip else value.lower()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v, strip) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v, strip) for v in value]
+    return value
+
+
+def query_fingerprint(query_type, parameters, strip=True):
+    """
+    Вычисляет отпечаток запроса: тип запроса + канонизированные параметры.
+        :param query_type: тип запроса (например, "keyword")
+        :param parameters: словарь параметров запроса
+        :param strip: убирать ли пробелы по краям строк (False — для ключей кэша результатов)
+        :return: кортеж (отпечаток — hex-строка sha1, канонические параметры)
+    """
+    canonical = _canonical(parameters or {}, strip)
+    raw = json.dumps([query_type, canonical], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest(), canonical
+
+
+def error_fingerprint(source, message):
+    """
+    Вычисляет отпечаток ошибки: источник + нормализованное сообщение
+    (нижний регистр, числа и адреса заменены на «?», пробелы схлопнуты).
+        :param source: название функции или компонента
+        :param message: текст сообщения об ошибке
+        :return: hex-строка sha1
+    """
+    normalized = str(message).strip().lower()
+    for pattern, replacement in _ERROR_NOISE:
+        normalized = pattern.sub(replacement, normalized)
+    return hashlib.sha1(f"{source}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def ensure_query_summary_indexes(collection=None):
+    """
+    Создаёт индексы сводки популярности запросов (по count и last_used).
+        :param collection: коллекция сводки (по умолчанию QUERY_STATS_COLLECTION)
+        :return: None
+    """
+    collection = collection if collection is not None else get_collection(QUERY_STATS_COLLECTION)
+    collection.create_index([("count", DESCENDING)])
+    collection.create_index([("last_used", DESCENDING)])
+
+
+def summarize_queries(docs):
+    """
+    Сворачивает записи логов запросов по отпечатку.
+        :param docs: итерируемое записей (query_type, parameters, timestamp[, count])
+        :return: словарь {отпечаток: {"query_type", "parameters", "count", "last_used"}}
+    """
+    summary = {}
+    for doc in docs:
+        fingerprint, canonical = query_fingerprint(doc.get("query_type"), doc.get("parameters"))
+        item = summary.setdefault(fingerprint, {
+            "query_type": doc.get("query_type"),
+            "parameters": canonical,
+            "count": 0,
+            "last_used": doc.get("timestamp"),
+        })
+        item["count"] += doc.get("count", 1)
+        if doc.get("timestamp") and (item["last_used"] is None or doc["timestamp"] > item["last_used"]):
+            item["last_used"] = doc["timestamp"]
+    return summary
+
+
+def update_query_summary(docs, collection=None):
+    """
+    Обновляет сводку популярности запросов upsert-ами с $inc/$max (по одному на отпечаток).
+        :param docs: список записей логов запросов
+        :param collection: коллекция сводки (по умолчанию QUERY_STATS_COLLECTION)
+        :return: None
+    """
+    if collection is None and not _summary_indexes["ready"]:
+        ensure_query_summary_indexes()
+        _summary_indexes["ready"] = True
+    operations = [
+        UpdateOne(
+            {"_id": fingerprint},
+            {
+                "$inc": {"count": item["count"]},
+                "$max": {"last_used": item["last_used"]},
+                "$setOnInsert": {"query_type": item["query_type"], "parameters": item["parameters"]},
+            },
+            upsert=True,
+        )
+        for fingerprint, item in summarize_queries(docs).items()
+    ]
+    if not operations:
+        return
+    collection = collection if collection is not None else get_collection(QUERY_STATS_COLLECTION)
+    collection.bulk_write(operations, ordered=False)
+
+
+def _upsert_errors(docs):
+    """
+    Записывает свёрнутые ошибки: по одному документу на (отпечаток, окно), повторы
+    увеличивают count и сдвигают last_seen. Размер документа при обновлении не меняется,
+    поэтому запись совместима с capped-коллекцией ошибок.
+        :param docs: документы _take_error (_id, fingerprint, source, message, count, first_seen, last_seen)
+        :return: None
+    """
+    operations = [
+        UpdateOne(
+            {"_id": doc["_id"]},
+            {
+                "$setOnInsert": {"fingerprint": doc["fingerprint"], "source": doc["source"],
+                                 "message": doc["message"]},
+                "$inc": {"count": doc["count"]},
+                "$min": {"first_seen": doc["first_seen"]},
+                "$max": {"last_seen": doc["last_seen"], "timestamp": doc["last_seen"]},
+            },
+            upsert=True
+        )
+        for doc in docs
+    ]
+    get_collection(ERRORS_COLLECTION).bulk_write(operations, ordered=False)
+
+
+def _write_batch(batch):
+    """
+    Записывает пачку документов (запросы — через insert_many, ошибки — upsert свёрнутых
+    повторов; по одной операции на коллекцию) и обновляет сводку популярности для записанных запросов.
+        :param batch: список кортежей (имя коллекции, документ)
+        :return: None
+    """
+    grouped = {}
+    for name, doc in batch:
+        grouped.setdefault(name, []).append(doc)
+    for name, docs in grouped.items():
+        nbytes = metrics.estimate_bytes(docs)
+        try:
+            with metrics.measure(f"log.insert.{name}") as sample:
+                sample["rows"], sample["bytes"] = len(docs), nbytes
+                if name == "errors":
+                    _upsert_errors(docs)
+                else:
+                    get_collection(_collections[name]).insert_many(docs, ordered=False)
+            with _cond:
+                _stats["flushed"] += len(docs)
+        except Exception as e:
+            with _cond:
+                _stats["failed"] += len(docs)
+            if name == "queries":
+                log_error("log_search", str(e))
+            continue
+        if name == "queries":
+            try:
+                update_query_summary(docs)
+            except Exception as e:
+                log_error("log_search_summary", str(e))
+
+
+def _writer_loop():
+    """
+    Фоновый поток: забирает записи из очереди и пишет их пачками
+    по достижении LOG_BATCH_SIZE записей или по истечении LOG_FLUSH_INTERVAL.
+        :return: None
+    """
+    while True:
+        for doc in _release_errors():
+            _enqueue("errors", doc)
+        with _cond:
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            while (len(_buffer) < LOG_BATCH_SIZE and not _state["stopping"]
+                   and not _state["flush_requested"]):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _cond.wait(remaining)
+            _state["flush_requested"] = False
+            if not _buffer:
+                if _state["stopping"]:
+                    return
+                continue
+            batch = [_buffer.popleft() for _ in range(min(LOG_BATCH_SIZE, len(_buffer)))]
+            _state["in_flight"] += len(batch)
+            _cond.notify_all()          # освободилось место — будим ожидающих (режим "block")
+        try:
+            _write_batch(batch)
+        finally:
+            with _cond:
+                _state["in_flight"] -= len(batch)
+                _cond.notify_all()
+
+
+def _ensure_worker():
+    """ Запускает фоновый поток записи, если он ещё не запущен (вызывать под _cond). """
+    worker = _state["worker"]
+    if worker is None or not worker.is_alive():
+        worker = threading.Thread(target=_writer_loop, name="log-writer", daemon=True)
+        _state["worker"] = worker
+        worker.start()
+
+
+def _enqueue(name, doc):
+    """
+    Ставит документ в очередь фоновой записи с учётом политики переполнения.
+    Если фоновая запись выключена или уже остановлена, документ пишется сразу.
+        :param name: имя коллекции ("queries" или "errors")
+        :param doc: документ для записи
+        :return: None
+    """
+    with _cond:
+        asynchronous = LOG_ASYNC and not _state["stopping"]
+        if asynchronous:
+            _ensure_worker()
+            # сам поток записи никогда не блокируется — иначе он ждал бы сам себя
+            if LOG_OVERFLOW == "block" and threading.current_thread() is not _state["worker"]:
+                _cond.wait_for(lambda: len(_buffer) < LOG_QUEUE_SIZE or _state["stopping"])
+                asynchronous = not _state["stopping"]
+            elif len(_buffer) >= LOG_QUEUE_SIZE:
+                _buffer.popleft()
+                _stats["dropped"] += 1
+        if asynchronous:
+            _buffer.append((name, doc))
+            _stats["enqueued"] += 1
+            if len(_buffer) >= LOG_BATCH_SIZE:
+                _cond.notify_all()
+    if not asynchronous:
+        _write_batch([(name, doc)])
+
+
+def flush_logs(timeout=None):
+    """
+    Немедленно записывает накопленные логи и ждёт окончания записи.
+        :param timeout: максимальное время ожидания, сек. (None — без ограничения)
+        :return: True, если очередь полностью записана
+    """
+    for doc in _release_errors(force=True):
+        _enqueue("errors", doc)
+    with _cond:
+        if _state["worker"] is None:
+            return not _buffer
+        _state["flush_requested"] = True
+        _cond.notify_all()
+        return _cond.wait_for(lambda: not _buffer and _state["in_flight"] == 0, timeout)
+
+
+def shutdown_log_writer(timeout=LOG_DRAIN_TIMEOUT):
+    """
+    Останавливает фоновую запись, дописав очередь (вызывается автоматически при выходе).
+        :param timeout: максимальное время ожидания дозаписи, сек.
+        :return: None
+    """
+    for doc in _release_errors(force=True):
+        _enqueue("errors", doc)
+    with _cond:
+        _state["stopping"] = True
+        worker = _state["worker"]
+        _cond.notify_all()
+    if worker is not None:
+        worker.join(timeout)
+
+
+def get_log_writer_stats():
+    """
+    Возвращает счётчики фоновой записи логов.
+        :return: словарь с ключами enqueued, flushed, dropped, failed, errors_collapsed
+                 (повторы ошибок, свёрнутые до записи) и queued (сейчас в очереди)
+    """
+    with _cond:
+        return dict(_stats, queued=len(_buffer) + _state["in_flight"])
+
+
+atexit.register(shutdown_log_writer)
 
-db = get_mongo_connection()
-queries = db["final_project_queries_170225_DETKOV"]
-errors = db["final_project_errors_170225_DETKOV"]
 
 # запись логов запросов
-def log_search(query_type, parameters, result_count):
+def log_search(query_type, parameters, result_count, duration_ms=None):
     """
-    Записывает информацию о поисковом запросе в MongoDB.
+    Записывает информацию о поисковом запросе в MongoDB (в фоне, пачками).
         :param query_type: тип запроса (например, "keyword", "genre_year", "actor")
         :param parameters: словарь с параметрами запроса (например, {"keyword": "matrix"})
         :param result_count: количество найденных результатов
+        :param duration_ms: время выполнения запроса (первой страницы с подсчётом итога), мс
         :return: None
     """
     log_entry = {
@@ -22,26 +332,76 @@ def log_search(query_type, parameters, result_count):
         "result_count": result_count,
         "timestamp": datetime.now()
     }
-    try:
-        queries.insert_one(log_entry)
-    except Exception as e:
-        log_error("log_search", str(e))
+    if duration_ms is not None:
+        log_entry["duration_ms"] = round(duration_ms, 3)
+    _enqueue("queries", log_entry)
+
+def _take_error(entry):
+    """ Забирает накопленные повторы ошибки в документ для записи (вызывать под _errors_lock). """
+    doc = {key: entry[key] for key in ("fingerprint", "source", "message", "count", "first_seen", "last_seen")}
+    doc["_id"] = f"{entry['fingerprint']}:{entry['window']}"
+    entry["count"] = 0
+    return doc
+
+
+def _release_errors(force=False):
+    """
+    Забирает повторы ошибок, для которых истёк интервал ограничения записи
+    (или все накопленные при force), и забывает отпечатки без новых повторов.
+        :param force: забрать все накопленные повторы (flush_logs, завершение работы)
+        :return: список документов для записи
+    """
+    released = []
+    now = time.monotonic()
+    with _errors_lock:
+        for fingerprint, entry in list(_errors.items()):
+            due = now - entry["written_at"] >= LOG_ERROR_MIN_INTERVAL
+            if entry["count"] and (force or due):
+                released.append(_take_error(entry))
+                entry["written_at"] = now
+            elif not entry["count"] and due:
+                del _errors[fingerprint]
+    return released
+
 
 # запись ошибок
 def log_error(source, message):
     """
-    Записывает информацию об ошибке в MongoDB.
+    Записывает информацию об ошибке в MongoDB (в фоне, пачками).
+    Повторы одной ошибки (тот же источник и нормализованное сообщение) сворачиваются:
+    в течение окна LOG_ERROR_WINDOW_SECONDS это один документ с count/first_seen/last_seen,
+    а записывается он не чаще раза в LOG_ERROR_MIN_INTERVAL секунд (остальные повторы
+    накапливаются в памяти и уходят следующей записью). Каждый вызов заодно отдаёт накопленные
+    повторы других отпечатков, у которых интервал истёк, — без фонового потока (LOG_ASYNC=0)
+    счётчики не отстают до следующего повтора той же ошибки.
         :param source: название функции или компонента, где произошла ошибка
         :param message: текст сообщения об ошибке
         :return: None
     """
-    error_entry = {
-        "source": source,
-        "message": message,
-        "timestamp": datetime.now()
-    }
-    try:
-        errors.insert_one(error_entry)
-    except:
-        pass  
-    
\ No newline at end of file
+    now = datetime.now()
+    fingerprint = error_fingerprint(source, message)
+    window = int(now.timestamp() // max(LOG_ERROR_WINDOW_SECONDS, 1))
+    released = []
+    collapsed = False
+    with _errors_lock:
+        entry = _errors.get(fingerprint)
+        if entry is None:
+            entry = _errors[fingerprint] = {"fingerprint": fingerprint, "source": source, "count": 0,
+                                            "written_at": float("-inf")}
+        elif entry["count"] and entry["window"] != window:
+            released.append(_take_error(entry))         # повторы прошлого окна — в свой документ
+        if not entry["count"]:
+            entry.update(message=message, window=window, first_seen=now)
+        entry["count"] += 1
+        entry["last_seen"] = now
+        if time.monotonic() - entry["written_at"] >= LOG_ERROR_MIN_INTERVAL:
+            released.append(_take_error(entry))
+            entry["written_at"] = time.monotonic()
+        else:
+            collapsed = True
+    released.extend(_release_errors())
+    if collapsed:
+        with _cond:
+            _stats["errors_collapsed"] += 1
+    for doc in released:
+        _enqueue("errors", doc)
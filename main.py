@@ -1,18 +1,28 @@
 # ● main.py — точка входа, меню и обработка команд пользователя
 
-import matplotlib.pyplot as plt
+import time
+from contextlib import closing
 
 from mysql_connector import (
-    connect_db,
-    search_films_by_keyword,
-    search_films_by_genre_and_years,
-    get_all_genres,
-    get_release_year_range,
-    search_films_by_actor,
-    get_film_count_by_year,
-    search_films_by_description )
+    init_pool,
+    close_pool,
+    with_connection,
+    search_films_by_keyword_page,
+    search_films_by_genre_and_years_page,
+    get_reference_data,
+    search_films_by_actor_page,
+    search_films_by_description_page,
+    search_films_filtered_page,
+    FILM_RATINGS )
 from log_writer import (log_search, log_error)
-from log_stats import (get_most_frequent_queries, get_last_unique_queries, get_last_errors)
+from log_storage import bootstrap_log_storage
+from prefetch import iter_pages
+from log_stats import (get_most_frequent_queries, get_last_unique_queries, get_last_errors,
+                       get_query_latency_stats, get_query_volume, BUCKET_DEFAULT_COUNT)
+from metrics import get_metrics
+from charts import films_by_year_chart, query_volume_chart, BREAKDOWNS
+from snapshot import serves_offline
+from result_cache import get_result_cache_stats, start_cache_warmup
 from formatter import (
     print_film_results_table,
     print_genre_results_table,
@@ -21,7 +31,10 @@ from formatter import (
     print_genre_and_year_info,
     print_top_queries_table,
     print_latest_queries_table,
-    print_error_log_table
+    print_error_log_table,
+    print_performance_table,
+    print_result_cache_stats,
+    print_query_volume_table
 )
 
 def main_menu():
@@ -32,11 +45,14 @@ def main_menu():
             - выходу из программы.
         :return: None (управление осуществляется через цикл while)
     """
-    connection = connect_db()
-    if not connection:
-        print("Программа завершена из-за ошибки подключения.")
-        log_error("main_menu", "Программа завершена из-за ошибки подключения.")
-        return
+    if not init_pool():
+        if not serves_offline():
+            print("Программа завершена из-за ошибки подключения.")
+            log_error("main_menu", "Программа завершена из-за ошибки подключения.")
+            return
+        print("MySQL недоступен: поиск выполняется по локальному снимку (данные могут быть устаревшими).")
+    bootstrap_log_storage()     # индексы и параметры хранения логов (TTL, capped)
+    start_cache_warmup()        # частые запросы из журнала — в кэш результатов (в фоне)
     
     while True:
         print("\nГЛАВНОЕ МЕНЮ:")
@@ -49,19 +65,19 @@ def main_menu():
 
         if choice == "0":
             print("До свидания!")
-            connection.close()
+            close_pool()
             break
         elif choice == "1":
-            menu_films(connection)
+            menu_films()
         elif choice == "2":
             menu_stats()
         else:
             print("Некорректный ввод. Попробуйте снова.")
 
 
-def menu_films(connection):
+def menu_films():
     """ Отображает подменю поиска фильмов и обрабатывает выбор пользователя.
-        :param connection: подключение к базе данных MySQL
+            Запросы выполняются на соединениях из пула MySQL.
         :return: None 
     """
     while True:
@@ -72,19 +88,22 @@ def menu_films(connection):
         print('"3". Поиск фильмов по имени актёра')
         print('"4". Поиск фильмов по описанию')
         print('"5". Количество фильмов по годам (график)')
+        print('"6". Расширенный поиск (несколько фильтров)')
 
         choice = input("Выберите действие: ").strip()
 
         if choice == "1":
-            keyword_search(connection)
+            keyword_search()
         elif choice == "2":
-            genre_year_search(connection)
+            genre_year_search()
         elif choice == "3":
-            actor_search(connection)
+            actor_search()
         elif choice == "4":
-            description_search(connection)
+            description_search()
         elif choice == "5":
-            show_film_stats_by_year(connection)
+            show_film_stats_by_year()
+        elif choice == "6":
+            filtered_search()
         elif choice == "0":
             print("\nДо свидания!")
             break
@@ -102,6 +121,9 @@ def menu_stats():
         print('"1". ТОП 5 популярных запросов')
         print('"2". Последние 5 уникальных запросов')
         print('"3". Последние 5 ошибок')
+        print('"4". Производительность запросов')
+        print('"5". Кэш результатов поиска')
+        print('"6". Объём запросов по времени')
 
         choice = input("Выберите действие: ").strip()
 
@@ -113,15 +135,64 @@ def menu_stats():
             show_latest_queries()
         elif choice == "3":
             show_last_5_errors()
+        elif choice == "4":
+            show_performance()
+        elif choice == "5":
+            print_result_cache_stats(get_result_cache_stats())
+        elif choice == "6":
+            show_query_volume()
         else:
             print("Некорректный ввод. Попробуйте снова.")
 
 
-def keyword_search(connection):
+def run_paged_search(search_func, args, render, source, error_log_message, error_message, empty_message):
+    """ Выводит результаты поиска постранично (по 10 фильмов) с keyset-пагинацией.
+            Следующие страницы загружаются заранее в фоновом потоке (см. prefetch.iter_pages),
+            загрузка отменяется, когда пользователь прекращает просмотр.
+        :param search_func: функция *_page из mysql_connector
+        :param args: кортеж аргументов поиска (без connection и page_token)
+        :param render: функция вывода страницы результатов
+        :param source: имя функции для журнала ошибок
+        :param error_log_message: сообщение для журнала ошибок, если поиск вернул None
+        :param error_message: сообщение пользователю об ошибке
+        :param empty_message: сообщение пользователю, если ничего не найдено
+        :return: кортеж (общее число совпадений или количество показанных строк, если оно неизвестно;
+                 время получения первой страницы с подсчётом итога, мс) либо None в случае ошибки
+    """
+    total_found = 0
+    total = None
+    duration_ms = None
+    started = time.perf_counter()
+    with closing(iter_pages(search_func, *args, with_total=True)) as pages:
+        for page in pages:
+            if page is None:
+                log_error(source, error_log_message)
+                print(error_message)
+                return None
+            results, page_token, total = page
+            if duration_ms is None:
+                duration_ms = (time.perf_counter() - started) * 1000
+            if not results:
+                print(empty_message)
+                break
+
+            if total_found == 0 and total is not None:
+                print(f"\nВсего найдено: {total}")
+            render(results)
+            total_found += len(results)
+
+            if page_token is None:      # последняя страница
+                break
+            next_action = input("\nПоказать следующие 10? (y/n): ").strip().lower()
+            if next_action != 'y':
+                break
+    return (total if total is not None else total_found), duration_ms
+
+
+def keyword_search():
     """ Выполняет поиск фильмов по ключевому слову.
             Пользователь вводит ключевое слово, после чего выводятся результаты постранично (по 10 фильмов).
             По завершении поиска запрос сохраняется в MongoDB.
-        :param connection: подключение к базе данных MySQL
         :return: None (результаты выводятся в консоль и логируются)
     """
     keyword = input("Введите ключевое слово для поиска: ").strip()
@@ -129,34 +200,20 @@ def keyword_search(connection):
         print("Ключевое слово не может быть пустым.")
         return
 
-    offset = 0
-    total_found = 0
-
-    while True:
-        results = search_films_by_keyword(connection, keyword, offset)
-        if results is None:
-            log_error("keyword_search", "Поиск фильмов по ключевому слову = None")
-            print("Ошибка при поиске.")
-            return
-        if not results:
-            if offset == 0:
-                print("Нет результатов.")
-            break
-
-        formatted_results = [(film[1], film[2], film[3], film[4]) for film in results] # название - год - рейтинг - длительность
-        print_film_results_table(formatted_results)
-        total_found += len(results)
-
-        next_action = input("\nПоказать следующие 10? (y/n): ").strip().lower()
-        if next_action == 'y':
-            offset += 10
-        else:
-            break
+    result = run_paged_search(
+        search_films_by_keyword_page, (keyword,),
+        lambda results: print_film_results_table(
+            [(film[1], film[2], film[3], film[4]) for film in results]),   # название - год - рейтинг - длительность
+        "keyword_search", "Поиск фильмов по ключевому слову = None",
+        "Ошибка при поиске.", "Нет результатов.")
+    if result is None:
+        return
+    total_found, duration_ms = result
 
-    log_search("keyword", {"keyword": keyword}, total_found)        # запись поисковых логов
+    log_search("keyword", {"keyword": keyword}, total_found, duration_ms)        # запись поисковых логов
 
 
-def genre_year_search(connection):
+def genre_year_search():
     """ Поиск фильмов по жанру и диапазону годов выпуска.
         Пользователь выбирает жанр из доступного списка и указывает начальный и конечный год
         (можно ввести только один год для поиска за конкретный год).
@@ -168,17 +225,22 @@ def genre_year_search(connection):
             - проверяет, что год состоит максимум из 4 цифр.
         Результаты выводятся постранично (по 10 фильмов).
         По завершении поиска запрос сохраняется в MongoDB.
-        :param connection: подключение к базе данных MySQL
         :return: None (результаты выводятся в консоль и логируются)
     """
-    genres = get_all_genres(connection)
+    reference = with_connection(get_reference_data)     # жанры и диапазон годов (из кэша)
+    if reference is None:
+        log_error("genre_year_search", "Справочные данные (жанры, годы) = None")
+        print("Не удалось получить список жанров и диапазон годов.")
+        return
+
+    genres = reference["genres"]
     if not genres:
-        log_error("genre_year_search", "Список жанров = None")
+        log_error("genre_year_search", "Список жанров пуст")
         print("Не удалось получить список жанров.")
         return
 
-    year_range = get_release_year_range(connection)
-    if not year_range:
+    year_range = reference["year_range"]
+    if not year_range or None in year_range:
         log_error("genre_year_search", "Диапазон годов = None")
         print("Не удалось получить диапазон годов.")
         return
@@ -187,7 +249,7 @@ def genre_year_search(connection):
 
     # обработка ввода жанра
     genre_input = input("Введите название жанра: ").strip().lower()
-    genres_map = {g.lower(): g for g in genres}
+    genres_map = reference["genres_map"]
 
     if genre_input not in genres_map:
         print("Некорректный жанр.")
@@ -229,43 +291,28 @@ def genre_year_search(connection):
         print("Конечный год не может быть меньше начального.")
         return
 
-    offset = 0
-    total_found = 0
-
-    while True:
-        results = search_films_by_genre_and_years(connection, genre, year_start, year_end, offset)
-        if results is None:
-            log_error("genre_year_search", "Поиск фильмов по жанру и диапазону годов = None")
-            print("Ошибка при поиске.")
-            return
-        if not results:
-            if offset == 0:
-                print("Нет результатов.")
-            break
-
-        formatted = [(f[1], f[2], f[3]) for f in results]  # название - год - жанр
-        print_genre_results_table(formatted)
-        total_found += len(results)
-
-        next_action = input("\nПоказать следующие 10? (y/n): ").strip().lower()
-        if next_action == 'y':
-            offset += 10
-        else:
-            break
+    result = run_paged_search(
+        search_films_by_genre_and_years_page, (genre, year_start, year_end),
+        lambda results: print_genre_results_table(
+            [(f[1], f[2], f[3]) for f in results]),    # название - год - жанр
+        "genre_year_search", "Поиск фильмов по жанру и диапазону годов = None",
+        "Ошибка при поиске.", "Нет результатов.")
+    if result is None:
+        return
+    total_found, duration_ms = result
 
     # запись поисковых логов
     log_search("genre_year", {
         "genre": genre,
         "year_start": year_start,
         "year_end": year_end
-    }, total_found)
+    }, total_found, duration_ms)
 
 
-def actor_search(connection):
+def actor_search():
     """ Поиск фильмов по имени и/или фамилии актёра (без учёта регистра).
             Пользователь вводит часть имени или фамилии актёра, результаты выводятся постранично (по 10 фильмов).
             По завершении поиска запрос сохраняется в MongoDB.
-        :param connection: подключение к базе данных MySQL
         :return: None (результаты выводятся в консоль и логируются)
     """
     actor_input = input("Введите имя, фамилию актера или их часть: ").strip()
@@ -273,38 +320,22 @@ def actor_search(connection):
         print("Имя актёра не может быть пустым.")
         return
 
-    offset = 0
-    total_found = 0
-
-    while True:
-        results = search_films_by_actor(connection, actor_input, offset)
-        if results is None:
-            log_error("actor_search", "Поиск фильмов по имени актёра = None")
-            print("Ошибка при поиске актёра.")
-            return
-        if not results:
-            if offset == 0:
-                print("Фильмы не найдены.")
-            break
-
-        formatted = [(f[0], f[1], f[2]) for f in results] # название - год - актерк
-        print_actor_results_table(formatted)    
-        total_found += len(results)
-
-        next_action = input("\nПоказать следующие 10? (y/n): ").strip().lower()
-        if next_action == 'y':
-            offset += 10
-        else:
-            break
+    result = run_paged_search(
+        search_films_by_actor_page, (actor_input,),
+        print_actor_results_table,       # название - год - актёр
+        "actor_search", "Поиск фильмов по имени актёра = None",
+        "Ошибка при поиске актёра.", "Фильмы не найдены.")
+    if result is None:
+        return
+    total_found, duration_ms = result
 
-    log_search("actor", {"actor_name": actor_input}, total_found)       # запись поисковых логов
+    log_search("actor", {"actor_name": actor_input}, total_found, duration_ms)       # запись поисковых логов
 
 
-def description_search(connection):
+def description_search():
     """ Поиск фильмов по ключевому слову в описании.
             Пользователь вводит ключевое слово, результаты выводятся постранично (по 10 фильмов).
             По завершении поиска запрос сохраняется в MongoDB.
-        :param connection: подключение к базе данных MySQL
         :return: None (результаты выводятся в консоль и логируются)
     """
     keyword = input("Введите ключевое слово из описания: ").strip()
@@ -312,59 +343,121 @@ def description_search(connection):
         print("Ключевое слово не может быть пустым.")
         return
 
-    offset = 0
-    total_found = 0
+    result = run_paged_search(
+        search_films_by_description_page, (keyword,),
+        print_description_results_table,     # название - год - описание
+        "description_search", "Поиск фильмов по ключевому слову в описании = None",
+        "Ошибка при выполнении по ключевому слову в описании.", "Ничего не найдено.")
+    if result is None:
+        return
+    total_found, duration_ms = result
 
-    while True:
-        results = search_films_by_description(connection, keyword, offset)
-        if results is None:
-            log_error("description_search", "Поиск фильмов по ключевому слову в описании = None")
-            print("Ошибка при выполнении по ключевому слову в описании.")
+    log_search("description", {"keyword": keyword}, total_found, duration_ms)    # запись поисковых логов
+
+
+def _read_int(prompt, label):
+    """ Читает необязательное целое число (Enter — пропустить).
+        :return: кортеж (ok, число или None)
+    """
+    value = input(prompt).strip()
+    if not value:
+        return True, None
+    if not value.isdigit() or len(value) > 4:
+        log_error("filtered_search", f"Некорректное значение {label}: {value}")
+        print(f"{label} должен быть целым числом (не более 4 цифр).")
+        return False, None
+    return True, int(value)
+
+
+def filtered_search():
+    """ Расширенный поиск фильмов по нескольким фильтрам одновременно.
+            Пользователь задаёт любые из фильтров (Enter — пропустить фильтр):
+            часть названия, жанр, диапазон годов, актёр, слово из описания, рейтинг, диапазон длительности.
+            Все фильтры объединяются в один SQL-запрос, результаты выводятся постранично (по 10 фильмов).
+            По завершении поиска запрос сохраняется в MongoDB.
+        :return: None (результаты выводятся в консоль и логируются)
+    """
+    print("Задайте фильтры (Enter — пропустить):")
+    filters = {
+        "title": input("Часть названия: ").strip(),
+        "genre": input("Жанр: ").strip().lower(),
+    }
+    if filters["genre"]:
+        reference = with_connection(get_reference_data)
+        if reference is None:
+            log_error("filtered_search", "Справочные данные (жанры, годы) = None")
+            print("Не удалось получить список жанров.")
+            return
+        if filters["genre"] not in reference["genres_map"]:
+            print("Некорректный жанр.")
+            return
+        filters["genre"] = reference["genres_map"][filters["genre"]]
+
+    for name, prompt, label in [("year_start", "Начальный год: ", "Начальный год"),
+                                ("year_end", "Конечный год: ", "Конечный год")]:
+        ok, filters[name] = _read_int(prompt, label)
+        if not ok:
+            return
+    filters["actor"] = input("Имя или фамилия актёра: ").strip()
+    filters["description"] = input("Слово из описания: ").strip()
+    filters["rating"] = input(f"Рейтинг ({', '.join(FILM_RATINGS)}): ").strip().upper()
+    if filters["rating"] and filters["rating"] not in FILM_RATINGS:
+        print("Некорректный рейтинг.")
+        return
+    for name, prompt, label in [("length_min", "Длительность от (мин.): ", "Длительность"),
+                                ("length_max", "Длительность до (мин.): ", "Длительность")]:
+        ok, filters[name] = _read_int(prompt, label)
+        if not ok:
             return
-        if not results:
-            if offset == 0:
-                print("Ничего не найдено.")
-            break
 
-        formatted = [(f[0], f[1], f[2]) for f in results] # название - год - описание
-        print_description_results_table(formatted)
-        total_found += len(results)
+    filters = {name: value for name, value in filters.items() if value not in (None, "")}
+    if not filters:
+        print("Не задан ни один фильтр.")
+        return
+    for low, high, label in [("year_start", "year_end", "Конечный год не может быть меньше начального."),
+                             ("length_min", "length_max", "Максимальная длительность меньше минимальной.")]:
+        if low in filters and high in filters and filters[high] < filters[low]:
+            log_error("filtered_search", f"{high}={filters[high]} меньше {low}={filters[low]}")
+            print(label)
+            return
 
-        next_action = input("\nПоказать следующие 10? (y/n): ").strip().lower()
-        if next_action == 'y':
-            offset += 10
-        else:
-            break
+    result = run_paged_search(
+        search_films_filtered_page, (filters,),
+        lambda results: print_film_results_table(
+            [(film[1], film[2], film[3], film[4]) for film in results]),   # название - год - рейтинг - длительность
+        "filtered_search", "Расширенный поиск фильмов = None",
+        "Ошибка при поиске.", "Нет результатов.")
+    if result is None:
+        return
+    total_found, duration_ms = result
 
-    log_search("description", {"keyword": keyword}, total_found)    # запись поисковых логов
+    log_search("filters", filters, total_found, duration_ms)       # запись поисковых логов
 
 
-def show_film_stats_by_year(connection):
-    """ Отображает график количества фильмов по годам выпуска.
-            Данные берутся из MySQL и строятся с помощью matplotlib.
-        :param connection: подключение к базе данных MySQL
-        :return: None (результат отображается в виде графика)
+def show_film_stats_by_year():
+    """ Строит график количества фильмов по годам выпуска (всего, по жанрам или по рейтингам).
+            График сохраняется в файл (PNG/SVG, см. charts.py) без интерактивного окна;
+            если данные не менялись, используется ранее построенное изображение.
+        :return: None (путь к файлу графика выводится в консоль)
     """
-    data = get_film_count_by_year(connection)
-    if data is None:
-        log_error("show_film_stats_by_year", "Отображение графика количества фильмов по годам = None")
+    options = list(BREAKDOWNS.items())
+    for number, (_, title) in enumerate(options, start=1):
+        print(f'"{number}". {title}')
+    choice = input("Выберите вариант (Enter — все фильмы): ").strip() or "1"
+    if not choice.isdigit() or not 1 <= int(choice) <= len(options):
+        print("Некорректный ввод.")
+        return
+    breakdown = options[int(choice) - 1][0]
+
+    path = films_by_year_chart(breakdown)
+    if path is None:
+        log_error("show_film_stats_by_year", "Построение графика количества фильмов по годам = None")
         print("Не удалось получить данные.")
         return
-    if not data:
+    if not path:
         print("Нет данных для отображения.")
         return
-
-    years = [row[0] for row in data]
-    counts = [row[1] for row in data]
-
-    plt.figure(figsize=(10, 5))
-    plt.plot(years, counts, marker='o')
-    plt.title("Количество фильмов по годам")
-    plt.xlabel("Год выпуска")
-    plt.ylabel("Количество фильмов")
-    plt.grid(True)
-    plt.tight_layout()
-    plt.show()
+    print(f"График сохранён: {path}")
 
 
 def show_popular_queries():
@@ -406,9 +499,57 @@ def show_last_5_errors():
     print_error_log_table(errors)
 
 
+def show_performance():
+    """ Отображает перцентили времени выполнения запросов (p50/p95/p99).
+            По типам запросов — из журнала MongoDB (поле duration_ms),
+            по операциям текущего сеанса — из гистограмм модуля metrics.
+        :return: None (результаты печатаются в консоль)
+    """
+    try:
+        query_stats = get_query_latency_stats()
+    except Exception as e:
+        log_error("show_performance", str(e))
+        print("Не удалось получить статистику из журнала.")
+        query_stats = []
+    print_performance_table(query_stats, get_metrics())
+
+
+def show_query_volume():
+    """ Отображает объём запросов по минутам, часам или дням: таблицу по типам запросов
+            (количество, доля запросов без результатов, среднее число найденных фильмов)
+            и график, сохранённый в файл (см. charts.query_volume_chart).
+        :return: None (результаты печатаются в консоль)
+    """
+    units = list(BUCKET_DEFAULT_COUNT)
+    titles = {"minute": "По минутам", "hour": "По часам", "day": "По дням"}
+    for number, unit in enumerate(units, start=1):
+        print(f'"{number}". {titles[unit]}')
+    choice = input("Выберите интервал (Enter — по часам): ").strip() or "2"
+    if not choice.isdigit() or not 1 <= int(choice) <= len(units):
+        print("Некорректный ввод.")
+        return
+    unit = units[int(choice) - 1]
+
+    try:
+        rows = get_query_volume(unit)
+    except Exception as e:
+        log_error("show_query_volume", str(e))
+        print("Не удалось получить статистику из журнала.")
+        return
+    if not rows:
+        print("Нет данных.")
+        return
+    print_query_volume_table(rows, unit)
+    path = query_volume_chart(rows, unit)
+    if path:
+        print(f"График сохранён: {path}")
+
+
 if __name__ == "__main__":
     try:
         main_menu()
     except Exception as e:
         print("Произошла критическая ошибка.")
         log_error("main_menu", str(e))
+    finally:
+        close_pool()
@@ -0,0 +1,188 @@
+# ● metrics.py — метрики производительности в памяти процесса: время, строки, байты, гистограммы задержек
+
+import os
+import time
+import bisect
+import threading
+from datetime import datetime, date
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# границы корзин гистограммы, мс: геометрическая прогрессия с шагом 2^(1/4) (погрешность перцентиля ~19%)
+BUCKET_BOUNDS_MS = [0.01 * 2 ** (i / 4) for i in range(96)]     # 0.01 мс .. ~1.4 ч
+
+_histograms = {}        # имя метрики -> словарь счётчиков (см. _new_histogram)
+_lock = threading.Lock()
+
+
+def _new_histogram():
+    """ Пустая гистограмма: счётчики по корзинам и суммарные показатели. """
+    return {"buckets": [0] * (len(BUCKET_BOUNDS_MS) + 1), "count": 0, "errors": 0,
+            "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "bytes": 0}
+
+
+def record(name, duration_ms, rows=None, nbytes=None, error=False):
+    """
+    Добавляет замер в гистограмму метрики.
+        :param name: имя метрики, например "query.search_films_by_keyword_page"
+        :param duration_ms: время выполнения, мс
+        :param rows: количество строк (документов) или None
+        :param nbytes: объём данных в байтах или None
+        :param error: True, если вызов завершился ошибкой
+        :return: None
+    """
+    if not METRICS_ENABLED:
+        return
+    index = bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _new_histogram()
+        histogram["buckets"][index] += 1
+        histogram["count"] += 1
+        histogram["total_ms"] += duration_ms
+        histogram["max_ms"] = max(histogram["max_ms"], duration_ms)
+        histogram["rows"] += rows or 0
+        histogram["bytes"] += nbytes or 0
+        if error:
+            histogram["errors"] += 1
+
+
+def estimate_bytes(value):
+    """
+    Приблизительный объём данных: длина строк и байтов, 8 байт на число и дату,
+    для кортежей, списков и словарей — сумма по элементам.
+        :param value: строка результата, список строк или документ
+        :return: количество байт
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (int, float, datetime, date)):
+        return 8
+    if isinstance(value, dict):
+        return sum(len(str(k)) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_bytes(v) for v in value)
+    return len(str(value))
+
+
+def _result_rows(result):
+    """
+    Строки из результата функции поиска: список строк (или кортеж строк от fetchall), либо первая
+    часть кортежа страницы (rows, page_token[, total]) или (rows, total). Кортеж значений —
+    например, (min_year, max_year) от get_release_year_range — строками не считается.
+    """
+    if isinstance(result, tuple) and 2 <= len(result) <= 3 and isinstance(result[0], list):
+        return result[0]
+    if isinstance(result, list):
+        return result
+    if isinstance(result, tuple) and all(isinstance(row, (list, tuple)) for row in result):
+        return result
+    return None
+
+
+def observe(name, started, result):
+    """
+    Записывает замер функции поиска по её результату (None — ошибка).
+        :param name: имя метрики
+        :param started: значение time.perf_counter() перед вызовом
+        :param result: результат функции
+        :return: None
+    """
+    duration_ms = (time.perf_counter() - started) * 1000
+    rows = _result_rows(result)
+    record(name, duration_ms, len(rows) if rows is not None else None,
+           estimate_bytes(rows) if rows is not None else None, error=result is None)
+
+
+@contextmanager
+def measure(name):
+    """
+    Замер блока кода. Внутри блока можно заполнить sample["rows"] и sample["bytes"];
+    исключение учитывается как ошибка и пробрасывается дальше.
+        :param name: имя метрики
+        :return: контекстный менеджер, отдающий словарь sample
+    """
+    sample = {"rows": None, "bytes": None}
+    started = time.perf_counter()
+    error = False
+    try:
+        yield sample
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(name, (time.perf_counter() - started) * 1000, sample["rows"], sample["bytes"], error)
+
+
+def histogram_percentile(buckets, count, pct, max_ms=None):
+    """
+    Перцентиль по гистограмме: верхняя граница корзины, в которую попадает ранг (не больше максимума).
+        :param buckets: счётчики по корзинам BUCKET_BOUNDS_MS
+        :param count: общее число замеров
+        :param pct: перцентиль, 0..100
+        :param max_ms: наибольшее наблюдённое значение
+        :return: значение в мс или None для пустой гистограммы
+    """
+    if not count:
+        return None
+    rank = max(1, -(-pct * count // 100))       # ближайший ранг: ceil(pct/100 * count)
+    seen = 0
+    for index, bucket in enumerate(buckets):
+        seen += bucket
+        if seen >= rank:
+            bound = BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else max_ms
+            return min(bound, max_ms) if max_ms is not None else bound
+    return max_ms
+
+
+def percentiles(values, pcts=(50, 95, 99)):
+    """
+    Точные перцентили по списку значений (метод ближайшего ранга).
+        :param values: список чисел
+        :param pcts: перцентили, 0..100
+        :return: словарь {"p50": ..., ...} (значения None для пустого списка)
+    """
+    ordered = sorted(values)
+    result = {}
+    for pct in pcts:
+        if not ordered:
+            result[f"p{pct}"] = None
+            continue
+        rank = max(1, -(-pct * len(ordered) // 100))
+        result[f"p{pct}"] = ordered[min(rank, len(ordered)) - 1]
+    return result
+
+
+def get_metrics(prefix=None):
+    """
+    Сводка метрик текущего процесса.
+        :param prefix: оставить только метрики с этим префиксом (например, "query.")
+        :return: список словарей name, count, errors, avg_ms, p50_ms, p95_ms, p99_ms, max_ms,
+                 rows, bytes — по убыванию суммарного времени
+    """
+    with _lock:
+        snapshot = {name: dict(h, buckets=list(h["buckets"])) for name, h in _histograms.items()
+                    if prefix is None or name.startswith(prefix)}
+    summary = []
+    for name, h in snapshot.items():
+        item = {"name": name, "count": h["count"], "errors": h["errors"],
+                "avg_ms": h["total_ms"] / h["count"] if h["count"] else None,
+                "max_ms": h["max_ms"], "rows": h["rows"], "bytes": h["bytes"], "total_ms": h["total_ms"]}
+        for pct in (50, 95, 99):
+            item[f"p{pct}_ms"] = histogram_percentile(h["buckets"], h["count"], pct, h["max_ms"])
+        summary.append(item)
+    summary.sort(key=lambda item: item["total_ms"], reverse=True)
+    return summary
+
+
+def reset_metrics():
+    """
+    Очищает все метрики процесса.
+        :return: None
+    """
+    with _lock:
+        _histograms.clear()
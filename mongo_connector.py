@@ -2,17 +2,87 @@
 
 from pymongo import MongoClient
 import os
+import atexit
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# коллекции проекта
+QUERIES_COLLECTION = "final_project_queries_170225_DETKOV"
+ERRORS_COLLECTION = "final_project_errors_170225_DETKOV"
+QUERY_STATS_COLLECTION = "final_project_query_stats_170225_DETKOV"     # сводка популярности запросов
+QUERY_STATS_META_COLLECTION = "final_project_query_stats_meta_170225_DETKOV"   # отметка о перестроении сводки
+QUERY_BUCKETS_COLLECTION = "final_project_query_buckets_170225_DETKOV"  # объём запросов по интервалам времени
+
+# параметры клиента (пул соединений и таймауты)
+client_options = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "10")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000")),
+}
+
+_client = None          # единый клиент на процесс, создаётся при первом обращении
+_client_lock = threading.Lock()
+_database = None        # база, заданная set_mongo_database (None — из переменной MONGO_DB)
+
+
+def get_mongo_client():
+    """
+    Возвращает общий для процесса клиент MongoDB, создавая его при первом вызове.
+        :return: объект pymongo.MongoClient (параметры пула — из client_options)
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(os.getenv("MONGO_URI"), **client_options)
+    return _client
+
+
+def set_mongo_database(name):
+    """
+    Задаёт базу MongoDB процесса вместо MONGO_DB (например, базу бенчмарка).
+        :param name: имя базы или None — снова брать из переменной MONGO_DB
+        :return: прежнее заданное имя (или None), чтобы его можно было вернуть
+    """
+    global _database
+    previous, _database = _database, name
+    return previous
+
+
 def get_mongo_connection():
     """
-    Устанавливает подключение к базе данных MongoDB.
+    Возвращает базу данных MongoDB на общем клиенте.
         :return: объект базы данных MongoDB (pymongo.database.Database),
-        полученный на основе переменных окружения MONGO_URI и MONGO_DB.
-    """    
-    uri = os.getenv("MONGO_URI")
-    db_name = os.getenv("MONGO_DB")
-    client = MongoClient(uri)
-    return client[db_name]
+        полученный на основе переменных окружения MONGO_URI и MONGO_DB
+        (или базы, заданной set_mongo_database).
+    """
+    return get_mongo_client()[_database or os.getenv("MONGO_DB")]
+
+
+def get_collection(name):
+    """
+    Возвращает коллекцию MongoDB по имени (разрешается при обращении, а не при импорте).
+        :param name: имя коллекции, например QUERIES_COLLECTION
+        :return: объект pymongo.collection.Collection
+    """
+    return get_mongo_connection()[name]
+
+
+def close_mongo_connection():
+    """
+    Закрывает общий клиент MongoDB (пул соединений и фоновые потоки мониторинга).
+    Следующее обращение создаст новый клиент.
+        :return: None
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+atexit.register(close_mongo_connection)
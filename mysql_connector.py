@@ -2,7 +2,19 @@
 
 import pymysql
 from log_writer import log_error
+import metrics
 import os
+import re
+import json
+import base64
+import binascii
+import inspect
+import functools
+import importlib
+import time
+import queue
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 # конфигурация подключения
@@ -13,17 +25,129 @@ config = {
     'user': os.getenv('MYSQL_USER'),
     'password': os.getenv('MYSQL_PASSWORD'),
     'database': os.getenv('MYSQL_DB'),
+    'connect_timeout': int(os.getenv('MYSQL_CONNECT_TIMEOUT', '10')),     # сек.; при аварии MySQL — не ждать долго
 }
 
+PAGE_SIZE = 10      # размер страницы для постраничного вывода
 
-def connect_db():
+# параметры пула подключений
+POOL_MIN_SIZE = int(os.getenv("MYSQL_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("MYSQL_POOL_MAX", "5"))
+POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "10"))    # ожидание свободного подключения, сек.
+
+_pool = None        # состояние пула (словарь), создаётся init_pool()
+_pool_lock = threading.Lock()
+_active = {}        # id потока -> соединение из пула, которое он сейчас держит (для kill_query)
+
+# кэш справочных данных (жанры, диапазон годов)
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "600"))              # сек.
+REFERENCE_CHECK_FRESHNESS = os.getenv("REFERENCE_CHECK_FRESHNESS", "0") == "1"     # сверять MAX(last_update)
+
+# кэш общего числа совпадений по (тип запроса, параметры)
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "300"))        # сек.
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1024"))       # макс. записей
+
+_count_cache = {}           # ключ -> (total, stored_at)
+_count_lock = threading.Lock()
+
+_reference_cache = {}       # data, loaded_at, version
+_actor_cache = {}           # names, loaded_at
+_reference_lock = threading.Lock()
+
+# альтернативные бэкенды поиска: модули с функциями тех же имён, что и в этом модуле
+BACKEND_MODULES = {
+    "ngram": "film_index",      # триграммный индекс в памяти (название и описание)
+    "snapshot": "snapshot",     # локальный снимок таблиц в SQLite (отвечает и при недоступном MySQL)
+    "bitmap": "genre_index",    # битсеты жанров, годов и рейтингов в памяти (жанр + годы, фильтры)
+}
+_search_backends = []
+
+
+def set_search_backend(*names):
+    """
+    Выбирает бэкенды поиска (по порядку приоритета); без аргументов или "mysql" — только MySQL.
+        :param names: имена бэкендов из BACKEND_MODULES
+        :return: None
+        :raises ValueError: если бэкенд неизвестен
+    """
+    unknown = [name for name in names if name != "mysql" and name not in BACKEND_MODULES]
+    if unknown:
+        raise ValueError(f"Неизвестный бэкенд поиска: {', '.join(unknown)}")
+    _search_backends[:] = [name for name in names if name != "mysql"]
+
+
+def get_search_backends():
+    """
+    Возвращает выбранные бэкенды поиска.
+        :return: список имён по порядку приоритета (пустой — только MySQL)
+    """
+    return list(_search_backends)
+
+
+def _dispatch(func, args, kwargs):
+    """
+    Выполняет вызов первым выбранным бэкендом, реализующим функцию с тем же именем.
+    Бэкенд может вернуть NotImplemented — тогда запрос выполняется следующим бэкендом или MySQL.
+    Если MySQL недоступен (connection is None), ответить могут только бэкенды, иначе результат — None.
+        :return: кортеж (результат, имя ответившего бэкенда или "mysql")
+    """
+    for name in _search_backends:
+        impl = getattr(importlib.import_module(BACKEND_MODULES[name]), func.__name__, None)
+        if impl is None:
+            continue
+        result = impl(*args, **kwargs)
+        if result is not NotImplemented:
+            return result, name
+    return (func(*args, **kwargs) if not args or args[0] is not None else None), "mysql"
+
+
+def _search_backend(func):
+    """
+    Декоратор функций поиска: сначала ищет страницу в кэше результатов (result_cache),
+    при промахе передаёт вызов бэкендам поиска или MySQL (см. _dispatch).
+    Кэшируются только ответы самого MySQL: бэкенды (снимок, индексы в памяти) могут отставать
+    от MySQL, и их ответ нельзя сохранять под свежей версией данных.
+    Время, число строк и объём результата записываются в метрику "query.<имя функции>".
+    Размер страницы функций *_page проверяется здесь, до обращения к кэшу и бэкендам.
+    """
+    metric = f"query.{func.__name__}"
+    signature = inspect.signature(func)
+    paged = "page_size" in signature.parameters
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if paged:
+            try:
+                page_size = signature.bind_partial(*args, **kwargs).arguments.get("page_size", PAGE_SIZE)
+            except TypeError:
+                page_size = PAGE_SIZE       # некорректный вызов — ошибку выдаст сама функция
+            check_page_size(page_size)
+        started = time.perf_counter()
+        cache = importlib.import_module("result_cache")     # модуль кэша сам импортирует этот модуль
+        key = cache.result_key(func, args, kwargs)
+        result, version = cache.get_result(key, args[0]) if key is not None else (None, None)
+        if result is None:
+            result, source = _dispatch(func, args, kwargs)
+            if key is not None and source == "mysql":
+                cache.put_result(key, result, version)
+        metrics.observe(metric, started, result)
+        return result
+    wrapper.serves_offline = True
+    return wrapper
+
+
+set_search_backend(*[name.strip() for name in os.getenv("SEARCH_BACKEND", "mysql").split(",") if name.strip()])
+
+
+def connect_db(database=None):
     """
     Устанавливает подключение к базе данных MySQL.
+        :param database: имя базы данных (по умолчанию — из config, переменная MYSQL_DB)
         :return: объект подключения к базе данных (pymysql.Connection) 
                  или None в случае ошибки.
     """
     try:
-        connection = pymysql.connect(**config)
+        connection = pymysql.connect(**(dict(config, database=database) if database else config))
         return connection
     except pymysql.MySQLError as e:
         print("Ошибка подключения к MySQL.")
@@ -31,7 +155,196 @@ def connect_db():
         log_error("connect_db", str(e))
         return None
 
+
+# ● пул подключений: переиспользование «тёплых» соединений между запросами и потоками
+
+def init_pool(min_size=None, max_size=None, timeout=None):
+    """
+    Создаёт пул подключений к MySQL и заранее открывает min_size соединений.
+    Повторный вызов возвращает уже созданный пул.
+        :param min_size: минимальное число открытых соединений (по умолчанию MYSQL_POOL_MIN)
+        :param max_size: максимальное число соединений (по умолчанию MYSQL_POOL_MAX)
+        :param timeout: время ожидания свободного соединения, сек. (по умолчанию MYSQL_POOL_TIMEOUT)
+        :return: True, если пул готов и хотя бы одно соединение открыто, иначе False
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return True
+        min_size = POOL_MIN_SIZE if min_size is None else min_size
+        max_size = POOL_MAX_SIZE if max_size is None else max_size
+        max_size = max(1, max_size)
+        pool = {
+            "idle": queue.LifoQueue(),      # LIFO: в работу идут самые «свежие» соединения
+            "slots": threading.BoundedSemaphore(max_size),
+            "max_size": max_size,
+            "timeout": POOL_TIMEOUT if timeout is None else timeout,
+        }
+        for _ in range(min(max(1, min_size), max_size)):
+            connection = connect_db()
+            if connection is None:
+                break
+            pool["idle"].put(connection)
+        if pool["idle"].empty():
+            log_error("init_pool", "Не удалось открыть ни одного подключения к MySQL.")
+            return False
+        _pool = pool
+        return True
+
+
+def _is_alive(connection):
+    """
+    Проверяет соединение (ping) и при обрыве переподключается.
+        :param connection: подключение к БД
+        :return: True, если соединение рабочее
+    """
+    try:
+        connection.ping(reconnect=True)
+        return True
+    except pymysql.MySQLError as e:
+        log_error("pool_ping", str(e))
+        return False
+
+
+def get_connection():
+    """
+    Выдаёт соединение из пула (с проверкой живости) или открывает новое, если пул не заполнен.
+        :return: объект подключения или None, если пул не создан, исчерпан или MySQL недоступен
+    """
+    pool = _pool
+    if pool is None and not init_pool():
+        return None
+    pool = _pool
+    if not pool["slots"].acquire(timeout=pool["timeout"]):
+        print("Нет свободных подключений к MySQL.")
+        log_error("get_connection", f"Пул исчерпан: {pool['max_size']} соединений заняты")
+        return None
+
+    connection = None
+    while connection is None:
+        try:
+            candidate = pool["idle"].get_nowait()
+        except queue.Empty:
+            break
+        if _is_alive(candidate):
+            connection = candidate
+        else:
+            _close_quietly(candidate)
+    if connection is None:
+        connection = connect_db()
+    if connection is None:
+        pool["slots"].release()
+    return connection
+
+
+def release_connection(connection):
+    """
+    Возвращает соединение в пул. Открытая транзакция откатывается,
+    чтобы следующий запрос видел актуальные данные.
+        :param connection: подключение, полученное через get_connection()
+        :return: None
+    """
+    pool = _pool
+    if connection is None:
+        return
+    if pool is None:
+        _close_quietly(connection)
+        return
+    try:
+        connection.rollback()
+        pool["idle"].put(connection)
+    except pymysql.MySQLError:
+        _close_quietly(connection)     # сломанное соединение не возвращаем — вместо него откроется новое
+    finally:
+        pool["slots"].release()
+
+
+def _close_quietly(connection):
+    """ Закрывает соединение, игнорируя ошибки. """
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Контекстный менеджер: берёт соединение из пула и возвращает его по выходе из блока.
+    Пока блок выполняется, соединение известно по потоку (kill_query).
+        :return: объект подключения или None, если соединение получить не удалось
+    """
+    connection = get_connection()
+    ident = threading.get_ident()
+    if connection is not None:
+        _active[ident] = connection
+    try:
+        yield connection
+    finally:
+        if _active.get(ident) is connection:
+            del _active[ident]
+        release_connection(connection)
+
+
+def kill_query(thread_ident):
+    """
+    Прерывает запрос MySQL, который выполняет поток thread_ident на соединении из пула
+    (KILL QUERY с отдельного соединения). Соединение остаётся рабочим и вернётся в пул,
+    а функция поиска получит ошибку «Query execution was interrupted».
+        :param thread_ident: threading.get_ident() потока
+        :return: True, если запрос прерван, иначе False (поток не держит соединение или ошибка)
+    """
+    connection = _active.get(thread_ident)
+    if connection is None:
+        return False
+    killer = connect_db()
+    if killer is None:
+        return False
+    try:
+        with killer.cursor() as cursor:
+            cursor.execute("KILL QUERY %s;", (connection.thread_id(),))
+        return True
+    except pymysql.MySQLError as e:
+        log_error("kill_query", str(e))
+        return False
+    finally:
+        _close_quietly(killer)
+
+
+def with_connection(func, *args, **kwargs):
+    """
+    Выполняет функцию поиска на соединении из пула. Если соединение получить не удалось,
+    функции с признаком serves_offline вызываются с connection=None — тогда ответить
+    могут выбранные бэкенды поиска (например, локальный снимок).
+        :param func: функция вида func(connection, *args, **kwargs)
+        :return: результат функции или None, если соединение получить не удалось
+    """
+    with pooled_connection() as connection:
+        if connection is None:
+            if _search_backends and getattr(func, "serves_offline", False):
+                return func(None, *args, **kwargs)
+            return None
+        return func(connection, *args, **kwargs)
+
+
+def close_pool():
+    """
+    Закрывает все свободные соединения пула и удаляет пул.
+        :return: None
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is None:
+        return
+    while True:
+        try:
+            _close_quietly(pool["idle"].get_nowait())
+        except queue.Empty:
+            break
+
 # Функция 1
+@_search_backend
 def search_films_by_keyword(connection, keyword, offset):
     """
     Поиск фильмов по части названия.
@@ -59,6 +372,7 @@ def search_films_by_keyword(connection, keyword, offset):
         return None
 
 # Функция 2
+@_search_backend
 def search_films_by_genre_and_years(connection, genre, year_start, year_end, offset):
     """
     Поиск фильмов по жанру и диапазону годов выпуска.
@@ -90,6 +404,7 @@ def search_films_by_genre_and_years(connection, genre, year_start, year_end, off
         return None
 
 # Функция 3
+@_search_backend
 def get_all_genres(connection):
     """
     Получить список всех жанров.
@@ -109,6 +424,7 @@ def get_all_genres(connection):
         return None
 
 # Функция 4
+@_search_backend
 def get_release_year_range(connection):
     """
     Получить минимальный и максимальный год выпуска фильмов.
@@ -127,27 +443,34 @@ def get_release_year_range(connection):
         return None
 
 # Функция 5
+@_search_backend
 def search_films_by_actor(connection, actor_name, offset):
     """
     Поиск фильмов по имени и/или фамилии актёра (без учёта регистра).
+    Сначала id актёров находятся в кэшированном индексе имён, затем фильмы выбираются по actor_id.
         :param connection: подключение к БД
         :param actor_name: строка (имя, фамилия или оба вместе)
         :param offset: смещение для постраничного вывода
         :return: список фильмов (title, release_year, actor_full_name)
     """
     try:
+        actor_ids = find_actor_ids(connection, actor_name)     # этап 1: id актёров из индекса имён
+        if actor_ids is None:
+            return None
+        if not actor_ids:
+            return []
         with connection.cursor() as cursor:
-            sql = """
+            # этап 2: фильмы по первичному ключу film_actor (actor_id, film_id)
+            sql = f"""
                 SELECT f.title, f.release_year, CONCAT(a.first_name, ' ', a.last_name) AS actor
-                FROM film AS f
-                JOIN film_actor AS fa ON f.film_id = fa.film_id
-                JOIN actor AS a ON fa.actor_id = a.actor_id
-                WHERE UPPER(CONCAT(a.first_name, ' ', a.last_name)) LIKE %s
+                FROM film_actor AS fa
+                JOIN film AS f ON f.film_id = fa.film_id
+                JOIN actor AS a ON a.actor_id = fa.actor_id
+                WHERE fa.actor_id IN ({", ".join(["%s"] * len(actor_ids))})
                 ORDER BY f.release_year DESC, f.title
                 LIMIT 10 OFFSET %s;
             """
-            param = f"%{actor_name.strip().upper()}%"
-            cursor.execute(sql, (param, int(offset)))
+            cursor.execute(sql, (*actor_ids, int(offset)))
             return cursor.fetchall()
     except pymysql.MySQLError as e:
         print("Ошибка при поиске фильмов по актёру.")
@@ -156,6 +479,7 @@ def search_films_by_actor(connection, actor_name, offset):
         return None
 
 # Функция 6
+@_search_backend
 def get_film_count_by_year(connection):
     """
     Получить количество фильмов по годам выпуска.
@@ -179,6 +503,7 @@ def get_film_count_by_year(connection):
         return None
 
 # Функция 7
+@_search_backend
 def search_films_by_description(connection, keyword, offset):
     """
     Поиск фильмов по ключевому слову в описании.
@@ -204,3 +529,960 @@ def search_films_by_description(connection, keyword, offset):
         print(f"MySQL Error: {e}")
         log_error("search_films_by_description", str(e))
         return None
+
+
+# ● keyset-пагинация (seek): продолжение выборки от ключа последней строки
+
+# тип запроса -> количество значений ключа сортировки в токене страницы
+PAGE_KEY_SIZES = {"keyword": 2, "genre_year": 3, "actor": 4, "description": 2, "filters": 2}
+
+# год выпуска в ключе сортировки: NULL заменяется значением меньше любого года
+# (порядок тот же, что у NULL в MySQL: первым по возрастанию, последним по убыванию)
+NULL_YEAR = -1
+YEAR_KEY = f"COALESCE(f.release_year, {NULL_YEAR})"
+
+
+def year_key(year):
+    """ Год выпуска для ключа keyset-пагинации (NULL -> NULL_YEAR). """
+    return NULL_YEAR if year is None else year
+
+
+def encode_page_token(query_type, key):
+    """
+    Кодирует ключ сортировки последней строки страницы в непрозрачный токен продолжения.
+        :param query_type: тип запроса (например, "keyword", "genre_year")
+        :param key: список значений ключа сортировки последней строки
+        :return: строка-токен (urlsafe base64)
+    """
+    payload = json.dumps({"t": query_type, "k": list(key)}, ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(query_type, token, key_size):
+    """
+    Декодирует токен продолжения и проверяет, что он выдан для этого типа запроса.
+        :param query_type: ожидаемый тип запроса
+        :param token: строка-токен или None (первая страница)
+        :param key_size: ожидаемое количество значений в ключе
+        :return: список значений ключа или None для первой страницы
+        :raises ValueError: если токен повреждён или выдан для другого запроса
+    """
+    if token is None:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise ValueError(f"Некорректный токен страницы: {e}")
+    if not isinstance(payload, dict) or payload.get("t") != query_type:
+        raise ValueError("Токен страницы выдан для другого типа запроса.")
+    key = payload.get("k")
+    if not isinstance(key, list) or len(key) != key_size:
+        raise ValueError("Некорректный ключ в токене страницы.")
+    return key
+
+
+def check_page_size(page_size):
+    """
+    Проверяет размер страницы keyset-пагинации.
+        :param page_size: количество строк на странице
+        :return: размер страницы (int)
+        :raises ValueError: если размер меньше 1
+    """
+    if int(page_size) < 1:
+        raise ValueError(f"Размер страницы должен быть не меньше 1: {page_size}")
+    return int(page_size)
+
+
+def _split_page(query_type, rows, key_of, page_size):
+    """
+    Отделяет страницу от служебной (page_size + 1)-й строки и строит токен следующей страницы.
+        :param query_type: тип запроса
+        :param rows: строки, выбранные с LIMIT page_size + 1
+        :param key_of: функция, возвращающая ключ сортировки строки
+        :param page_size: размер страницы
+        :return: кортеж (строки страницы, токен следующей страницы или None)
+    """
+    rows = list(rows)
+    if len(rows) <= page_size:
+        return rows, None
+    page = rows[:page_size]
+    return page, encode_page_token(query_type, key_of(page[-1]))
+
+
+# ● общее число совпадений: считается оконной функцией вместе с первой страницей и кэшируется
+
+TOTAL_COLUMN = ", COUNT(*) OVER () AS total_count"
+
+
+def _count_key(query_type, params):
+    """
+    Ключ кэша счётчиков: тип запроса + параметры в нижнем регистре (сопоставление _ci).
+    Пробелы не убираются: '%ace %' и '%ace%' — разные шаблоны LIKE с разными итогами.
+    """
+    return query_type, tuple(p.lower() if isinstance(p, str) else p for p in params)
+
+
+def get_cached_total(query_type, params):
+    """
+    Возвращает закэшированное общее число совпадений для запроса.
+        :param query_type: тип запроса (например, "keyword")
+        :param params: кортеж параметров поиска
+        :return: число совпадений или None, если его нет в кэше (или оно устарело)
+    """
+    key = _count_key(query_type, params)
+    with _count_lock:
+        cached = _count_cache.get(key)
+        if cached is None:
+            return None
+        if time.monotonic() - cached[1] >= COUNT_CACHE_TTL:
+            del _count_cache[key]
+            return None
+        return cached[0]
+
+
+def store_total(query_type, params, total):
+    """
+    Сохраняет общее число совпадений в кэш (при переполнении вытесняются самые старые записи).
+        :param query_type: тип запроса
+        :param params: кортеж параметров поиска
+        :param total: число совпадений
+        :return: None
+    """
+    key = _count_key(query_type, params)
+    with _count_lock:
+        _count_cache.pop(key, None)
+        _count_cache[key] = (total, time.monotonic())
+        while len(_count_cache) > COUNT_CACHE_SIZE:
+            del _count_cache[next(iter(_count_cache))]
+
+
+def invalidate_count_cache():
+    """
+    Очищает кэш общего числа совпадений.
+        :return: None
+    """
+    with _count_lock:
+        _count_cache.clear()
+
+
+def _plan_total(with_total, query_type, params, after):
+    """
+    Решает, откуда взять общее число совпадений.
+        :return: кортеж (total из кэша или None, нужно ли добавить в запрос COUNT(*) OVER ())
+    """
+    if not with_total:
+        return None, False
+    total = get_cached_total(query_type, params)
+    # после keyset-условия оконная функция посчитала бы только оставшиеся строки
+    return total, total is None and after is None
+
+
+def _take_total(rows, inline, query_type, params, total):
+    """
+    Отделяет столбец total_count от строк и кэширует общее число совпадений.
+        :return: кортеж (строки без total_count, total)
+    """
+    rows = list(rows)
+    if not inline:
+        return rows, total
+    total = rows[0][-1] if rows else 0
+    store_total(query_type, params, total)
+    return [row[:-1] for row in rows], total
+
+
+def _page_result(page, token, total, with_total):
+    """ Формирует результат функции *_page: (строки, токен) или (строки, токен, total). """
+    return (page, token, total) if with_total else (page, token)
+
+
+@_search_backend
+def search_films_by_keyword_page(connection, keyword, page_token=None, page_size=PAGE_SIZE,
+                                 with_total=False):
+    """
+    Поиск фильмов по части названия с keyset-пагинацией по ключу (title, film_id).
+        :param connection: подключение к БД
+        :param keyword: ключевое слово для поиска
+        :param page_token: токен продолжения из предыдущего вызова (None — первая страница)
+        :param page_size: количество фильмов на странице
+        :param with_total: вернуть также общее число совпадений (считается с первой страницей)
+        :return: кортеж (список фильмов (film_id, title, release_year, rating, length),
+                 токен следующей страницы или None[, общее число совпадений или None])
+                 или None в случае ошибки
+    """
+    try:
+        after = decode_page_token("keyword", page_token, 2)
+        total, inline = _plan_total(with_total, "keyword", (keyword,), after)
+        with connection.cursor() as cursor:
+            sql = f"""
+                SELECT film_id, title, release_year, rating, length{TOTAL_COLUMN if inline else ""}
+                FROM film
+                WHERE title LIKE %s
+            """
+            params = [f"%{keyword}%"]
+            if after:
+                sql += " AND (title > %s OR (title = %s AND film_id > %s))"
+                params += [after[0], after[0], after[1]]
+            sql += " ORDER BY title, film_id LIMIT %s;"
+            params.append(int(page_size) + 1)
+            cursor.execute(sql, params)
+            rows, total = _take_total(cursor.fetchall(), inline, "keyword", (keyword,), total)
+            page, token = _split_page("keyword", rows, lambda r: (r[1], r[0]), page_size)
+            return _page_result(page, token, total, with_total)
+    except ValueError as e:
+        print("Некорректный токен страницы.")
+        log_error("search_films_by_keyword_page", str(e))
+        return None
+    except pymysql.MySQLError as e:
+        print("Ошибка выполнения запроса поиска фильма по названию.")
+        print(f"MySQL Error: {e}")
+        log_error("search_films_by_keyword_page", str(e))
+        return None
+
+
+@_search_backend
+def search_films_by_genre_and_years_page(connection, genre, year_start, year_end,
+                                         page_token=None, page_size=PAGE_SIZE, with_total=False):
+    """
+    Поиск фильмов по жанру и диапазону годов с keyset-пагинацией по ключу (release_year, title, film_id).
+        :param connection: подключение к БД
+        :param genre: название жанра
+        :param year_start: начальный год
+        :param year_end: конечный год
+        :param page_token: токен продолжения из предыдущего вызова (None — первая страница)
+        :param page_size: количество фильмов на странице
+        :param with_total: вернуть также общее число совпадений (считается с первой страницей)
+        :return: кортеж (список фильмов (film_id, title, release_year, genre),
+                 токен следующей страницы или None[, общее число совпадений или None])
+                 или None в случае ошибки
+    """
+    try:
+        after = decode_page_token("genre_year", page_token, 3)
+        count_params = (genre, year_start, year_end)
+        total, inline = _plan_total(with_total, "genre_year", count_params, after)
+        with connection.cursor() as cursor:
+            sql = f"""
+                SELECT f.film_id, f.title, f.release_year, c.name AS genre{TOTAL_COLUMN if inline else ""}
+                FROM film AS f
+                JOIN film_category AS fc ON f.film_id = fc.film_id
+                JOIN category AS c ON fc.category_id = c.category_id
+                WHERE c.name = %s
+                  AND f.release_year BETWEEN %s AND %s
+            """
+            params = [genre, year_start, year_end]
+            if after:
+                # NULL-год заменяется на NULL_YEAR и в ключе, и в ORDER BY: сравнение с NULL
+                # не истинно, и такие строки пропали бы на следующих страницах
+                sql += f"""
+                  AND ({YEAR_KEY} > %s
+                       OR ({YEAR_KEY} = %s AND f.title > %s)
+                       OR ({YEAR_KEY} = %s AND f.title = %s AND f.film_id > %s))
+                """
+                params += [after[0], after[0], after[1], after[0], after[1], after[2]]
+            sql += f" ORDER BY {YEAR_KEY}, f.title, f.film_id LIMIT %s;"
+            params.append(int(page_size) + 1)
+            cursor.execute(sql, params)
+            rows, total = _take_total(cursor.fetchall(), inline, "genre_year", count_params, total)
+            page, token = _split_page("genre_year", rows, lambda r: (year_key(r[2]), r[1], r[0]), page_size)
+            return _page_result(page, token, total, with_total)
+    except ValueError as e:
+        print("Некорректный токен страницы.")
+        log_error("search_films_by_genre_and_years_page", str(e))
+        return None
+    except pymysql.MySQLError as e:
+        print("Ошибка выполнения запроса поиска фильмов по жанру и годам.")
+        print(f"MySQL Error: {e}")
+        log_error("search_films_by_genre_and_years_page", str(e))
+        return None
+
+
+@_search_backend
+def search_films_by_actor_page(connection, actor_name, page_token=None, page_size=PAGE_SIZE,
+                               with_total=False):
+    """
+    Поиск фильмов по имени и/или фамилии актёра с keyset-пагинацией
+    по ключу (release_year DESC, title, film_id, actor_id).
+        :param connection: подключение к БД
+        :param actor_name: строка (имя, фамилия или оба вместе)
+        :param page_token: токен продолжения из предыдущего вызова (None — первая страница)
+        :param page_size: количество фильмов на странице
+        :param with_total: вернуть также общее число совпадений (считается с первой страницей)
+        :return: кортеж (список фильмов (title, release_year, actor_full_name),
+                 токен следующей страницы или None[, общее число совпадений или None])
+                 или None в случае ошибки
+    """
+    try:
+        after = decode_page_token("actor", page_token, 4)
+        actor_ids = find_actor_ids(connection, actor_name)     # этап 1: id актёров из индекса имён
+        if actor_ids is None:
+            return None
+        if not actor_ids:
+            return _page_result([], None, 0, with_total)
+        total, inline = _plan_total(with_total, "actor", (actor_name,), after)
+        with connection.cursor() as cursor:
+            # этап 2: фильмы по первичному ключу film_actor (actor_id, film_id)
+            sql = f"""
+                SELECT f.title, f.release_year, CONCAT(a.first_name, ' ', a.last_name) AS actor,
+                       f.film_id, a.actor_id{TOTAL_COLUMN if inline else ""}
+                FROM film_actor AS fa
+                JOIN film AS f ON f.film_id = fa.film_id
+                JOIN actor AS a ON a.actor_id = fa.actor_id
+                WHERE fa.actor_id IN ({", ".join(["%s"] * len(actor_ids))})
+            """
+            params = list(actor_ids)
+            if after:
+                sql += f"""
+                  AND ({YEAR_KEY} < %s
+                       OR ({YEAR_KEY} = %s AND f.title > %s)
+                       OR ({YEAR_KEY} = %s AND f.title = %s AND f.film_id > %s)
+                       OR ({YEAR_KEY} = %s AND f.title = %s AND f.film_id = %s AND a.actor_id > %s))
+                """
+                params += [after[0],
+                           after[0], after[1],
+                           after[0], after[1], after[2],
+                           after[0], after[1], after[2], after[3]]
+            sql += f" ORDER BY {YEAR_KEY} DESC, f.title, f.film_id, a.actor_id LIMIT %s;"
+            params.append(int(page_size) + 1)
+            cursor.execute(sql, params)
+            rows, total = _take_total(cursor.fetchall(), inline, "actor", (actor_name,), total)
+            page, token = _split_page("actor", rows, lambda r: (year_key(r[1]), r[0], r[3], r[4]), page_size)
+            return _page_result([row[:3] for row in page], token, total, with_total)
+    except ValueError as e:
+        print("Некорректный токен страницы.")
+        log_error("search_films_by_actor_page", str(e))
+        return None
+    except pymysql.MySQLError as e:
+        print("Ошибка при поиске фильмов по актёру.")
+        print(f"MySQL Error: {e}")
+        log_error("search_films_by_actor_page", str(e))
+        return None
+
+
+@_search_backend
+def search_films_by_description_page(connection, keyword, page_token=None, page_size=PAGE_SIZE,
+                                     with_total=False):
+    """
+    Поиск фильмов по ключевому слову в описании с keyset-пагинацией по ключу (title, film_id).
+        :param connection: подключение к БД
+        :param keyword: ключевое слово
+        :param page_token: токен продолжения из предыдущего вызова (None — первая страница)
+        :param page_size: количество фильмов на странице
+        :param with_total: вернуть также общее число совпадений (считается с первой страницей)
+        :return: кортеж (список фильмов (title, release_year, description),
+                 токен следующей страницы или None[, общее число совпадений или None])
+                 или None в случае ошибки
+    """
+    try:
+        after = decode_page_token("description", page_token, 2)
+        total, inline = _plan_total(with_total, "description", (keyword,), after)
+        with connection.cursor() as cursor:
+            sql = f"""
+                SELECT title, release_year, description, film_id{TOTAL_COLUMN if inline else ""}
+                FROM film
+                WHERE description LIKE %s
+            """
+            params = [f"%{keyword}%"]
+            if after:
+                sql += " AND (title > %s OR (title = %s AND film_id > %s))"
+                params += [after[0], after[0], after[1]]
+            sql += " ORDER BY title, film_id LIMIT %s;"
+            params.append(int(page_size) + 1)
+            cursor.execute(sql, params)
+            rows, total = _take_total(cursor.fetchall(), inline, "description", (keyword,), total)
+            page, token = _split_page("description", rows, lambda r: (r[0], r[3]), page_size)
+            return _page_result([row[:3] for row in page], token, total, with_total)
+    except ValueError as e:
+        print("Некорректный токен страницы.")
+        log_error("search_films_by_description_page", str(e))
+        return None
+    except pymysql.MySQLError as e:
+        print("Ошибка поиска по описанию.")
+        print(f"MySQL Error: {e}")
+        log_error("search_films_by_description_page", str(e))
+        return None
+
+
+# ● версия данных поиска: одна сверка MAX(last_update) и COUNT(*) на все кэши процесса
+
+DATA_VERSION_TABLES = ("film", "category", "film_category", "actor", "film_actor")
+DATA_VERSION_CHECK_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "60"))   # как часто сверять, сек.
+
+_data_version = {"tables": None, "measured_at": None, "refresher": None}
+_data_version_lock = threading.Lock()
+
+
+def _probe_data_versions(connection):
+    """
+    Выполняет сверку версий таблиц и сохраняет результат, если он не старше уже известного.
+        :param connection: подключение к БД
+        :return: словарь {таблица: (max_last_update, count)} или None в случае ошибки
+    """
+    started = time.monotonic()
+    parts = ", ".join(f"(SELECT MAX(last_update) FROM {table}), (SELECT COUNT(*) FROM {table})"
+                      for table in DATA_VERSION_TABLES)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {parts};")
+            row = cursor.fetchone()
+    except pymysql.MySQLError as e:
+        log_error("get_data_versions", str(e))
+        return None
+    tables = {table: (row[2 * i], row[2 * i + 1]) for i, table in enumerate(DATA_VERSION_TABLES)}
+    with _data_version_lock:
+        measured_at = _data_version["measured_at"]
+        if measured_at is None or started >= measured_at:      # параллельная сверка могла быть свежее
+            _data_version.update(tables=tables, measured_at=started)
+    return tables
+
+
+def _refresh_data_versions():
+    """
+    Фоновый поток сверки: на собственном соединении (не из пула запросов)
+    раз в DATA_VERSION_CHECK_SECONDS обновляет версии таблиц.
+        :return: None
+    """
+    connection = None
+    while True:
+        if connection is None:
+            connection = connect_db()
+        if connection is not None:
+            if _probe_data_versions(connection) is None:
+                _close_quietly(connection)      # при следующей сверке соединение откроется заново
+                connection = None
+            else:
+                _end_transaction(connection)    # следующая сверка должна видеть новые данные (REPEATABLE READ)
+        time.sleep(DATA_VERSION_CHECK_SECONDS)
+
+
+def _end_transaction(connection):
+    """ Завершает транзакцию долгоживущего соединения, игнорируя ошибки. """
+    try:
+        connection.rollback()
+    except pymysql.MySQLError:
+        pass
+
+
+def get_data_versions(connection, fresh=False):
+    """
+    Возвращает версии таблиц поиска: MAX(last_update) и COUNT(*) (COUNT нужен, чтобы заметить удаления).
+    Столбец last_update не проиндексирован и сверка сканирует таблицы, поэтому на пути запроса
+    она не выполняется: версии обновляет фоновый поток раз в DATA_VERSION_CHECK_SECONDS, а все кэши
+    (кэш результатов, локальные индексы, снимок, справочные данные и графики) читают последний результат.
+        :param connection: подключение к БД или None (MySQL недоступен — фоновая сверка не запускается)
+        :param fresh: True — сверить сразу на этом соединении (при построении индексов и снимка,
+                      которые и так читают таблицы целиком)
+        :return: словарь {таблица: (max_last_update, count)} — последний известный, если сверка
+                 не удалась, — или None, если версия ещё ни разу не получена
+    """
+    if connection is None:
+        return _data_version["tables"]
+    if fresh:
+        return _probe_data_versions(connection) or _data_version["tables"]
+    with _data_version_lock:
+        if _data_version["refresher"] is None:
+            refresher = threading.Thread(target=_refresh_data_versions, name="data-version", daemon=True)
+            _data_version["refresher"] = refresher
+            refresher.start()
+        return _data_version["tables"]
+
+
+# ● кэш справочных данных: жанры и диапазон годов меняются редко
+
+def _reference_version(connection):
+    """
+    Получает «версию» справочных данных: MAX(last_update) таблиц category и film (см. get_data_versions).
+        :param connection: подключение к БД
+        :return: кортеж (category_last_update, film_last_update) или None, если версия неизвестна
+    """
+    versions = get_data_versions(connection)
+    return None if versions is None else (versions["category"][0], versions["film"][0])
+
+
+def get_reference_data(connection):
+    """
+    Возвращает справочные данные для поиска по жанру и годам из кэша с TTL.
+    По истечении REFERENCE_CACHE_TTL данные перечитываются; при REFERENCE_CHECK_FRESHNESS=1
+    сначала сверяется MAX(last_update), и если он не изменился, кэш продлевается без перечитывания.
+        :param connection: подключение к БД
+        :return: словарь с ключами:
+            - genres: список названий жанров
+            - genres_map: словарь {жанр в нижнем регистре: название жанра}
+            - year_range: кортеж (min_year, max_year)
+            или None в случае ошибки
+    """
+    with _reference_lock:
+        cached = _reference_cache.get("data")
+        if cached and time.monotonic() - _reference_cache["loaded_at"] < REFERENCE_CACHE_TTL:
+            return cached
+
+        version = None
+        if REFERENCE_CHECK_FRESHNESS and connection is not None:
+            version = _reference_version(connection)
+            if cached and version is not None and version == _reference_cache.get("version"):
+                _reference_cache["loaded_at"] = time.monotonic()
+                return cached
+
+        genres = get_all_genres(connection)
+        year_range = get_release_year_range(connection)
+        if genres is None or year_range is None:
+            return None
+        data = {
+            "genres": genres,
+            "genres_map": {g.lower(): g for g in genres},
+            "year_range": tuple(year_range),
+        }
+        _reference_cache.update(data=data, loaded_at=time.monotonic(), version=version)
+        return data
+
+
+get_reference_data.serves_offline = True     # жанры и годы — через бэкенды поиска и без MySQL
+
+
+def invalidate_reference_cache():
+    """
+    Сбрасывает кэш справочных данных и индекс имён актёров (следующий запрос перечитает их из БД).
+        :return: None
+    """
+    with _reference_lock:
+        _reference_cache.clear()
+        _actor_cache.clear()
+
+
+# ● индекс имён актёров: поиск actor_id без UPPER(CONCAT(...)) LIKE по соединению таблиц
+
+def get_actor_names(connection):
+    """
+    Возвращает кэшированный (REFERENCE_CACHE_TTL) список актёров с именами в верхнем регистре.
+        :param connection: подключение к БД
+        :return: список кортежей (actor_id, "FIRST LAST") или None в случае ошибки
+    """
+    with _reference_lock:
+        names = _actor_cache.get("names")
+        if names is not None and time.monotonic() - _actor_cache["loaded_at"] < REFERENCE_CACHE_TTL:
+            return names
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT actor_id, first_name, last_name FROM actor ORDER BY actor_id;")
+                names = [(actor_id, f"{first} {last}".upper()) for actor_id, first, last in cursor.fetchall()]
+        except pymysql.MySQLError as e:
+            print("Ошибка загрузки списка актёров.")
+            print(f"MySQL Error: {e}")
+            log_error("get_actor_names", str(e))
+            return None
+        _actor_cache.update(names=names, loaded_at=time.monotonic())
+        return names
+
+
+def _like_to_regex(pattern):
+    """
+    Переводит шаблон LIKE (% и _, экранирование \\ — как по умолчанию в MySQL)
+    в регулярное выражение для полного совпадения.
+        :param pattern: шаблон LIKE
+        :return: скомпилированное регулярное выражение
+    """
+    parts = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == "\\":
+            parts.append(re.escape(next(chars, "\\")))    # \\ в конце шаблона — сам символ
+        elif char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def find_actor_ids(connection, actor_name):
+    """
+    Находит id актёров, у которых «ИМЯ ФАМИЛИЯ» содержит строку поиска (без учёта регистра).
+    Совпадает с условием UPPER(CONCAT(first_name, ' ', last_name)) LIKE '%X%':
+    подходят часть имени, часть фамилии или «имя фамилия» целиком.
+        :param connection: подключение к БД
+        :param actor_name: строка (имя, фамилия или оба вместе)
+        :return: отсортированный список actor_id или None в случае ошибки
+    """
+    names = get_actor_names(connection)
+    if names is None:
+        return None
+    needle = actor_name.strip().upper()
+    if "%" in needle or "_" in needle or "\\" in needle:
+        regex = _like_to_regex(f"%{needle}%")
+        return [actor_id for actor_id, full_name in names if regex.fullmatch(full_name)]
+    return [actor_id for actor_id, full_name in names if needle in full_name]
+
+
+# ● потоковая выгрузка полных результатов (серверный курсор, без OFFSET и без fetchall)
+
+EXPORT_COLUMNS = {
+    "keyword": ("film_id", "title", "release_year", "rating", "length"),
+    "genre_year": ("film_id", "title", "release_year", "genre"),
+    "actor": ("title", "release_year", "actor"),
+    "description": ("title", "release_year", "description"),
+    "film_count_by_year": ("release_year", "film_count"),
+    "filters": ("film_id", "title", "release_year", "rating", "length"),
+}
+
+
+def _export_query(connection, query_type, params):
+    """
+    Строит полный (без LIMIT) запрос выгрузки для типа поиска.
+        :param connection: подключение к БД (нужно для поиска id актёров)
+        :param query_type: тип запроса из EXPORT_COLUMNS
+        :param params: словарь параметров (как в log_search)
+        :return: кортеж (sql, параметры) или None, если выгружать нечего
+        :raises ValueError: если тип запроса неизвестен
+    """
+    if query_type == "keyword":
+        return """
+            SELECT film_id, title, release_year, rating, length
+            FROM film
+            WHERE title LIKE %s
+            ORDER BY title, film_id;
+        """, [f"%{params['keyword']}%"]
+    if query_type == "genre_year":
+        return """
+            SELECT f.film_id, f.title, f.release_year, c.name AS genre
+            FROM film AS f
+            JOIN film_category AS fc ON f.film_id = fc.film_id
+            JOIN category AS c ON fc.category_id = c.category_id
+            WHERE c.name = %s
+              AND f.release_year BETWEEN %s AND %s
+            ORDER BY f.release_year, f.title, f.film_id;
+        """, [params["genre"], params["year_start"], params["year_end"]]
+    if query_type == "actor":
+        actor_ids = find_actor_ids(connection, params["actor_name"])
+        if actor_ids is None:
+            raise pymysql.MySQLError("Не удалось получить список актёров")
+        if not actor_ids:
+            return None
+        return f"""
+            SELECT f.title, f.release_year, CONCAT(a.first_name, ' ', a.last_name) AS actor
+            FROM film_actor AS fa
+            JOIN film AS f ON f.film_id = fa.film_id
+            JOIN actor AS a ON a.actor_id = fa.actor_id
+            WHERE fa.actor_id IN ({", ".join(["%s"] * len(actor_ids))})
+            ORDER BY f.release_year DESC, f.title, f.film_id, a.actor_id;
+        """, list(actor_ids)
+    if query_type == "description":
+        return """
+            SELECT title, release_year, description
+            FROM film
+            WHERE description LIKE %s
+            ORDER BY title, film_id;
+        """, [f"%{params['keyword']}%"]
+    if query_type == "film_count_by_year":
+        return """
+            SELECT release_year, COUNT(*) AS film_count
+            FROM film
+            GROUP BY release_year
+            ORDER BY release_year;
+        """, []
+    if query_type == "filters":
+        filters = normalize_film_filters(params)
+        actor_ids = None
+        if "actor" in filters:
+            actor_ids = find_actor_ids(connection, filters["actor"])
+            if actor_ids is None:
+                raise pymysql.MySQLError("Не удалось получить список актёров")
+            if not actor_ids:
+                return None
+        return build_film_filter_query(filters, actor_ids, limit=None)
+    raise ValueError(f"Неизвестный тип выгрузки: {query_type}")
+
+
+def iter_search_results(connection, query_type, params, chunk_size=1000):
+    """
+    Генератор всех строк результата поиска через небуферизованный серверный курсор (SSCursor):
+    строки читаются с сервера порциями по chunk_size, в памяти одновременно — не больше одной порции.
+    Пока генератор не исчерпан или не закрыт, соединение нельзя использовать для других запросов.
+        :param connection: подключение к БД
+        :param query_type: тип запроса из EXPORT_COLUMNS
+        :param params: словарь параметров (как в log_search; для film_count_by_year — пустой)
+        :param chunk_size: размер порции чтения
+        :return: генератор кортежей (столбцы — EXPORT_COLUMNS[query_type])
+        :raises pymysql.MySQLError: при ошибке MySQL (ошибка также записывается в журнал)
+    """
+    try:
+        query = _export_query(connection, query_type, params or {})
+        if query is None:
+            return
+        sql, sql_params = query
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(sql, sql_params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+    except pymysql.MySQLError as e:
+        print("Ошибка потоковой выгрузки результатов.")
+        print(f"MySQL Error: {e}")
+        log_error("iter_search_results", str(e))
+        raise
+
+
+# ● поиск фильмов по одному термину в заданном поле (для объединённого поиска)
+
+@_search_backend
+def search_films_matching(connection, field, term, limit=PAGE_SIZE, with_total=False):
+    """
+    Находит фильмы, у которых заданное поле содержит термин; всегда возвращает film_id,
+    чтобы результаты разных полей можно было объединить без дублей.
+        :param connection: подключение к БД
+        :param field: "keyword" (название), "description" (описание) или "actor" (имя актёра)
+        :param term: искомая строка
+        :param limit: максимальное количество фильмов
+        :param with_total: True — вернуть также общее число совпадений (без учёта limit)
+        :return: список кортежей (film_id, title, release_year), упорядоченный по (title, film_id),
+                 при with_total — кортеж (список, общее число совпадений); None в случае ошибки
+    """
+    query_type = f"matching_{field}"
+    try:
+        total, inline = _plan_total(with_total, query_type, (term,), None)
+        window = ", COUNT(*) OVER () AS total_count" if inline else ""
+        if field in ("keyword", "description"):
+            column = "title" if field == "keyword" else "description"
+            sql = f"""
+                SELECT film_id, title, release_year{window}
+                FROM film
+                WHERE {column} LIKE %s
+                ORDER BY title, film_id
+                LIMIT %s;
+            """
+            params = [f"%{term}%", int(limit)]
+        elif field == "actor":
+            actor_ids = find_actor_ids(connection, term)
+            if actor_ids is None:
+                return None
+            if not actor_ids:
+                return ([], 0) if with_total else []
+            sql = f"""
+                SELECT f.film_id, f.title, f.release_year{window}
+                FROM film AS f
+                WHERE EXISTS (SELECT 1 FROM film_actor AS fa
+                              WHERE fa.film_id = f.film_id
+                                AND fa.actor_id IN ({", ".join(["%s"] * len(actor_ids))}))
+                ORDER BY f.title, f.film_id
+                LIMIT %s;
+            """
+            params = [*actor_ids, int(limit)]
+        else:
+            raise ValueError(f"Неизвестное поле поиска: {field}")
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows, total = _take_total(cursor.fetchall(), inline, query_type, (term,), total)
+        return (rows, total) if with_total else rows
+    except ValueError as e:
+        log_error("search_films_matching", str(e))
+        return None
+    except pymysql.MySQLError as e:
+        print("Ошибка объединённого поиска фильмов.")
+        print(f"MySQL Error: {e}")
+        log_error("search_films_matching", str(e))
+        return None
+
+
+# ● комбинированный поиск: любые фильтры собираются в один параметризованный запрос
+
+FILM_FILTERS = ("title", "genre", "year_start", "year_end", "actor", "description",
+                "rating", "length_min", "length_max")
+FILM_RATINGS = ("G", "PG", "PG-13", "R", "NC-17")
+FILTERED_COLUMNS = ("film_id", "title", "release_year", "rating", "length")
+
+
+def normalize_film_filters(filters):
+    """
+    Проверяет фильтры и приводит их к единому виду: пустые значения отбрасываются,
+    годы и длительность — целые числа, рейтинг — в верхнем регистре.
+        :param filters: словарь фильтров (ключи из FILM_FILTERS)
+        :return: новый словарь только с заданными фильтрами
+        :raises ValueError: если фильтр неизвестен, значение некорректно или не задан ни один фильтр
+    """
+    unknown = set(filters) - set(FILM_FILTERS)
+    if unknown:
+        raise ValueError(f"Неизвестные фильтры: {', '.join(sorted(unknown))}")
+    result = {}
+    for name in FILM_FILTERS:
+        value = filters.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            continue
+        if name in ("year_start", "year_end", "length_min", "length_max"):
+            value = int(value)
+        result[name] = value
+    if "rating" in result:
+        result["rating"] = str(result["rating"]).upper()
+        if result["rating"] not in FILM_RATINGS:
+            raise ValueError(f"Неизвестный рейтинг: {result['rating']}")
+    for low, high in (("year_start", "year_end"), ("length_min", "length_max")):
+        if low in result and high in result and result[high] < result[low]:
+            raise ValueError(f"{high} меньше {low}")
+    if not result:
+        raise ValueError("Не задан ни один фильтр")
+    return result
+
+
+def build_film_filter_query(filters, actor_ids=None, after=None, limit=PAGE_SIZE + 1, with_total=False):
+    """
+    Собирает один запрос по набору фильтров. Условия на столбцы film идут в WHERE как есть
+    (LIKE, BETWEEN, =), жанр и актёр — полусоединениями EXISTS, которые оптимизатор MySQL
+    выполняет по индексам film_category и film_actor и сам выбирает порядок соединения;
+    таблицы, не нужные для заданных фильтров, в запрос не попадают, а фильм не дублируется,
+    сколько бы его актёров ни совпало.
+        :param filters: словарь после normalize_film_filters
+        :param actor_ids: id актёров (find_actor_ids), если задан фильтр actor
+        :param after: ключ (title, film_id) последней строки предыдущей страницы или None
+        :param limit: LIMIT запроса или None — без ограничения (для выгрузки)
+        :param with_total: добавить столбец COUNT(*) OVER ()
+        :return: кортеж (sql, параметры); столбцы — FILTERED_COLUMNS[, total_count]
+    """
+    conditions, params = [], []
+    if "title" in filters:
+        conditions.append("f.title LIKE %s")
+        params.append(f"%{filters['title']}%")
+    if "year_start" in filters and "year_end" in filters:
+        conditions.append("f.release_year BETWEEN %s AND %s")
+        params += [filters["year_start"], filters["year_end"]]
+    elif "year_start" in filters:
+        conditions.append("f.release_year >= %s")
+        params.append(filters["year_start"])
+    elif "year_end" in filters:
+        conditions.append("f.release_year <= %s")
+        params.append(filters["year_end"])
+    if "rating" in filters:
+        conditions.append("f.rating = %s")
+        params.append(filters["rating"])
+    if "length_min" in filters:
+        conditions.append("f.length >= %s")
+        params.append(filters["length_min"])
+    if "length_max" in filters:
+        conditions.append("f.length <= %s")
+        params.append(filters["length_max"])
+    if "description" in filters:
+        conditions.append("f.description LIKE %s")
+        params.append(f"%{filters['description']}%")
+    if "genre" in filters:
+        conditions.append("""EXISTS (SELECT 1 FROM film_category AS fc
+                       JOIN category AS c ON c.category_id = fc.category_id
+                       WHERE fc.film_id = f.film_id AND c.name = %s)""")
+        params.append(filters["genre"])
+    if actor_ids is not None:
+        conditions.append(f"""EXISTS (SELECT 1 FROM film_actor AS fa
+                       WHERE fa.film_id = f.film_id
+                         AND fa.actor_id IN ({", ".join(["%s"] * len(actor_ids))}))""")
+        params += list(actor_ids)
+    if after:
+        conditions.append("(f.title > %s OR (f.title = %s AND f.film_id > %s))")
+        params += [after[0], after[0], after[1]]
+
+    where = "\n          AND ".join(conditions) or "TRUE"
+    sql = f"""
+        SELECT f.film_id, f.title, f.release_year, f.rating, f.length{TOTAL_COLUMN if with_total else ""}
+        FROM film AS f
+        WHERE {where}
+        ORDER BY f.title, f.film_id"""
+    if limit is not None:
+        sql += "\n        LIMIT %s"
+        params.append(int(limit))
+    return sql + ";", params
+
+
+@_search_backend
+def search_films_filtered_page(connection, filters, page_token=None, page_size=PAGE_SIZE, with_total=False):
+    """
+    Поиск фильмов по любому сочетанию фильтров (название, жанр, годы, актёр, описание,
+    рейтинг, длительность) одним запросом с keyset-пагинацией по ключу (title, film_id).
+        :param connection: подключение к БД
+        :param filters: словарь фильтров (ключи из FILM_FILTERS)
+        :param page_token: токен продолжения из предыдущего вызова (None — первая страница)
+        :param page_size: количество фильмов на странице
+        :param with_total: вернуть также общее число совпадений (считается с первой страницей)
+        :return: кортеж (список фильмов (film_id, title, release_year, rating, length),
+                 токен следующей страницы или None[, общее число совпадений или None])
+                 или None в случае ошибки
+    """
+    try:
+        filters = normalize_film_filters(filters)
+        after = decode_page_token("filters", page_token, 2)
+        actor_ids = None
+        if "actor" in filters:
+            actor_ids = find_actor_ids(connection, filters["actor"])
+            if actor_ids is None:
+                return None
+            if not actor_ids:
+                return _page_result([], None, 0, with_total)
+        count_params = tuple(filters.get(name) for name in FILM_FILTERS)
+        total, inline = _plan_total(with_total, "filters", count_params, after)
+        sql, params = build_film_filter_query(filters, actor_ids, after, int(page_size) + 1, inline)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows, total = _take_total(cursor.fetchall(), inline, "filters", count_params, total)
+            page, token = _split_page("filters", rows, lambda r: (r[1], r[0]), page_size)
+            return _page_result(page, token, total, with_total)
+    except ValueError as e:
+        print(f"Некорректные параметры поиска: {e}")
+        log_error("search_films_filtered_page", str(e))
+        return None
+    except pymysql.MySQLError as e:
+        print("Ошибка комбинированного поиска фильмов.")
+        print(f"MySQL Error: {e}")
+        log_error("search_films_filtered_page", str(e))
+        return None
+
+
+# ● количество фильмов по годам в разрезе жанров или рейтингов (для графиков)
+
+FILM_BREAKDOWNS = {
+    "genre": """
+        SELECT f.release_year, c.name AS series, COUNT(*) AS film_count
+        FROM film AS f
+        JOIN film_category AS fc ON f.film_id = fc.film_id
+        JOIN category AS c ON fc.category_id = c.category_id
+        GROUP BY f.release_year, c.name
+        ORDER BY f.release_year, c.name;
+    """,
+    "rating": """
+        SELECT release_year, rating AS series, COUNT(*) AS film_count
+        FROM film
+        GROUP BY release_year, rating
+        ORDER BY release_year, rating;
+    """,
+}
+
+
+@_search_backend
+def get_film_count_by_year_and(connection, breakdown):
+    """
+    Количество фильмов по годам выпуска в разрезе жанров или рейтингов — одним сгруппированным запросом.
+        :param connection: подключение к БД
+        :param breakdown: "genre" или "rating"
+        :return: список кортежей (release_year, жанр или рейтинг, film_count) или None в случае ошибки
+    """
+    if breakdown not in FILM_BREAKDOWNS:
+        print(f"Неизвестный разрез статистики: {breakdown}")
+        log_error("get_film_count_by_year_and", f"Неизвестный разрез статистики: {breakdown}")
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(FILM_BREAKDOWNS[breakdown])
+            return cursor.fetchall()
+    except pymysql.MySQLError as e:
+        print("Ошибка получения статистики по годам.")
+        print(f"MySQL Error: {e}")
+        log_error("get_film_count_by_year_and", str(e))
+        return None
+
+
+def get_film_data_version(connection):
+    """
+    «Версия» данных для статистики по годам: (MAX(last_update), COUNT(*)) таблиц film, film_category
+    и category из общей сверки get_data_versions (удаление не меняет MAX(last_update), поэтому и COUNT).
+        :param connection: подключение к БД
+        :return: кортеж значений или None, если версия неизвестна
+    """
+    versions = get_data_versions(connection)
+    if versions is None:
+        return None
+    return tuple(versions[table] for table in ("film", "film_category", "category"))
@@ -0,0 +1,93 @@
+# ● prefetch.py — упреждающая загрузка следующих страниц результатов в фоновом потоке
+
+import os
+import queue
+import threading
+
+from log_writer import log_error
+from mysql_connector import with_connection
+
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "1"))     # сколько страниц загружать заранее (0 — выключено)
+
+
+def _fetch_page(search_func, args, page_token, with_total, total):
+    """
+    Загружает одну страницу на соединении из пула. Общее число совпадений запрашивается
+    только вместе с первой страницей, дальше переносится из неё.
+        :return: кортеж (строки, токен следующей страницы[, total]) или None при ошибке
+    """
+    if not with_total:
+        return with_connection(search_func, *args, page_token)
+    page = with_connection(search_func, *args, page_token, with_total=page_token is None)
+    if page is None or page_token is None:
+        return page
+    return page[0], page[1], total
+
+
+def _fetch_pages(search_func, args, with_total, pages, stop):
+    """
+    Фоновый поток: загружает страницы по токенам продолжения и кладёт их в очередь.
+    Каждый запрос выполняется на своём соединении из пула.
+        :param search_func: функция *_page из mysql_connector
+        :param args: аргументы поиска (без connection и page_token)
+        :param with_total: запрашивать общее число совпадений
+        :param pages: очередь страниц (размер = глубина упреждения)
+        :param stop: событие отмены
+        :return: None
+    """
+    page_token = None
+    total = None
+    while not stop.is_set():
+        try:
+            page = _fetch_page(search_func, args, page_token, with_total, total)
+        except Exception as e:      # поток не должен молча умереть — иначе читатель ждал бы вечно
+            log_error("prefetch", str(e))
+            page = None
+        while not stop.is_set():
+            try:
+                pages.put(page, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        if page is None or page[1] is None:
+            return
+        page_token = page[1]
+        total = page[2] if with_total else None
+
+
+def iter_pages(search_func, *args, depth=None, with_total=False):
+    """
+    Генератор страниц поиска с keyset-пагинацией. Пока показывается текущая страница,
+    следующие (до depth штук) загружаются в фоновом потоке. Закрытие генератора
+    (close() или выход из цикла) отменяет упреждающую загрузку.
+        :param search_func: функция *_page из mysql_connector, например search_films_by_keyword_page
+        :param args: аргументы поиска (без connection и page_token)
+        :param depth: глубина упреждения (по умолчанию PREFETCH_DEPTH; 0 — загрузка по запросу)
+        :param with_total: добавлять к каждой странице общее число совпадений
+        :return: генератор кортежей (строки страницы, токен следующей страницы[, total]) или None при ошибке
+    """
+    depth = PREFETCH_DEPTH if depth is None else depth
+    if depth <= 0:
+        page_token = None
+        total = None
+        while True:
+            page = _fetch_page(search_func, args, page_token, with_total, total)
+            yield page
+            if page is None or page[1] is None:
+                return
+            page_token = page[1]
+            total = page[2] if with_total else None
+
+    pages = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    worker = threading.Thread(target=_fetch_pages, args=(search_func, args, with_total, pages, stop),
+                              name="page-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            page = pages.get()
+            yield page
+            if page is None or page[1] is None:
+                return
+    finally:
+        stop.set()          # поток завершит текущий запрос, вернёт соединение в пул и выйдет
@@ -0,0 +1,298 @@
+# ● result_cache.py — кэш страниц результатов поиска: LRU в памяти (размер, объём, TTL) и необязательный диск (SQLite)
+
+import os
+import json
+import time
+import pickle
+import sqlite3
+import inspect
+import functools
+import threading
+
+import metrics
+from log_writer import log_error, query_fingerprint
+from log_stats import get_most_frequent_queries
+from mysql_connector import (
+    with_connection,
+    get_data_versions,
+    DATA_VERSION_TABLES,
+    search_films_by_keyword_page,
+    search_films_by_genre_and_years_page,
+    search_films_by_actor_page,
+    search_films_by_description_page,
+    search_films_filtered_page )
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1000"))                   # страниц в памяти; 0 — кэш выключен
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", "67108864"))     # оценка объёма в памяти, байт
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))                    # сек.
+RESULT_CACHE_DISK = os.getenv("RESULT_CACHE_DISK", "")                            # файл SQLite; пусто — только память
+RESULT_CACHE_DISK_TTL = float(os.getenv("RESULT_CACHE_DISK_TTL", "86400"))        # сек.
+RESULT_CACHE_DISK_SIZE = int(os.getenv("RESULT_CACHE_DISK_SIZE", "10000"))        # макс. страниц на диске
+RESULT_CACHE_WARM_TOP = int(os.getenv("RESULT_CACHE_WARM_TOP", "20"))             # прогрев: топ-N запросов журнала
+
+DISK_PRUNE_EVERY = 100      # подрезать дисковый уровень до RESULT_CACHE_DISK_SIZE раз в N записей
+
+# тип запроса из журнала -> (функция поиска, параметры в порядке аргументов; None — словарь фильтров целиком)
+WARM_SEARCHES = {
+    "keyword": (search_films_by_keyword_page, ("keyword",)),
+    "genre_year": (search_films_by_genre_and_years_page, ("genre", "year_start", "year_end")),
+    "actor": (search_films_by_actor_page, ("actor_name",)),
+    "description": (search_films_by_description_page, ("keyword",)),
+    "filters": (search_films_filtered_page, None),
+}
+
+_cache = {}         # ключ -> (результат, stored_at, байт); порядок вставки — от давно использованных к недавним
+_state = {"bytes": 0, "version": None, "disk": None, "disk_writes": 0}
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+_lock = threading.Lock()
+_disk_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _signature(func):
+    """ Сигнатура функции поиска (кэшируется: inspect.signature медленный). """
+    return inspect.signature(func)
+
+
+def result_key(func, args, kwargs):
+    """
+    Ключ кэша: функция + нормализованные параметры (как в журнале запросов) + позиция страницы.
+    Аргументы по умолчанию подставляются, поэтому f(c, "ace") и f(c, "ACE", None, 10) дают один ключ;
+    пробелы по краям сохраняются — "ace " и "ace" дают разные запросы LIKE.
+        :param func: функция поиска из mysql_connector
+        :param args: позиционные аргументы вызова (первый — connection)
+        :param kwargs: именованные аргументы вызова
+        :return: строка-ключ или None, если кэш выключен
+    """
+    if RESULT_CACHE_SIZE <= 0:
+        return None
+    try:
+        bound = _signature(func).bind(*args, **kwargs)
+    except TypeError:
+        return None                 # некорректный вызов — пусть ошибку выдаст сама функция
+    bound.apply_defaults()
+    params = dict(bound.arguments)
+    params.pop("connection", None)
+    position = params.pop("page_token", None)      # токен чувствителен к регистру — не нормализуется
+    # регистр не важен (сопоставление _ci), а пробелы по краям — часть шаблона LIKE
+    fingerprint, _ = query_fingerprint(func.__name__, params, strip=False)
+    return f"{fingerprint}:{position or ''}"
+
+
+def _check_version(connection):
+    """
+    Сверяет версию данных (результат фоновой сверки mysql_connector.get_data_versions — запрос
+    к MySQL здесь не выполняется); если данные изменились, кэш в памяти очищается,
+    а на диске удаляются страницы прежних версий.
+        :param connection: подключение к БД или None (MySQL недоступен — сверка пропускается)
+        :return: текущая версия (строка JSON) или None, если она ещё не известна
+    """
+    versions = get_data_versions(connection)
+    if versions is None:
+        return _state["version"]
+    version = json.dumps([versions[table] for table in DATA_VERSION_TABLES], default=str)
+    with _lock:
+        if version == _state["version"]:
+            return version
+        if _cache:
+            _stats["invalidations"] += 1
+        _cache.clear()
+        _state.update(bytes=0, version=version)
+    _disk_execute("DELETE FROM result_cache WHERE version != ?;", (version,))
+    return version
+
+
+def _get_disk():
+    """
+    Открывает файл дискового уровня при первом обращении.
+        :return: соединение SQLite или None, если дисковый уровень выключен или недоступен
+    """
+    if not RESULT_CACHE_DISK:
+        return None
+    with _disk_lock:
+        if _state["disk"] is None:
+            try:
+                db = sqlite3.connect(RESULT_CACHE_DISK, check_same_thread=False, isolation_level=None)
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS result_cache (
+                        key TEXT PRIMARY KEY, version TEXT, stored_at REAL, value BLOB);
+                """)
+                db.execute("CREATE INDEX IF NOT EXISTS result_cache_stored_idx ON result_cache (stored_at);")
+                _state["disk"] = db
+            except sqlite3.Error as e:
+                print("Дисковый кэш результатов недоступен.")
+                log_error("result_cache", str(e))
+                _state["disk"] = False      # не пытаться открыть повторно
+        return _state["disk"] or None
+
+
+def _disk_execute(sql, params=()):
+    """
+    Выполняет запрос к дисковому уровню.
+        :return: список строк или None, если уровень выключен или произошла ошибка
+    """
+    db = _get_disk()
+    if db is None:
+        return None
+    try:
+        with _disk_lock:
+            return db.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        log_error("result_cache", str(e))
+        return None
+
+
+def _disk_get(key, version):
+    """ Страница с диска для текущей версии данных, не старше RESULT_CACHE_DISK_TTL, или None. """
+    rows = _disk_execute("SELECT value FROM result_cache WHERE key = ? AND version = ? AND stored_at > ?;",
+                         (key, version, time.time() - RESULT_CACHE_DISK_TTL))
+    if not rows:
+        return None
+    try:
+        return pickle.loads(rows[0][0])
+    except (pickle.PickleError, EOFError, AttributeError, ImportError) as e:
+        log_error("result_cache", str(e))
+        return None
+
+
+def _disk_put(key, result, version):
+    """ Сохраняет страницу на диск; раз в DISK_PRUNE_EVERY записей удаляет самые старые сверх лимита. """
+    if _get_disk() is None:
+        return
+    _disk_execute("INSERT OR REPLACE INTO result_cache (key, version, stored_at, value) VALUES (?, ?, ?, ?);",
+                  (key, version, time.time(), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)))
+    with _lock:
+        _state["disk_writes"] += 1
+        prune = _state["disk_writes"] % DISK_PRUNE_EVERY == 0
+    if prune:
+        _disk_execute("""
+            DELETE FROM result_cache WHERE key IN (
+                SELECT key FROM result_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?);
+        """, (RESULT_CACHE_DISK_SIZE,))
+
+
+def _remember(key, result):
+    """ Кладёт страницу в память, вытесняя давно использованные сверх RESULT_CACHE_SIZE и RESULT_CACHE_MAX_BYTES. """
+    nbytes = metrics.estimate_bytes(result)
+    if nbytes > RESULT_CACHE_MAX_BYTES:
+        return
+    with _lock:
+        old = _cache.pop(key, None)
+        if old is not None:
+            _state["bytes"] -= old[2]
+        _cache[key] = (result, time.monotonic(), nbytes)
+        _state["bytes"] += nbytes
+        while len(_cache) > RESULT_CACHE_SIZE or _state["bytes"] > RESULT_CACHE_MAX_BYTES:
+            _state["bytes"] -= _cache.pop(next(iter(_cache)))[2]
+            _stats["evictions"] += 1
+
+
+def get_result(key, connection):
+    """
+    Ищет страницу в памяти, затем на диске (найденная на диске поднимается в память).
+        :param key: ключ из result_key()
+        :param connection: подключение к БД (для сверки версии данных) или None
+        :return: кортеж (результат или None при промахе, версия данных для put_result;
+                 без MySQL версия — None, и ответы бэкендов не кэшируются)
+    """
+    version = _check_version(connection)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.pop(key, None)
+        if entry is not None:
+            if now - entry[1] < RESULT_CACHE_TTL:
+                _cache[key] = entry         # в конец: недавно использованная
+                _stats["hits"] += 1
+                return entry[0], version if connection is not None else None
+            _state["bytes"] -= entry[2]
+            _stats["expired"] += 1
+    result = _disk_get(key, version) if version is not None else None
+    with _lock:
+        _stats["disk_hits" if result is not None else "misses"] += 1
+    if result is not None:
+        _remember(key, result)
+    return result, version if connection is not None else None
+
+
+def put_result(key, result, version):
+    """
+    Сохраняет страницу в кэш. Не сохраняется, если версия данных неизвестна
+    или успела смениться, пока выполнялся запрос.
+        :param key: ключ из result_key()
+        :param result: результат функции поиска (None не кэшируется)
+        :param version: версия данных из get_result()
+        :return: None
+    """
+    if result is None or version is None or version != _state["version"]:
+        return
+    _remember(key, result)
+    _disk_put(key, result, version)
+
+
+def clear_result_cache(disk=False):
+    """
+    Очищает кэш в памяти (и на диске при disk=True).
+        :return: None
+    """
+    with _lock:
+        _cache.clear()
+        _state["bytes"] = 0
+    if disk:
+        _disk_execute("DELETE FROM result_cache;")
+
+
+def get_result_cache_stats():
+    """
+    Счётчики кэша результатов.
+        :return: словарь hits, disk_hits, misses, evictions, expired, invalidations,
+                 entries, bytes, disk_entries (None — дисковый уровень выключен) и hit_rate (доля, 0..1)
+    """
+    with _lock:
+        stats = dict(_stats, entries=len(_cache), bytes=_state["bytes"])
+    rows = _disk_execute("SELECT COUNT(*) FROM result_cache;")
+    stats["disk_entries"] = rows[0][0] if rows else None
+    lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else None
+    return stats
+
+
+def warm_result_cache(limit=None):
+    """
+    Прогревает кэш первыми страницами (с общим числом совпадений) самых частых запросов журнала.
+        :param limit: сколько запросов взять из get_most_frequent_queries (по умолчанию RESULT_CACHE_WARM_TOP)
+        :return: количество прогретых запросов
+    """
+    if RESULT_CACHE_SIZE <= 0:
+        return 0
+    try:
+        queries = get_most_frequent_queries(limit or RESULT_CACHE_WARM_TOP)
+    except Exception as e:
+        log_error("warm_result_cache", str(e))
+        return 0
+    warmed = 0
+    for item in queries:
+        query = item.get("_id") or {}
+        search = WARM_SEARCHES.get(query.get("query_type"))
+        parameters = query.get("parameters")
+        if search is None or not isinstance(parameters, dict):
+            continue
+        func, names = search
+        if names is None:
+            args = (parameters,)
+        elif all(name in parameters for name in names):
+            args = tuple(parameters[name] for name in names)
+        else:
+            continue
+        if with_connection(func, *args, with_total=True) is not None:
+            warmed += 1
+    return warmed
+
+
+def start_cache_warmup(limit=None):
+    """
+    Запускает прогрев кэша в фоновом потоке, чтобы не задерживать запуск приложения.
+        :return: объект потока
+    """
+    thread = threading.Thread(target=warm_result_cache, args=(limit,), name="result-cache-warmup", daemon=True)
+    thread.start()
+    return thread
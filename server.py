@@ -0,0 +1,259 @@
+# ● server.py — локальный HTTP JSON-сервис поверх функций поиска и статистики
+
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from mysql_connector import (
+    init_pool,
+    close_pool,
+    kill_query,
+    with_connection,
+    search_films_by_keyword_page,
+    search_films_by_genre_and_years_page,
+    get_all_genres,
+    get_release_year_range,
+    search_films_by_actor_page,
+    get_film_count_by_year,
+    search_films_by_description_page,
+    decode_page_token,
+    PAGE_KEY_SIZES,
+    PAGE_SIZE,
+    POOL_MAX_SIZE )
+from log_writer import log_search, log_error
+from log_stats import get_most_frequent_queries, get_last_unique_queries, get_last_errors
+from log_storage import bootstrap_log_storage
+from charts import films_by_year_chart, BREAKDOWNS, CHART_FORMATS
+from result_cache import start_cache_warmup
+
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+REQUEST_TIMEOUT = float(os.getenv("SERVER_REQUEST_TIMEOUT", "10"))     # сек. на обработку запроса
+SERVER_QUEUE_SIZE = int(os.getenv("SERVER_QUEUE_SIZE", str(POOL_MAX_SIZE * 2)))   # запросов в ожидании потока
+MAX_PAGE_SIZE = 100
+
+# обработка запросов идёт в отдельном пуле, чтобы поток соединения мог вернуть 504 по таймауту
+_workers = ThreadPoolExecutor(max_workers=POOL_MAX_SIZE, thread_name_prefix="http-query")
+# выполняемые и ожидающие запросы: сверх лимита сразу 503, а не бесконечная очередь
+_slots = threading.BoundedSemaphore(POOL_MAX_SIZE + max(0, SERVER_QUEUE_SIZE))
+
+
+class BadRequest(Exception):
+    """ Некорректные параметры запроса (ответ 400). """
+
+
+class Unavailable(Exception):
+    """ Источник данных вернул ошибку (ответ 503). """
+
+
+def _param(query, name, required=True, cast=str, default=None):
+    """
+    Достаёт параметр из строки запроса.
+        :param query: словарь parse_qs
+        :param name: имя параметра
+        :param required: обязателен ли параметр
+        :param cast: функция приведения типа
+        :param default: значение по умолчанию
+        :return: значение параметра
+        :raises BadRequest: если параметр отсутствует или некорректен
+    """
+    values = query.get(name)
+    if not values or not values[0].strip():
+        if required:
+            raise BadRequest(f"не задан параметр {name}")
+        return default
+    try:
+        return cast(values[0].strip())
+    except ValueError:
+        raise BadRequest(f"некорректный параметр {name}")
+
+
+def _page_size(query):
+    """ Размер страницы из параметра page_size (1..MAX_PAGE_SIZE). """
+    size = _param(query, "page_size", required=False, cast=int, default=PAGE_SIZE)
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise BadRequest(f"page_size должен быть от 1 до {MAX_PAGE_SIZE}")
+    return size
+
+
+def _paged_search(query, query_type, search_func, names, columns, casts=None):
+    """
+    Выполняет поиск с keyset-пагинацией. Общее число совпадений и запись в журнал —
+    только для первой страницы (без page_token), как в интерактивном режиме.
+        :return: словарь {rows, next_page_token, total}
+    """
+    casts = casts or {}
+    parameters = {name: _param(query, name, cast=casts.get(name, str)) for name in names}
+    page_token = _param(query, "page_token", required=False)
+    try:
+        decode_page_token(query_type, page_token, PAGE_KEY_SIZES[query_type])
+    except ValueError as e:
+        raise BadRequest(str(e))        # иначе функция поиска вернёт None, и клиент получит 503
+    first_page = page_token is None
+    started = time.perf_counter()
+    page = with_connection(search_func, *parameters.values(), page_token, _page_size(query),
+                           with_total=first_page)
+    if page is None:
+        raise Unavailable("ошибка выполнения запроса")
+    rows, next_token = page[0], page[1]
+    total = page[2] if first_page else None
+    if first_page:
+        log_search(query_type, parameters, total,       # фоновая запись, не задерживает ответ
+                   (time.perf_counter() - started) * 1000)
+    return {"rows": [dict(zip(columns, row)) for row in rows],
+            "next_page_token": next_token, "total": total}
+
+
+def _reference(func):
+    """ Выполняет справочный запрос без параметров. """
+    result = with_connection(func)
+    if result is None:
+        raise Unavailable("ошибка выполнения запроса")
+    return result
+
+
+def _stats(func, query):
+    """ Выполняет отчёт log_stats с параметром limit. """
+    limit = _param(query, "limit", required=False, cast=int, default=5)
+    if not 1 <= limit <= 100:
+        raise BadRequest("limit должен быть от 1 до 100")
+    try:
+        return func(limit)
+    except Exception as e:
+        log_error("server_stats", str(e))
+        raise Unavailable("ошибка чтения статистики")
+
+
+def _chart(query):
+    """ Строит (или берёт из кэша) график количества фильмов по годам и возвращает путь к файлу. """
+    breakdown = _param(query, "breakdown", required=False)
+    fmt = _param(query, "format", required=False)
+    if breakdown not in BREAKDOWNS:
+        raise BadRequest(f"breakdown должен быть одним из: {', '.join(b for b in BREAKDOWNS if b)}")
+    if fmt is not None and fmt not in CHART_FORMATS:
+        raise BadRequest(f"format должен быть одним из: {', '.join(CHART_FORMATS)}")
+    path = films_by_year_chart(breakdown, fmt)
+    if path is None:
+        raise Unavailable("ошибка построения графика")
+    return {"path": os.path.abspath(path) if path else None}
+
+
+# путь -> обработчик(query)
+ROUTES = {
+    "/films/keyword": lambda q: _paged_search(
+        q, "keyword", search_films_by_keyword_page, ("keyword",),
+        ("film_id", "title", "release_year", "rating", "length")),
+    "/films/genre-year": lambda q: _paged_search(
+        q, "genre_year", search_films_by_genre_and_years_page, ("genre", "year_start", "year_end"),
+        ("film_id", "title", "release_year", "genre"), {"year_start": int, "year_end": int}),
+    "/films/actor": lambda q: _paged_search(
+        q, "actor", search_films_by_actor_page, ("actor_name",),
+        ("title", "release_year", "actor")),
+    "/films/description": lambda q: _paged_search(
+        q, "description", search_films_by_description_page, ("keyword",),
+        ("title", "release_year", "description")),
+    "/genres": lambda q: {"genres": _reference(get_all_genres)},
+    "/years": lambda q: dict(zip(("min_year", "max_year"), _reference(get_release_year_range))),
+    "/films/count-by-year": lambda q: {"rows": [
+        {"release_year": year, "film_count": count} for year, count in _reference(get_film_count_by_year)]},
+    "/films/count-by-year/chart": _chart,
+    "/stats/top-queries": lambda q: {"rows": _stats(get_most_frequent_queries, q)},
+    "/stats/latest-queries": lambda q: {"rows": _stats(get_last_unique_queries, q)},
+    "/stats/errors": lambda q: {"rows": _stats(get_last_errors, q)},
+}
+
+
+def _call(handler, query, worker):
+    """ Выполняет обработчик маршрута в потоке пула, запоминая поток (для прерывания по таймауту). """
+    worker["ident"] = threading.get_ident()
+    return handler(query)
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """ Обработчик GET-запросов: маршрутизация по ROUTES, ответы в JSON. """
+
+    timeout = REQUEST_TIMEOUT * 3      # таймаут сокета для медленных клиентов
+    protocol_version = "HTTP/1.1"       # keep-alive между запросами клиента
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        handler = ROUTES.get(url.path.rstrip("/") or "/")
+        if handler is None:
+            self._send(404, {"error": "неизвестный путь", "paths": sorted(ROUTES)})
+            return
+        if not _slots.acquire(blocking=False):
+            self._send(503, {"error": "сервер перегружен, повторите запрос позже"})
+            return
+        worker = {}
+        try:
+            future = _workers.submit(_call, handler, parse_qs(url.query), worker)
+        except RuntimeError:        # пул остановлен — сервер завершает работу
+            _slots.release()
+            self._send(503, {"error": "сервер останавливается"})
+            return
+        future.add_done_callback(lambda _: _slots.release())
+        try:
+            self._send(200, future.result(timeout=REQUEST_TIMEOUT))
+        except FutureTimeoutError:
+            # ещё не начатый запрос не займёт поток и соединение из пула, а выполняющийся
+            # прерывается в MySQL — иначе повторные таймауты исчерпают пул
+            if not future.cancel() and not future.done():
+                kill_query(worker.get("ident"))
+            log_error("server", f"Таймаут запроса {url.path}")
+            self._send(504, {"error": "превышено время ожидания"})
+        except BadRequest as e:
+            self._send(400, {"error": str(e)})
+        except Unavailable as e:
+            self._send(503, {"error": str(e)})
+        except Exception as e:
+            log_error("server", f"{url.path}: {e}")
+            self._send(500, {"error": "внутренняя ошибка"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass        # журнал доступа не ведём: запросы пишутся в MongoDB через log_search
+
+
+def run_server(host=SERVER_HOST, port=SERVER_PORT):
+    """
+    Запускает многопоточный HTTP-сервер (до остановки по Ctrl+C).
+        :param host: адрес
+        :param port: порт
+        :return: None
+    """
+    if not init_pool():
+        print("Сервер не запущен из-за ошибки подключения к MySQL.")
+        return
+    bootstrap_log_storage()
+    start_cache_warmup()
+    server = ThreadingHTTPServer((host, port), SearchRequestHandler)
+    server.daemon_threads = True
+    print(f"Сервер поиска фильмов: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        _workers.shutdown(wait=False)
+        close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP JSON-сервис поиска фильмов.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    run_server(args.host, args.port)
@@ -0,0 +1,679 @@
+# ● snapshot.py — локальный снимок таблиц Sakila в SQLite: обновление по last_update, поиск без MySQL
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pymysql
+from log_writer import log_error
+from mysql_connector import (
+    PAGE_SIZE,
+    encode_page_token,
+    decode_page_token,
+    year_key,
+    YEAR_KEY,
+    get_search_backends,
+    get_data_versions,
+    init_pool,
+    close_pool,
+    with_connection )
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "sakila_snapshot.db")                   # файл SQLite
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "60"))       # как часто сверять с MySQL
+SNAPSHOT_MAX_STALENESS = float(os.getenv("SNAPSHOT_MAX_STALENESS", "300"))          # старше — запрос идёт в MySQL, сек.
+SNAPSHOT_OFFLINE_MAX_STALENESS = float(os.getenv("SNAPSHOT_OFFLINE_MAX_STALENESS", "86400"))  # то же без MySQL
+# 0 в SNAPSHOT_*_MAX_STALENESS — без ограничения возраста
+SNAPSHOT_OVERLAP_SECONDS = float(os.getenv("SNAPSHOT_OVERLAP_SECONDS", "60"))       # перекрытие окна last_update
+SNAPSHOT_VERIFY_SECONDS = float(os.getenv("SNAPSHOT_VERIFY_SECONDS", "3600"))       # сверка ключей всех таблиц, сек.
+
+# таблица -> (столбцы, первичный ключ); порядок таблиц — родительские раньше связующих
+TABLES = {
+    "category": (("category_id", "name", "last_update"), ("category_id",)),
+    "film": (("film_id", "title", "description", "release_year", "rating", "length", "last_update"), ("film_id",)),
+    "actor": (("actor_id", "first_name", "last_name", "last_update"), ("actor_id",)),
+    "film_category": (("film_id", "category_id", "last_update"), ("film_id", "category_id")),
+    "film_actor": (("actor_id", "film_id", "last_update"), ("actor_id", "film_id")),
+}
+
+# NOCASE — сравнение и сортировка без учёта регистра, как у *_ci-сопоставлений MySQL
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS category (
+        category_id INTEGER PRIMARY KEY, name TEXT COLLATE NOCASE, last_update TEXT);
+    CREATE TABLE IF NOT EXISTS film (
+        film_id INTEGER PRIMARY KEY, title TEXT COLLATE NOCASE, description TEXT,
+        release_year INTEGER, rating TEXT, length INTEGER, last_update TEXT);
+    CREATE TABLE IF NOT EXISTS actor (
+        actor_id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, last_update TEXT);
+    CREATE TABLE IF NOT EXISTS film_category (
+        film_id INTEGER, category_id INTEGER, last_update TEXT, PRIMARY KEY (film_id, category_id));
+    CREATE TABLE IF NOT EXISTS film_actor (
+        actor_id INTEGER, film_id INTEGER, last_update TEXT, PRIMARY KEY (actor_id, film_id));
+    CREATE TABLE IF NOT EXISTS snapshot_meta (key TEXT PRIMARY KEY, value TEXT);
+    CREATE INDEX IF NOT EXISTS film_title_idx ON film (title, film_id);
+    CREATE INDEX IF NOT EXISTS film_year_idx ON film (release_year, title, film_id);
+    CREATE INDEX IF NOT EXISTS film_category_category_idx ON film_category (category_id, film_id);
+    CREATE INDEX IF NOT EXISTS film_actor_film_idx ON film_actor (film_id);
+"""
+
+_state = {"db": None, "synced_at": None, "checked_at": None, "verified_at": None, "builder": None}
+_lock = threading.RLock()               # одно соединение SQLite на процесс — доступ по очереди
+_refresh_lock = threading.Lock()        # одновременно выполняется одно обновление
+
+
+def _get_db():
+    """
+    Открывает файл снимка (при первом вызове) и создаёт схему.
+        :return: соединение SQLite
+        :raises sqlite3.Error: если файл открыть не удалось
+    """
+    with _lock:
+        if _state["db"] is None:
+            db = sqlite3.connect(SNAPSHOT_PATH, check_same_thread=False, isolation_level=None)
+            db.executescript(SCHEMA)
+            synced_at = _get_meta(db, "synced_at")
+            _state.update(db=db, synced_at=float(synced_at) if synced_at else None)
+        return _state["db"]
+
+
+def _get_meta(db, key):
+    """ Значение служебного параметра снимка или None. """
+    row = db.execute("SELECT value FROM snapshot_meta WHERE key = ?;", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(db, key, value):
+    """ Сохраняет служебный параметр снимка. """
+    db.execute("INSERT OR REPLACE INTO snapshot_meta (key, value) VALUES (?, ?);", (key, str(value)))
+
+
+@contextmanager
+def _transaction(db):
+    """ Транзакция SQLite под общей блокировкой: COMMIT по выходе из блока, ROLLBACK при ошибке. """
+    with _lock:
+        db.execute("BEGIN;")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK;")
+            raise
+        db.execute("COMMIT;")
+
+
+def _to_sqlite(value):
+    """ Дата и время хранятся строкой ISO — в том же виде, в каком сравниваются водяные знаки. """
+    return value.isoformat(" ") if isinstance(value, datetime) else value
+
+
+def _source_version(connection):
+    """
+    Получает «версию» каждой таблицы в MySQL: сверка mysql_connector.get_data_versions выполняется
+    сразу (обновление снимка идёт в фоновом потоке и всё равно читает таблицы).
+        :param connection: подключение к БД
+        :return: словарь {таблица: (COUNT(*), MAX(last_update))}
+        :raises pymysql.MySQLError: если версия таблиц неизвестна
+    """
+    versions = get_data_versions(connection, fresh=True)
+    if versions is None:
+        raise pymysql.MySQLError("Не удалось получить версию таблиц MySQL")
+    return {table: (versions[table][1], versions[table][0]) for table in TABLES}
+
+
+def _fetch(connection, sql, params=()):
+    """ Выполняет запрос к MySQL и возвращает строки, приведённые к типам SQLite. """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [tuple(_to_sqlite(value) for value in row) for row in cursor.fetchall()]
+
+
+def _key_checksum(keys):
+    """ Контрольная сумма набора первичных ключей: XOR CRC32 строк «a,b» (как BIT_XOR(CRC32(CONCAT_WS(...)))). """
+    checksum = 0
+    for key in keys:
+        checksum ^= zlib.crc32(",".join(str(value) for value in key).encode())
+    return checksum
+
+
+def _source_checksum(connection, table):
+    """ Контрольная сумма первичных ключей таблицы в MySQL (см. _key_checksum). """
+    key = ", ".join(TABLES[table][1])
+    rows = _fetch(connection, f"SELECT COALESCE(BIT_XOR(CRC32(CONCAT_WS(',', {key}))), 0) FROM {table};")
+    return int(rows[0][0])
+
+
+def _sync_table(connection, db, table, source_count, source_max, full, verify=False):
+    """
+    Переносит в снимок строки таблицы, изменённые после водяного знака (last_update),
+    а при расхождении числа строк или контрольной суммы первичных ключей сверяет ключи целиком:
+    удаляет строки, которых в MySQL больше нет, и дописывает пропущенные. Если ни COUNT(*), ни водяной знак не изменились, таблица
+    не читается: контрольная сумма (полный проход по таблице) считается только при изменениях
+    и при периодической сверке verify.
+        :param connection: подключение к БД
+        :param db: соединение SQLite
+        :param table: имя таблицы из TABLES
+        :param source_count: COUNT(*) таблицы в MySQL
+        :param source_max: MAX(last_update) таблицы в MySQL
+        :param full: True — перезагрузить таблицу целиком
+        :param verify: True — сверить контрольную сумму ключей, даже если таблица не изменилась
+        :return: количество перенесённых и удалённых строк
+    """
+    columns, key = TABLES[table]
+    with _lock:
+        watermark = None if full else _get_meta(db, f"watermark.{table}")
+        local_count = db.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+    # last_update не отражает удаления: удаление вместе со вставкой строки со «старым» last_update
+    # не меняет ни водяной знак, ни COUNT(*) — такие изменения находит только сверка verify
+    unchanged = (watermark is not None and watermark == str(_to_sqlite(source_max))
+                 and local_count == source_count)
+    if unchanged and not verify:
+        return 0        # таблица не изменилась
+
+    rows = []
+    if not unchanged:
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        params = ()
+        if watermark is not None:
+            # перекрытие окна: строки, чья транзакция зафиксирована позже, но с меньшим last_update
+            sql += " WHERE last_update >= %s"
+            params = (datetime.fromisoformat(watermark) - timedelta(seconds=SNAPSHOT_OVERLAP_SECONDS),)
+        rows = _fetch(connection, sql, params)
+    with _transaction(db):
+        if watermark is None:
+            db.execute(f"DELETE FROM {table};")
+        db.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                       f"VALUES ({', '.join('?' * len(columns))});", rows)
+        local_keys = db.execute(f"SELECT {', '.join(key)} FROM {table};").fetchall()
+    changed = len(rows)
+
+    # при равном числе строк удаления скрыты вставками — их выдаёт только контрольная сумма
+    if len(local_keys) != source_count or _key_checksum(local_keys) != _source_checksum(connection, table):
+        # удалённые строки и вставленные со «старым» last_update находим сравнением первичных ключей
+        positions = [columns.index(column) for column in key]
+        source_rows = {tuple(row[i] for i in positions): row
+                       for row in _fetch(connection, f"SELECT {', '.join(columns)} FROM {table};")}
+        local_keys = set(local_keys)
+        removed = list(local_keys - source_rows.keys())
+        missing = [row for row_key, row in source_rows.items() if row_key not in local_keys]
+        with _transaction(db):
+            condition = " AND ".join(f"{column} = ?" for column in key)
+            db.executemany(f"DELETE FROM {table} WHERE {condition};", removed)
+            db.executemany(f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join('?' * len(columns))});", missing)
+        changed += len(removed) + len(missing)
+    if source_max is not None:
+        with _lock:
+            _set_meta(db, f"watermark.{table}", _to_sqlite(source_max))
+    return changed
+
+
+def refresh_snapshot(connection, full=False, wait=True):
+    """
+    Обновляет снимок: при первом вызове (или full=True) таблицы копируются целиком,
+    дальше переносятся только строки с last_update не раньше водяного знака.
+        :param connection: подключение к БД
+        :param full: True — перезагрузить все таблицы целиком
+        :param wait: False — не ждать, если обновление уже выполняется в другом потоке
+        :return: словарь {таблица: число изменённых строк} или None в случае ошибки
+    """
+    if not _refresh_lock.acquire(blocking=wait):
+        return None
+    try:
+        started = time.time()
+        db = _get_db()
+        full = full or _state["synced_at"] is None
+        verified_at = _state["verified_at"]
+        verify = full or (SNAPSHOT_VERIFY_SECONDS > 0 and
+                          (verified_at is None or time.monotonic() - verified_at >= SNAPSHOT_VERIFY_SECONDS))
+        version = _source_version(connection)
+        changed = {table: _sync_table(connection, db, table, *version[table], full, verify) for table in TABLES}
+        with _lock:
+            _set_meta(db, "synced_at", started)     # данные не старше момента начала сверки
+            _state.update(synced_at=started, checked_at=time.monotonic())
+            if verify:
+                _state["verified_at"] = time.monotonic()
+        return changed
+    except pymysql.MySQLError as e:
+        print("Ошибка обновления локального снимка из MySQL.")
+        print(f"MySQL Error: {e}")
+        log_error("refresh_snapshot", str(e))
+        return None
+    except sqlite3.Error as e:
+        print("Ошибка записи локального снимка.")
+        log_error("refresh_snapshot", str(e))
+        return None
+    finally:
+        _refresh_lock.release()
+
+
+def _start_build():
+    """
+    Запускает построение снимка (первое — полное, дальше — обновление по водяным знакам)
+    в фоновом потоке на отдельном соединении из пула, если оно ещё не идёт.
+    Пока снимка нет, запросы выполняет MySQL; пока идёт обновление — отвечает текущий снимок.
+        :return: None
+    """
+    with _lock:
+        builder = _state["builder"]
+        if builder is not None and builder.is_alive():
+            return
+        builder = threading.Thread(target=with_connection, args=(refresh_snapshot,),
+                                   name="snapshot-build", daemon=True)
+        _state["builder"] = builder
+    builder.start()
+
+
+def get_snapshot(connection):
+    """
+    Возвращает снимок для ответа на запрос. Построение и обновление снимка (не чаще раза
+    в SNAPSHOT_REFRESH_SECONDS) идут в фоновом потоке (_start_build, или заранее: python snapshot.py),
+    запрос их не ждёт; до окончания первого построения запрос выполняет MySQL.
+    Снимок старше SNAPSHOT_MAX_STALENESS не используется (запрос выполнит MySQL);
+    при недоступном MySQL (connection is None) допустимый возраст — SNAPSHOT_OFFLINE_MAX_STALENESS.
+        :param connection: подключение к БД или None
+        :return: соединение SQLite или None, если снимка нет или он устарел
+    """
+    try:
+        db = _get_db()
+    except sqlite3.Error as e:
+        log_error("get_snapshot", str(e))
+        return None
+    synced_at = _state["synced_at"]
+    if synced_at is None:
+        if connection is not None:
+            _start_build()
+        return None
+    checked_at = _state["checked_at"]
+    if connection is not None and (checked_at is None
+                                   or time.monotonic() - checked_at >= SNAPSHOT_REFRESH_SECONDS):
+        _state["checked_at"] = time.monotonic()     # при ошибке не повторяем сверку на каждом запросе
+        _start_build()                              # отвечаем по текущему снимку, не дожидаясь обновления
+    limit = SNAPSHOT_MAX_STALENESS if connection is not None else SNAPSHOT_OFFLINE_MAX_STALENESS
+    if limit and time.time() - synced_at > limit:
+        return None
+    return db
+
+
+def get_snapshot_status():
+    """
+    Состояние снимка.
+        :return: словарь path, synced_at (datetime или None), age_s и tables ({таблица: число строк})
+                 или None в случае ошибки
+    """
+    try:
+        db = _get_db()
+        with _lock:
+            tables = {table: db.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0] for table in TABLES}
+    except sqlite3.Error as e:
+        log_error("get_snapshot_status", str(e))
+        return None
+    synced_at = _state["synced_at"]
+    return {
+        "path": SNAPSHOT_PATH,
+        "synced_at": datetime.fromtimestamp(synced_at) if synced_at else None,
+        "age_s": time.time() - synced_at if synced_at else None,
+        "tables": tables,
+    }
+
+
+def serves_offline():
+    """
+    Проверяет, можно ли отвечать на запросы по снимку без MySQL.
+        :return: True, если бэкенд "snapshot" выбран, а снимок есть и не старше SNAPSHOT_OFFLINE_MAX_STALENESS
+    """
+    return "snapshot" in get_search_backends() and get_snapshot(None) is not None
+
+
+def _query(db, source, sql, params=()):
+    """
+    Выполняет запрос к снимку.
+        :return: список строк или None в случае ошибки (тогда запрос выполнит MySQL)
+    """
+    try:
+        with _lock:
+            return db.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        log_error(f"snapshot.{source}", str(e))
+        return None
+
+
+def _count(db, source, sql, params):
+    """ Общее число строк запроса страницы (без keyset-условия). """
+    rows = _query(db, source, f"SELECT COUNT(*) FROM ({sql});", params)
+    return None if rows is None else rows[0][0]
+
+
+def _prefers_mysql(connection, text):
+    """
+    True, если запрос лучше выполнить в MySQL: LIKE и NOCASE в SQLite
+    не учитывают регистр только для латиницы.
+    """
+    return connection is not None and not text.isascii()
+
+
+def _decode(query_type, page_token, key_size, source):
+    """ Декодирует токен страницы; при ошибке печатает сообщение и возвращает False. """
+    try:
+        return decode_page_token(query_type, page_token, key_size)
+    except ValueError as e:
+        print("Некорректный токен страницы.")
+        log_error(source, str(e))
+        return False
+
+
+def _finish_page(query_type, rows, key_of, page_size, width, total, with_total):
+    """
+    Отделяет страницу от служебной (page_size + 1)-й строки и строит токен следующей страницы.
+        :param width: сколько первых столбцов строки возвращается вызывающему
+        :return: кортеж (строки, токен[, total]) — как у функций *_page в mysql_connector
+    """
+    page = rows[:page_size]
+    token = encode_page_token(query_type, key_of(page[-1])) if len(rows) > page_size else None
+    page = [row[:width] for row in page]
+    return (page, token, total) if with_total else (page, token)
+
+
+# Функция 1 (снимок)
+def search_films_by_keyword(connection, keyword, offset):
+    """
+    Поиск фильмов по части названия в снимке.
+        :return: список фильмов (film_id, title, release_year, rating, length) или NotImplemented
+    """
+    db = None if _prefers_mysql(connection, keyword) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    rows = _query(db, "search_films_by_keyword", """
+        SELECT film_id, title, release_year, rating, length
+        FROM film
+        WHERE title LIKE ? ESCAPE '\\'
+        ORDER BY title, film_id
+        LIMIT ? OFFSET ?;
+    """, (f"%{keyword}%", PAGE_SIZE, int(offset)))
+    return NotImplemented if rows is None else rows
+
+
+# Функция 2 (снимок)
+def search_films_by_genre_and_years(connection, genre, year_start, year_end, offset):
+    """
+    Поиск фильмов по жанру и диапазону годов выпуска в снимке.
+        :return: список фильмов (film_id, title, release_year, genre) или NotImplemented
+    """
+    db = None if _prefers_mysql(connection, genre) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    rows = _query(db, "search_films_by_genre_and_years", """
+        SELECT f.film_id, f.title, f.release_year, c.name AS genre
+        FROM film AS f
+        JOIN film_category AS fc ON f.film_id = fc.film_id
+        JOIN category AS c ON fc.category_id = c.category_id
+        WHERE c.name = ?
+          AND f.release_year BETWEEN ? AND ?
+        ORDER BY f.release_year, f.title, f.film_id
+        LIMIT ? OFFSET ?;
+    """, (genre, year_start, year_end, PAGE_SIZE, int(offset)))
+    return NotImplemented if rows is None else rows
+
+
+# Функция 3 (снимок)
+def get_all_genres(connection):
+    """
+    Список всех жанров из снимка.
+        :return: список названий жанров или NotImplemented
+    """
+    db = get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    rows = _query(db, "get_all_genres", "SELECT DISTINCT name FROM category ORDER BY name;")
+    return NotImplemented if rows is None else [row[0] for row in rows]
+
+
+# Функция 4 (снимок)
+def get_release_year_range(connection):
+    """
+    Минимальный и максимальный год выпуска фильмов из снимка.
+        :return: кортеж (min_year, max_year) или NotImplemented
+    """
+    db = get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    rows = _query(db, "get_release_year_range", "SELECT MIN(release_year), MAX(release_year) FROM film;")
+    return NotImplemented if rows is None else rows[0]
+
+
+# Функция 5 (снимок)
+def search_films_by_actor(connection, actor_name, offset):
+    """
+    Поиск фильмов по имени и/или фамилии актёра в снимке.
+        :return: список фильмов (title, release_year, actor_full_name) или NotImplemented
+    """
+    db = None if _prefers_mysql(connection, actor_name) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    rows = _query(db, "search_films_by_actor", """
+        SELECT f.title, f.release_year, a.first_name || ' ' || a.last_name AS actor
+        FROM film_actor AS fa
+        JOIN film AS f ON f.film_id = fa.film_id
+        JOIN actor AS a ON a.actor_id = fa.actor_id
+        WHERE a.first_name || ' ' || a.last_name LIKE ? ESCAPE '\\'
+        ORDER BY f.release_year DESC, f.title, f.film_id, a.actor_id
+        LIMIT ? OFFSET ?;
+    """, (f"%{actor_name.strip()}%", PAGE_SIZE, int(offset)))
+    return NotImplemented if rows is None else rows
+
+
+# Функция 6 (снимок)
+def get_film_count_by_year(connection):
+    """
+    Количество фильмов по годам выпуска из снимка.
+        :return: список кортежей (release_year, film_count) или NotImplemented
+    """
+    db = get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    rows = _query(db, "get_film_count_by_year", """
+        SELECT release_year, COUNT(*) AS film_count
+        FROM film
+        GROUP BY release_year
+        ORDER BY release_year;
+    """)
+    return NotImplemented if rows is None else rows
+
+
+# Функция 7 (снимок)
+def search_films_by_description(connection, keyword, offset):
+    """
+    Поиск фильмов по ключевому слову в описании в снимке.
+        :return: список фильмов (title, release_year, description) или NotImplemented
+    """
+    db = None if _prefers_mysql(connection, keyword) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    rows = _query(db, "search_films_by_description", """
+        SELECT title, release_year, description
+        FROM film
+        WHERE description LIKE ? ESCAPE '\\'
+        ORDER BY title, film_id
+        LIMIT ? OFFSET ?;
+    """, (f"%{keyword}%", PAGE_SIZE, int(offset)))
+    return NotImplemented if rows is None else rows
+
+
+def search_films_by_keyword_page(connection, keyword, page_token=None, page_size=PAGE_SIZE,
+                                 with_total=False):
+    """
+    Поиск фильмов по части названия в снимке с keyset-пагинацией по ключу (title, film_id).
+        :return: кортеж (список фильмов, токен следующей страницы или None[, общее число совпадений]),
+                 NotImplemented или None для некорректного токена
+    """
+    after = _decode("keyword", page_token, 2, "search_films_by_keyword_page")
+    if after is False:
+        return None
+    db = None if _prefers_mysql(connection, keyword) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    sql = """
+        SELECT film_id, title, release_year, rating, length
+        FROM film
+        WHERE title LIKE ? ESCAPE '\\'
+    """
+    params = [f"%{keyword}%"]
+    total = _count(db, "search_films_by_keyword_page", sql, params) if with_total else None
+    if after:
+        sql += " AND (title > ? OR (title = ? AND film_id > ?))"
+        params += [after[0], after[0], after[1]]
+    rows = _query(db, "search_films_by_keyword_page", sql + " ORDER BY title, film_id LIMIT ?;",
+                  params + [int(page_size) + 1])
+    if rows is None or (with_total and total is None):
+        return NotImplemented
+    return _finish_page("keyword", rows, lambda r: (r[1], r[0]), page_size, 5, total, with_total)
+
+
+def search_films_by_genre_and_years_page(connection, genre, year_start, year_end,
+                                         page_token=None, page_size=PAGE_SIZE, with_total=False):
+    """
+    Поиск фильмов по жанру и диапазону годов в снимке с keyset-пагинацией
+    по ключу (release_year, title, film_id).
+        :return: кортеж (список фильмов, токен следующей страницы или None[, общее число совпадений]),
+                 NotImplemented или None для некорректного токена
+    """
+    after = _decode("genre_year", page_token, 3, "search_films_by_genre_and_years_page")
+    if after is False:
+        return None
+    db = None if _prefers_mysql(connection, genre) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    sql = """
+        SELECT f.film_id, f.title, f.release_year, c.name AS genre
+        FROM film AS f
+        JOIN film_category AS fc ON f.film_id = fc.film_id
+        JOIN category AS c ON fc.category_id = c.category_id
+        WHERE c.name = ?
+          AND f.release_year BETWEEN ? AND ?
+    """
+    params = [genre, year_start, year_end]
+    total = _count(db, "search_films_by_genre_and_years_page", sql, params) if with_total else None
+    if after:
+        sql += f"""
+          AND ({YEAR_KEY} > ?
+               OR ({YEAR_KEY} = ? AND f.title > ?)
+               OR ({YEAR_KEY} = ? AND f.title = ? AND f.film_id > ?))
+        """
+        params += [after[0], after[0], after[1], after[0], after[1], after[2]]
+    rows = _query(db, "search_films_by_genre_and_years_page",
+                  sql + f" ORDER BY {YEAR_KEY}, f.title, f.film_id LIMIT ?;", params + [int(page_size) + 1])
+    if rows is None or (with_total and total is None):
+        return NotImplemented
+    return _finish_page("genre_year", rows, lambda r: (year_key(r[2]), r[1], r[0]), page_size, 4,
+                        total, with_total)
+
+
+def search_films_by_actor_page(connection, actor_name, page_token=None, page_size=PAGE_SIZE,
+                               with_total=False):
+    """
+    Поиск фильмов по имени и/или фамилии актёра в снимке с keyset-пагинацией
+    по ключу (release_year DESC, title, film_id, actor_id).
+        :return: кортеж (список фильмов, токен следующей страницы или None[, общее число совпадений]),
+                 NotImplemented или None для некорректного токена
+    """
+    after = _decode("actor", page_token, 4, "search_films_by_actor_page")
+    if after is False:
+        return None
+    db = None if _prefers_mysql(connection, actor_name) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    sql = """
+        SELECT f.title, f.release_year, a.first_name || ' ' || a.last_name AS actor,
+               f.film_id, a.actor_id
+        FROM film_actor AS fa
+        JOIN film AS f ON f.film_id = fa.film_id
+        JOIN actor AS a ON a.actor_id = fa.actor_id
+        WHERE a.first_name || ' ' || a.last_name LIKE ? ESCAPE '\\'
+    """
+    params = [f"%{actor_name.strip()}%"]
+    total = _count(db, "search_films_by_actor_page", sql, params) if with_total else None
+    if after:
+        sql += f"""
+          AND ({YEAR_KEY} < ?
+               OR ({YEAR_KEY} = ? AND f.title > ?)
+               OR ({YEAR_KEY} = ? AND f.title = ? AND f.film_id > ?)
+               OR ({YEAR_KEY} = ? AND f.title = ? AND f.film_id = ? AND a.actor_id > ?))
+        """
+        params += [after[0],
+                   after[0], after[1],
+                   after[0], after[1], after[2],
+                   after[0], after[1], after[2], after[3]]
+    rows = _query(db, "search_films_by_actor_page",
+                  sql + f" ORDER BY {YEAR_KEY} DESC, f.title, f.film_id, a.actor_id LIMIT ?;",
+                  params + [int(page_size) + 1])
+    if rows is None or (with_total and total is None):
+        return NotImplemented
+    return _finish_page("actor", rows, lambda r: (year_key(r[1]), r[0], r[3], r[4]), page_size, 3,
+                        total, with_total)
+
+
+def search_films_by_description_page(connection, keyword, page_token=None, page_size=PAGE_SIZE,
+                                     with_total=False):
+    """
+    Поиск фильмов по ключевому слову в описании в снимке с keyset-пагинацией по ключу (title, film_id).
+        :return: кортеж (список фильмов, токен следующей страницы или None[, общее число совпадений]),
+                 NotImplemented или None для некорректного токена
+    """
+    after = _decode("description", page_token, 2, "search_films_by_description_page")
+    if after is False:
+        return None
+    db = None if _prefers_mysql(connection, keyword) else get_snapshot(connection)
+    if db is None:
+        return NotImplemented
+    sql = """
+        SELECT title, release_year, description, film_id
+        FROM film
+        WHERE description LIKE ? ESCAPE '\\'
+    """
+    params = [f"%{keyword}%"]
+    total = _count(db, "search_films_by_description_page", sql, params) if with_total else None
+    if after:
+        sql += " AND (title > ? OR (title = ? AND film_id > ?))"
+        params += [after[0], after[0], after[1]]
+    rows = _query(db, "search_films_by_description_page", sql + " ORDER BY title, film_id LIMIT ?;",
+                  params + [int(page_size) + 1])
+    if rows is None or (with_total and total is None):
+        return NotImplemented
+    return _finish_page("description", rows, lambda r: (r[0], r[3]), page_size, 3, total, with_total)
+
+
+def main(argv=None):
+    """
+    Командная строка: построение или обновление снимка и вывод его состояния.
+        :return: код завершения (0 — успех)
+    """
+    parser = argparse.ArgumentParser(description="Локальный снимок таблиц Sakila (SQLite).")
+    parser.add_argument("--full", action="store_true", help="перезагрузить таблицы целиком")
+    parser.add_argument("--status", action="store_true", help="только показать состояние снимка")
+    args = parser.parse_args(argv)
+
+    if not args.status:
+        if not init_pool():
+            return 1
+        try:
+            changed = with_connection(refresh_snapshot, args.full)
+        finally:
+            close_pool()
+        if changed is None:
+            return 1
+        print("Изменено строк: " + ", ".join(f"{table} — {count}" for table, count in changed.items()))
+
+    status = get_snapshot_status()
+    if status is None:
+        return 1
+    print(f"Снимок: {status['path']}")
+    print(f"Обновлён: {status['synced_at'] or 'никогда'}")
+    print("Строк: " + ", ".join(f"{table} — {count}" for table, count in status["tables"].items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
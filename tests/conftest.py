@@ -0,0 +1,145 @@
+# ● conftest.py — общие настройки тестов: модули проекта импортируются из корня репозитория
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import sqlite3
+import zlib
+from datetime import datetime
+
+import pytest
+
+import mysql_connector
+import result_cache
+
+T0 = datetime(2024, 1, 1)
+GENRES = ("Action", "Comedy", "Drama", "Horror", "Sci-Fi")
+WORDS = ("ACE", "BOAT", "CAT", "DOG", "EPIC", "FROG", "GOLD", "HAT")
+
+# конструкции MySQL, которых нет в SQLite (порядок важен: %s заменяется последним)
+MYSQL_TO_SQLITE = (
+    ("%s - INTERVAL %s SECOND", "datetime(%s, '-' || %s || ' seconds')"),
+    ("CONCAT(a.first_name, ' ', a.last_name)", "a.first_name || ' ' || a.last_name"),
+    ("%s", "?"),
+)
+
+
+class FakeCursor:
+    """ Курсор в стиле pymysql поверх SQLite. """
+    def __init__(self, db):
+        self.cursor = db.cursor()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params=()):
+        for mysql, sqlite in MYSQL_TO_SQLITE:
+            sql = sql.replace(mysql, sqlite)
+        self.cursor.execute(sql, list(params))
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+
+class FakeConnection:
+    """ Подключение к «MySQL» — база Sakila в памяти SQLite. """
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def rollback(self):
+        pass
+
+
+class _BitXor:
+    def __init__(self):
+        self.value = 0
+
+    def step(self, value):
+        self.value ^= value or 0
+
+    def finalize(self):
+        return self.value
+
+
+def _sakila_db():
+    """ Небольшая база Sakila (таблицы поиска) со случайными, но воспроизводимыми данными. """
+    db = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    db.executescript("""
+        CREATE TABLE category (category_id INTEGER PRIMARY KEY, name TEXT, last_update TIMESTAMP);
+        CREATE TABLE film (film_id INTEGER PRIMARY KEY, title TEXT, description TEXT, release_year INT,
+                           rating TEXT, length INT, last_update TIMESTAMP);
+        CREATE TABLE actor (actor_id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, last_update TIMESTAMP);
+        CREATE TABLE film_category (film_id INT, category_id INT, last_update TIMESTAMP,
+                                    PRIMARY KEY (film_id, category_id));
+        CREATE TABLE film_actor (actor_id INT, film_id INT, last_update TIMESTAMP, PRIMARY KEY (actor_id, film_id));
+    """)
+    db.create_function("CRC32", 1, lambda value: zlib.crc32(str(value).encode()))
+    db.create_function("CONCAT_WS", -1, lambda sep, *values: sep.join(str(v) for v in values if v is not None))
+    db.create_aggregate("BIT_XOR", 1, _BitXor)
+    rnd = random.Random(1)
+    for category_id, name in enumerate(GENRES, 1):
+        db.execute("INSERT INTO category VALUES (?, ?, ?);", (category_id, name, T0))
+    for film_id in range(1, 151):
+        year = None if film_id % 37 == 0 else rnd.randint(2000, 2010)
+        db.execute("INSERT INTO film VALUES (?, ?, ?, ?, ?, ?, ?);",
+                   (film_id, " ".join(rnd.sample(WORDS, 2)), " ".join(rnd.sample(WORDS, 3)).lower(),
+                    year, rnd.choice(("G", "PG", "R")), rnd.randint(50, 180), T0))
+        db.execute("INSERT INTO film_category VALUES (?, ?, ?);", (film_id, rnd.randint(1, len(GENRES)), T0))
+    for actor_id in range(1, 31):
+        db.execute("INSERT INTO actor VALUES (?, ?, ?, ?);",
+                   (actor_id, rnd.choice(("PENELOPE", "NICK", "ED")), f"CHASE{actor_id}", T0))
+    for film_id in range(1, 151):
+        for actor_id in rnd.sample(range(1, 31), 3):
+            db.execute("INSERT INTO film_actor VALUES (?, ?, ?);", (actor_id, film_id, T0))
+    return db
+
+
+@pytest.fixture
+def sakila(monkeypatch):
+    """
+    Подключение к базе Sakila в памяти. Кэши результатов и счётчиков выключены, фоновая сверка
+    версий данных не запускается (версии обновляет сверка fresh=True при построении бэкендов
+    или явный вызов mysql_connector._probe_data_versions).
+    """
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_SIZE", 0)
+    monkeypatch.setattr(mysql_connector, "COUNT_CACHE_TTL", 0)
+    monkeypatch.setattr(mysql_connector, "_refresh_data_versions", lambda: None)
+    monkeypatch.setattr(mysql_connector, "_data_version", {"tables": None, "measured_at": None, "refresher": None})
+    yield FakeConnection(_sakila_db())
+    mysql_connector.set_search_backend()
+
+
+@pytest.fixture
+def all_pages():
+    """ Функция, читающая все страницы поиска через выбранный бэкенд. """
+    return _all_pages
+
+
+def _all_pages(search, connection, backend, *args, page_size=7):
+    """ Все страницы поиска через бэкенд (пустой кортеж — MySQL): (строки, токены, общее число совпадений). """
+    mysql_connector.set_search_backend(*backend)
+    try:
+        rows, tokens, total, token = [], [], None, None
+        while True:
+            page = search(connection, *args, token, page_size, with_total=token is None)
+            if token is None:
+                total = page[2]
+            rows += [tuple(row) for row in page[0]]
+            token = page[1]
+            tokens.append(token)
+            if token is None:
+                return rows, tokens, total
+    finally:
+        mysql_connector.set_search_backend()
@@ -0,0 +1,99 @@
+# ● test_batch.py — пакетный режим: разбор описаний запросов и ошибки отдельных запросов (без MySQL)
+
+import io
+import json
+
+import pytest
+
+import batch
+from batch import parse_spec, run_batch, write_jsonl
+
+
+@pytest.fixture
+def search(monkeypatch):
+    """
+    Подменённый поиск: with_connection отдаёт страницы из словаря {параметр: строки}
+    по две строки на страницу; журнал запросов и ошибок отключён.
+    """
+    results = {}
+
+    def with_connection(func, *args, **kwargs):
+        rows = results[args[0]]
+        start = int(args[-2] or 0)                  # токен страницы — номер первой строки
+        page = rows[start:start + 2]
+        token = str(start + 2) if start + 2 < len(rows) else None
+        return (page, token, len(rows)) if kwargs.get("with_total") else (page, token)
+
+    monkeypatch.setattr(batch, "with_connection", with_connection)
+    monkeypatch.setattr(batch, "log_search", lambda *args: None)
+    monkeypatch.setattr(batch, "log_error", lambda *args: None)
+    return results
+
+
+def test_parse_spec_returns_parameters_in_order():
+    assert parse_spec('{"type": "keyword", "keyword": "ace"}') == ("keyword", {"keyword": "ace"}, 10)
+    assert parse_spec('{"type": "genre_year", "genre": "Drama", "year_start": "2005", "year_end": 2006, '
+                      '"limit": 0}') == ("genre_year", {"genre": "Drama", "year_start": 2005, "year_end": 2006}, 0)
+
+
+def test_parse_spec_normalizes_filters():
+    query_type, parameters, _ = parse_spec('{"type": "filters", "rating": "pg", "year_start": "2005"}')
+    assert (query_type, parameters) == ("filters", {"rating": "PG", "year_start": 2005})
+
+
+@pytest.mark.parametrize("line", [
+    '["keyword", "ace"]',                                       # не объект
+    '{"type": "title", "keyword": "ace"}',                      # неизвестный тип
+    '{"type": "keyword"}',                                      # нет параметра
+    '{"type": "keyword", "keyword": ""}',
+    '{"type": "actor", "actor_name": 123}',                     # число вместо строки
+    '{"type": "keyword", "keyword": ["ace"]}',
+    '{"type": "filters", "actor": 5}',
+    '{"type": "filters"}',                                      # ни одного фильтра
+    '{"type": "filters", "nope": "x"}',
+    '{"type": "genre_year", "genre": "Drama", "year_start": "two", "year_end": 2006}',
+    '{"type": "keyword", "keyword": "ace", "limit": -1}',
+])
+def test_parse_spec_rejects_invalid_specs(line):
+    with pytest.raises(ValueError):
+        parse_spec(line)
+
+
+def test_bad_spec_is_an_error_of_its_own_query(search):
+    search["ace"] = [(1, "ACE", 2006, "PG", 90)]
+    lines = ['{"type": "actor", "actor_name": 123}', "not json", '{"type": "keyword", "keyword": "ace"}']
+    results = [(r["index"], r["error"], list(r["rows"])) for r in run_batch(lines, workers=2)]
+    assert [index for index, _, _ in results] == [0, 1, 2]
+    assert results[0][1] and results[1][1]
+    assert results[2] == (2, None, [{"film_id": 1, "title": "ACE", "release_year": 2006,
+                                     "rating": "PG", "length": 90}])
+
+
+def test_search_exception_does_not_abort_batch(search, monkeypatch):
+    def with_connection(func, *args, **kwargs):
+        if args[0] == "boom":
+            raise AttributeError("'int' object has no attribute 'strip'")
+        return [], None, 0
+
+    monkeypatch.setattr(batch, "with_connection", with_connection)
+    lines = ['{"type": "keyword", "keyword": "boom"}', '{"type": "keyword", "keyword": "ace"}']
+    results = list(run_batch(lines, workers=2))
+    assert "strip" in results[0]["error"]
+    assert results[1]["error"] is None and results[1]["total"] == 0
+
+
+def test_limit_reads_following_pages(search):
+    search["ace"] = [(i, f"ACE {i}", 2006, "PG", 90) for i in range(5)]
+    lines = ['{"type": "keyword", "keyword": "ace", "limit": 0}', '{"type": "keyword", "keyword": "ace", "limit": 3}']
+    results = [(r["total"], [row["film_id"] for row in r["rows"]]) for r in run_batch(lines)]
+    assert results == [(5, [0, 1, 2, 3, 4]), (5, [0, 1, 2])]
+
+
+def test_jsonl_output_is_one_object_per_query(search):
+    search["ace"] = [(1, "ACE", 2006, "PG", 90)]
+    out = io.StringIO()
+    lines = ['{"type": "keyword", "keyword": "ace"}', '{"type": "keyword"}']
+    assert len(list(write_jsonl(run_batch(lines), out))) == 2
+    first, second = (json.loads(line) for line in out.getvalue().splitlines())
+    assert (first["total"], len(first["rows"]), first["error"]) == (1, 1, None)
+    assert second["rows"] == [] and second["error"]
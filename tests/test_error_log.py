@@ -0,0 +1,119 @@
+# ● test_error_log.py — отпечатки ошибок, свёртка повторов и ограничение частоты записи (без MongoDB)
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import log_writer
+from log_writer import error_fingerprint, log_error, flush_logs
+
+
+class FakeErrors:
+    """ Коллекция ошибок в памяти: применяет upsert-операции _upsert_errors. """
+    def __init__(self):
+        self.docs = {}
+        self.writes = 0
+
+    def bulk_write(self, operations, ordered=True):
+        self.writes += 1
+        for operation in operations:
+            update = operation._doc
+            doc = self.docs.setdefault(operation._filter["_id"], {"_id": operation._filter["_id"]})
+            for field, value in update["$setOnInsert"].items():
+                doc.setdefault(field, value)
+            for field, value in update["$inc"].items():
+                doc[field] = doc.get(field, 0) + value
+            for field, value in update["$min"].items():
+                doc[field] = min(doc.get(field, value), value)
+            for field, value in update["$max"].items():
+                doc[field] = max(doc.get(field, value), value)
+
+    def total(self):
+        return sum(doc["count"] for doc in self.docs.values())
+
+
+class Clock:
+    """ Управляемые часы: time.monotonic() и datetime.now() модуля log_writer. """
+    def __init__(self):
+        self.seconds = 1000.0
+        self.start = datetime(2024, 1, 1, 12, 0, 0)
+
+    def monotonic(self):
+        return self.seconds
+
+    def now(self):
+        return self.start + timedelta(seconds=self.seconds - 1000.0)
+
+    def advance(self, seconds):
+        self.seconds += seconds
+
+
+@pytest.fixture
+def errors(monkeypatch):
+    """ Синхронная запись (LOG_ASYNC=0) в коллекцию в памяти с управляемыми часами. """
+    collection = FakeErrors()
+    clock = Clock()
+    monkeypatch.setattr(log_writer, "LOG_ASYNC", False)
+    monkeypatch.setattr(log_writer, "LOG_ERROR_MIN_INTERVAL", 5)
+    monkeypatch.setattr(log_writer, "LOG_ERROR_WINDOW_SECONDS", 300)
+    monkeypatch.setattr(log_writer, "get_collection", lambda name: collection)
+    monkeypatch.setattr(log_writer, "time", clock)
+    monkeypatch.setattr(log_writer, "datetime", clock)
+    monkeypatch.setattr(log_writer, "_errors", {})
+    monkeypatch.setattr(log_writer, "_stats", dict.fromkeys(log_writer._stats, 0))
+    collection.clock = clock
+    return collection
+
+
+def test_fingerprint_ignores_numbers_addresses_and_case():
+    first = error_fingerprint("connect_db", "(2003, \"Can't connect to MySQL server on 'db:3306' (111)\")")
+    second = error_fingerprint("connect_db", "(2003, \"can't connect to MySQL server on 'db:3307'  (110)\")")
+    assert first == second
+    assert error_fingerprint("x", "<object at 0x7f3a2c>") == error_fingerprint("x", "<object at 0x1b00>")
+
+
+def test_fingerprint_depends_on_source():
+    assert error_fingerprint("connect_db", "timeout") != error_fingerprint("get_snapshot", "timeout")
+
+
+def test_first_error_is_written_and_repeats_are_held(errors):
+    for attempt in range(5):
+        log_error("connect_db", f"timeout after {attempt} ms")
+    assert errors.writes == 1
+    assert errors.total() == 1
+    assert log_writer.get_log_writer_stats()["errors_collapsed"] == 4
+
+
+def test_held_repeats_are_written_after_interval(errors):
+    for _ in range(5):
+        log_error("connect_db", "timeout")
+    errors.clock.advance(6)
+    log_error("connect_db", "timeout")
+    assert errors.total() == 6
+    assert len(errors.docs) == 1                    # один документ на окно
+    doc = next(iter(errors.docs.values()))
+    assert doc["last_seen"] > doc["first_seen"]
+
+
+def test_any_error_releases_due_repeats_of_others(errors):
+    for _ in range(3):
+        log_error("connect_db", "timeout")
+    errors.clock.advance(6)
+    log_error("get_snapshot", "disk full")
+    assert errors.total() == 4                      # 3 connect_db + 1 get_snapshot
+
+
+def test_new_window_starts_new_document(errors):
+    log_error("connect_db", "timeout")
+    errors.clock.advance(301)
+    log_error("connect_db", "timeout")
+    assert len(errors.docs) == 2
+    assert errors.total() == 2
+
+
+def test_flush_writes_held_repeats(errors):
+    for _ in range(4):
+        log_error("connect_db", "timeout")
+    assert errors.total() == 1
+    flush_logs()
+    assert errors.total() == 4
@@ -0,0 +1,75 @@
+# ● test_formatter.py — потоковый вывод таблиц render_table (рамка в стиле PrettyTable)
+
+import io
+
+import formatter
+from formatter import render_table, compute_widths
+
+COLUMNS = [("Title", "l"), ("Year", "r"), ("Desc", "l", 10)]
+ROWS = [("ACE", 2006, "a very long text"), ("BOAT", None, "x")]
+
+
+class _Writes(io.StringIO):
+    """ Поток, запоминающий каждую запись. """
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+def test_layout_matches_prettytable_style():
+    out = io.StringIO()
+    count, written = render_table(COLUMNS, ROWS, out=out, color=None)
+    assert out.getvalue() == (
+        "+-------+------+------------+\n"
+        "| Title | Year | Desc       |\n"
+        "+-------+------+------------+\n"
+        "| ACE   | 2006 | a very     |\n"
+        "|       |      | long text  |\n"
+        "| BOAT  | None | x          |\n"
+        "+-------+------+------------+\n")
+    assert (count, written) == (2, len(out.getvalue()))
+
+
+def test_empty_table_prints_empty_line():
+    out = io.StringIO()
+    assert render_table(COLUMNS, [], out=out) == (0, 1)
+    assert out.getvalue() == "\n"
+
+
+def test_fixed_widths_stream_rows_from_generator():
+    expected = io.StringIO()
+    render_table(COLUMNS, ROWS, out=expected)
+    widths = compute_widths(COLUMNS, [[str(value) for value in row] for row in ROWS])
+    out = io.StringIO()
+    assert render_table(COLUMNS, (row for row in ROWS), out=out, widths=widths)[0] == 2
+    assert out.getvalue() == expected.getvalue()
+
+
+def test_output_is_written_in_chunks():
+    out = _Writes()
+    rows = [(f"film {i}", 2000 + i, "") for i in range(5)]
+    render_table(COLUMNS, rows, out=out, chunk_rows=2)
+    assert len(out.writes) == 3                     # 2 + 2 строки, затем остаток с нижней рамкой
+    assert out.writes[0].startswith("+-")
+    assert out.writes[-1].endswith("-+\n")
+
+
+def test_wide_characters_are_aligned_by_display_width():
+    out = io.StringIO()
+    render_table([("Name", "l")], [("映画",), ("abcde",)], out=out)
+    lines = out.getvalue().splitlines()
+    assert lines[3] == "| 映画  |"
+    assert lines[4] == "| abcde |"
+
+
+def test_color_prefix_is_repeated_per_write_and_not_counted(monkeypatch):
+    monkeypatch.setattr(formatter, "COLOR_OUTPUT", True)
+    out = _Writes()
+    rows = [(f"film {i}", 2000 + i, "") for i in range(3)]
+    _, written = render_table(COLUMNS, rows, out=out, color="\033[33m", chunk_rows=2)
+    assert all(text.startswith("\033[33m") for text in out.writes)
+    assert written == len(out.getvalue()) - len("\033[33m") * len(out.writes)
@@ -0,0 +1,87 @@
+# ● test_genre_index.py — битовый индекс жанров: те же страницы, что у MySQL, и обновление по film_category
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import genre_index
+import mysql_connector
+from mysql_connector import search_films_by_genre_and_years_page, search_films_filtered_page
+
+UPDATED = datetime(2024, 1, 2)          # позже last_update данных базы в памяти (conftest.T0)
+
+FILTERS = [
+    {"genre": "Drama"},
+    {"genre": "Comedy", "year_start": 2003, "year_end": 2007},
+    {"year_start": 2005},
+    {"year_end": 2002, "rating": "PG"},
+    {"genre": "Horror", "rating": "R"},
+    {"rating": "G"},
+]
+
+
+@pytest.fixture
+def bitmap(sakila, monkeypatch):
+    """ Пустой индекс (строится при первом запросе) и подключение к базе в памяти. """
+    monkeypatch.setattr(genre_index, "_index", None)
+    return sakila
+
+
+def _same_pages(connection, all_pages):
+    """ Сравнивает страницы MySQL и битового индекса для всех проверочных запросов. """
+    for genre, year_start, year_end in [("Drama", 2000, 2010), ("Action", 2003, 2005), ("Nope", 2000, 2010),
+                                        ("Comedy", 2008, 2004)]:
+        args = (genre, year_start, year_end)
+        assert (all_pages(search_films_by_genre_and_years_page, connection, ("bitmap",), *args)
+                == all_pages(search_films_by_genre_and_years_page, connection, (), *args))
+    for filters in FILTERS:
+        assert (all_pages(search_films_filtered_page, connection, ("bitmap",), filters)
+                == all_pages(search_films_filtered_page, connection, (), filters))
+
+
+def test_pages_match_mysql(bitmap, all_pages):
+    _same_pages(bitmap, all_pages)
+    assert genre_index._index is not None           # ответил индекс, а не MySQL
+
+
+def test_film_category_change_updates_only_genres(bitmap, all_pages, monkeypatch):
+    genre_index.get_genre_index(bitmap)
+    films = genre_index._index["films"]
+    bitmap.db.execute("UPDATE film_category SET category_id = category_id % 5 + 1, last_update = ? "
+                      "WHERE film_id IN (10, 11, 12);", (UPDATED,))
+    bitmap.db.execute("INSERT INTO film_category VALUES (13, 1, ?);", (UPDATED,))
+    mysql_connector._probe_data_versions(bitmap)
+    monkeypatch.setattr(genre_index, "CHECK_SECONDS", 0)
+    _same_pages(bitmap, all_pages)
+    assert genre_index._index["films"] is films     # каталог фильмов не перечитывался
+
+
+def test_film_change_rebuilds_index(bitmap, all_pages, monkeypatch):
+    genre_index.get_genre_index(bitmap)
+    films = genre_index._index["films"]
+    bitmap.db.execute("UPDATE film SET title = 'AAA', last_update = ? WHERE film_id = 20;",
+                      (UPDATED,))
+    mysql_connector._probe_data_versions(bitmap)
+    monkeypatch.setattr(genre_index, "CHECK_SECONDS", 0)
+    _same_pages(bitmap, all_pages)
+    assert genre_index._index["films"] is not films
+
+
+def test_concurrent_first_calls_build_once(bitmap, monkeypatch):
+    loads = []
+    load = genre_index.load_genre_index
+
+    def slow_load(connection):
+        loads.append(1)
+        time.sleep(0.1)
+        return load(connection)
+
+    monkeypatch.setattr(genre_index, "load_genre_index", slow_load)
+    threads = [threading.Thread(target=genre_index.get_genre_index, args=(bitmap,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
@@ -0,0 +1,75 @@
+# ● test_pagination.py — токены keyset-пагинации, отделение страницы и проверка размера страницы
+
+import pytest
+
+from mysql_connector import (
+    encode_page_token,
+    decode_page_token,
+    check_page_size,
+    year_key,
+    NULL_YEAR,
+    PAGE_KEY_SIZES,
+    _split_page,
+    search_films_by_keyword_page )
+
+
+def test_token_round_trip():
+    key = ["ÁCE GOLDFINGER", 2006, 17]
+    token = encode_page_token("genre_year", key)
+    assert decode_page_token("genre_year", token, PAGE_KEY_SIZES["genre_year"]) == key
+
+
+def test_first_page_has_no_token():
+    assert decode_page_token("keyword", None, 2) is None
+
+
+@pytest.mark.parametrize("token", ["not base64!", "bm90IGpzb24=", encode_page_token("keyword", ["A", 1])[:-4]])
+def test_malformed_token_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_page_token("keyword", token, 2)
+
+
+def test_token_of_other_query_type_is_rejected():
+    token = encode_page_token("description", ["a", 1])
+    with pytest.raises(ValueError):
+        decode_page_token("keyword", token, 2)
+
+
+def test_token_with_wrong_key_size_is_rejected():
+    token = encode_page_token("actor", [2006, "A", 1])
+    with pytest.raises(ValueError):
+        decode_page_token("actor", token, PAGE_KEY_SIZES["actor"])
+
+
+def test_split_page_without_extra_row():
+    rows = [("A", 1), ("B", 2)]
+    assert _split_page("keyword", rows, lambda r: (r[0], r[1]), 2) == (rows, None)
+
+
+def test_split_page_returns_token_of_last_row():
+    rows = [("A", 1), ("B", 2), ("C", 3)]
+    page, token = _split_page("keyword", rows, lambda r: (r[0], r[1]), 2)
+    assert page == rows[:2]
+    assert decode_page_token("keyword", token, 2) == ["B", 2]
+
+
+@pytest.mark.parametrize("page_size", [0, -1, "0"])
+def test_page_size_below_one_is_rejected(page_size):
+    with pytest.raises(ValueError):
+        check_page_size(page_size)
+
+
+def test_page_size_is_converted_to_int():
+    assert check_page_size("5") == 5
+
+
+def test_paged_search_validates_page_size_before_querying():
+    # connection=None: до MySQL и бэкендов дело не доходит
+    with pytest.raises(ValueError):
+        search_films_by_keyword_page(None, "ace", None, 0)
+
+
+def test_null_year_sorts_below_every_year():
+    years = [2006, None, 1990]
+    assert sorted(years, key=year_key, reverse=True) == [2006, 1990, None]
+    assert year_key(None) == NULL_YEAR
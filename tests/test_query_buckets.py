@@ -0,0 +1,137 @@
+# ● test_query_buckets.py — интервалы объёма запросов: границы и дозаполнение с последнего интервала (без MongoDB)
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import log_stats
+from log_stats import bucket_start, update_query_buckets, get_query_volume
+from mongo_connector import QUERIES_COLLECTION, QUERY_BUCKETS_COLLECTION
+
+
+class FakeQueries:
+    """ Журнал запросов в памяти: выполняет $match по timestamp и $group update_query_buckets. """
+    def __init__(self):
+        self.docs = []
+        self.matches = []
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        match = pipeline[0]["$match"]
+        unit = pipeline[1]["$group"]["_id"]["start"]["$dateTrunc"]["unit"]
+        self.matches.append(match)
+        since = match.get("timestamp", {}).get("$gte")
+        groups = {}
+        for doc in self.docs:
+            if since is not None and doc["timestamp"] < since:
+                continue
+            key = (bucket_start(doc["timestamp"], unit), doc["query_type"])
+            group = groups.setdefault(key, {"count": 0, "zero_results": 0, "result_sum": 0})
+            group["count"] += 1
+            group["zero_results"] += doc["result_count"] == 0
+            group["result_sum"] += doc["result_count"]
+        return [{"_id": {"start": start, "query_type": query_type}, **group}
+                for (start, query_type), group in groups.items()]
+
+
+class FakeCursor(list):
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            super().sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+
+class FakeBuckets:
+    """ Коллекция интервалов в памяти: upsert по (unit, start, query_type). """
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query, projection=None, sort=None):
+        docs = self.find(query).sort(sort)
+        return docs[0] if docs else None
+
+    def find(self, query):
+        def matches(doc):
+            return all(doc[field] >= value["$gte"] if isinstance(value, dict) else doc[field] == value
+                       for field, value in query.items())
+        return FakeCursor(doc for doc in self.docs.values() if matches(doc))
+
+    def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            key = tuple(operation._filter[field] for field in ("unit", "start", "query_type"))
+            self.docs.setdefault(key, dict(operation._filter)).update(operation._doc["$set"])
+
+
+@pytest.fixture
+def journal(monkeypatch):
+    queries, buckets = FakeQueries(), FakeBuckets()
+    collections = {QUERIES_COLLECTION: queries, QUERY_BUCKETS_COLLECTION: buckets}
+    monkeypatch.setattr(log_stats, "get_collection", lambda name: collections[name])
+    monkeypatch.setattr(log_stats, "QUERY_BUCKETS_LATE_SECONDS", 60)
+    return queries, buckets
+
+
+def _log(queries, timestamp, query_type="keyword", result_count=5):
+    queries.docs.append({"timestamp": timestamp, "query_type": query_type, "result_count": result_count})
+
+
+def test_bucket_start_truncates_to_unit():
+    moment = datetime(2024, 3, 5, 14, 37, 21, 500)
+    assert bucket_start(moment, "minute") == datetime(2024, 3, 5, 14, 37)
+    assert bucket_start(moment, "hour") == datetime(2024, 3, 5, 14)
+    assert bucket_start(moment, "day") == datetime(2024, 3, 5)
+
+
+def test_unknown_unit_is_rejected(journal):
+    with pytest.raises(ValueError):
+        update_query_buckets("week")
+
+
+def test_first_run_reads_whole_journal(journal):
+    queries, buckets = journal
+    _log(queries, datetime(2024, 1, 1, 10, 5))
+    _log(queries, datetime(2024, 1, 1, 10, 50), result_count=0)
+    _log(queries, datetime(2024, 1, 1, 11, 59, 30), "actor")
+    now = datetime(2024, 1, 1, 12, 0, 10)
+    assert update_query_buckets("hour", now) == 2
+    assert queries.matches == [{}]
+    first = buckets.docs[("hour", datetime(2024, 1, 1, 10), "keyword")]
+    assert (first["count"], first["zero_results"], first["complete"]) == (2, 1, True)
+    # 11:59:30 ещё может получить запоздавшие записи (QUERY_BUCKETS_LATE_SECONDS)
+    assert buckets.docs[("hour", datetime(2024, 1, 1, 11), "actor")]["complete"] is False
+
+
+def test_next_run_resumes_from_last_bucket(journal):
+    queries, buckets = journal
+    _log(queries, datetime(2024, 1, 1, 9, 0))
+    _log(queries, datetime(2024, 1, 1, 10, 20))
+    update_query_buckets("hour", datetime(2024, 1, 1, 10, 30))
+
+    _log(queries, datetime(2024, 1, 1, 10, 40))
+    _log(queries, datetime(2024, 1, 1, 11, 10))
+    update_query_buckets("hour", datetime(2024, 1, 1, 11, 30))
+    assert queries.matches[-1] == {"timestamp": {"$gte": datetime(2024, 1, 1, 10)}}
+    counts = {key[1].hour: doc["count"] for key, doc in buckets.docs.items()}
+    assert counts == {9: 1, 10: 2, 11: 1}
+
+
+def test_late_record_within_grace_period_is_counted(journal):
+    queries, buckets = journal
+    _log(queries, datetime(2024, 1, 1, 10, 59, 50))
+    update_query_buckets("minute", datetime(2024, 1, 1, 11, 0, 30))
+    _log(queries, datetime(2024, 1, 1, 10, 59, 55))        # записан фоновым потоком позже
+    _log(queries, datetime(2024, 1, 1, 11, 0, 40))
+    update_query_buckets("minute", datetime(2024, 1, 1, 11, 0, 45))
+    assert buckets.docs[("minute", datetime(2024, 1, 1, 10, 59), "keyword")]["count"] == 2
+    assert buckets.docs[("minute", datetime(2024, 1, 1, 11, 0), "keyword")]["count"] == 1
+
+
+def test_query_volume_returns_recent_buckets_with_rates(journal):
+    queries, _ = journal
+    now = datetime(2024, 1, 3, 12)
+    _log(queries, now - timedelta(days=2), result_count=0)
+    _log(queries, now - timedelta(hours=1), result_count=0)
+    _log(queries, now - timedelta(hours=1), result_count=4)
+    rows = get_query_volume("hour", 3, now)
+    assert [(row["start"], row["count"]) for row in rows] == [(datetime(2024, 1, 3, 11), 2)]
+    assert rows[0]["zero_rate"] == 0.5
+    assert rows[0]["avg_result_count"] == 2
@@ -0,0 +1,94 @@
+# ● test_result_cache.py — ключи и сброс кэша страниц результатов по версии данных (без MySQL)
+
+from datetime import datetime
+
+import pytest
+
+import mysql_connector
+import result_cache
+from mysql_connector import DATA_VERSION_TABLES, search_films_by_keyword_page
+
+CONNECTION = object()       # подключение не используется: версия данных подменяется
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    """ Пустой кэш и подменённая сверка версии данных; возвращает изменяемый словарь версий. """
+    current = {table: (datetime(2024, 1, 1), 100) for table in DATA_VERSION_TABLES}
+    monkeypatch.setattr(result_cache, "get_data_versions", lambda connection: dict(current))
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_SIZE", 10)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_DISK", "")
+    monkeypatch.setattr(result_cache, "_cache", {})
+    monkeypatch.setattr(result_cache, "_state", {"bytes": 0, "version": None, "disk": None, "disk_writes": 0})
+    monkeypatch.setattr(result_cache, "_stats", dict.fromkeys(result_cache._stats, 0))
+    return current
+
+
+def _key(*args, **kwargs):
+    return result_cache.result_key(search_films_by_keyword_page, (CONNECTION, *args), kwargs)
+
+
+def test_key_normalizes_parameters_and_defaults(versions):
+    assert _key("ace") == _key("ACE", None, mysql_connector.PAGE_SIZE)     # сопоставление _ci
+    assert _key("ace") != _key("ace ")                                      # другой шаблон LIKE
+    assert _key("ace") != _key("ace", with_total=True)
+    assert _key("ace") != _key("ace", "token")
+
+
+def test_page_is_served_until_data_changes(versions):
+    key = _key("ace")
+    result, version = result_cache.get_result(key, CONNECTION)
+    assert result is None
+    result_cache.put_result(key, ([("ACE", 1)], None), version)
+    assert result_cache.get_result(key, CONNECTION)[0] == ([("ACE", 1)], None)
+
+    versions["film"] = (datetime(2024, 1, 2), 100)
+    assert result_cache.get_result(key, CONNECTION)[0] is None
+    assert result_cache.get_result_cache_stats()["invalidations"] == 1
+
+
+def test_delete_changes_version_through_row_count(versions):
+    key = _key("ace")
+    _, version = result_cache.get_result(key, CONNECTION)
+    result_cache.put_result(key, ([("ACE", 1)], None), version)
+    versions["film_actor"] = (versions["film_actor"][0], 99)       # MAX(last_update) прежний
+    assert result_cache.get_result(key, CONNECTION)[0] is None
+
+
+def test_page_of_outdated_version_is_not_stored(versions):
+    key = _key("ace")
+    _, version = result_cache.get_result(key, CONNECTION)
+    versions["category"] = (datetime(2024, 1, 2), 16)
+    result_cache.get_result(_key("boat"), CONNECTION)               # сверка увидела новую версию
+    result_cache.put_result(key, ([("ACE", 1)], None), version)     # запрос выполнялся по старым данным
+    assert result_cache.get_result(key, CONNECTION)[0] is None
+
+
+def test_without_mysql_nothing_is_stored(versions):
+    key = _key("ace")
+    result, version = result_cache.get_result(key, None)
+    assert version is None
+    result_cache.put_result(key, ([("ACE", 1)], None), version)
+    assert result_cache.get_result(key, CONNECTION)[0] is None
+
+
+def test_disk_pages_of_other_versions_are_dropped(versions, monkeypatch, tmp_path):
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_DISK", str(tmp_path / "cache.db"))
+    key = _key("ace")
+    _, version = result_cache.get_result(key, CONNECTION)
+    result_cache.put_result(key, ([("ACE", 1)], None), version)
+    result_cache.clear_result_cache()                               # только память
+    assert result_cache.get_result(key, CONNECTION)[0] == ([("ACE", 1)], None)
+
+    versions["film"] = (datetime(2024, 1, 2), 100)
+    assert result_cache.get_result(key, CONNECTION)[0] is None
+    assert result_cache.get_result_cache_stats()["disk_entries"] == 0
+    result_cache._state["disk"].close()
+
+
+def test_backend_answers_are_not_cached(versions, monkeypatch):
+    answers = iter([(([("FROM BACKEND", 1)], None), "snapshot"), (([("FROM MYSQL", 1)], None), "mysql")])
+    monkeypatch.setattr(mysql_connector, "_dispatch", lambda func, args, kwargs: next(answers))
+    assert search_films_by_keyword_page(CONNECTION, "ace")[0] == [("FROM BACKEND", 1)]
+    assert search_films_by_keyword_page(CONNECTION, "ace")[0] == [("FROM MYSQL", 1)]
+    assert search_films_by_keyword_page(CONNECTION, "ace")[0] == [("FROM MYSQL", 1)]     # из кэша
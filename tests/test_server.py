@@ -0,0 +1,104 @@
+# ● test_server.py — HTTP-сервис: коды ответов для некорректных параметров и перегрузки (без MySQL)
+
+import json
+import threading
+import urllib.request
+from urllib.error import HTTPError
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import server
+from mysql_connector import encode_page_token
+
+
+def _no_database(*args, **kwargs):
+    raise AssertionError("запрос не должен доходить до MySQL")
+
+
+@pytest.fixture
+def base_url(monkeypatch):
+    """ Сервер на свободном порту; MySQL и журнал запросов подменены. """
+    monkeypatch.setattr(server, "with_connection", _no_database)
+    monkeypatch.setattr(server, "log_search", lambda *args: None)
+    monkeypatch.setattr(server, "log_error", lambda *args: None)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.SearchRequestHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _get(url):
+    """ GET-запрос: (код ответа, JSON). """
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.mark.parametrize("token", ["garbage", encode_page_token("actor", [2006, "A", 1, 2]),
+                                   encode_page_token("keyword", ["A"])])
+def test_bad_page_token_is_rejected_before_search(token):
+    with pytest.raises(server.BadRequest):
+        server.ROUTES["/films/keyword"]({"keyword": ["ace"], "page_token": [token]})
+
+
+def test_bad_page_token_returns_400(base_url):
+    status, body = _get(f"{base_url}/films/keyword?keyword=ace&page_token=garbage")
+    assert status == 400
+    assert "error" in body
+
+
+@pytest.mark.parametrize("query", ["keyword=ace&page_size=0", "keyword=ace&page_size=abc", "page_size=5"])
+def test_bad_parameters_return_400(base_url, query):
+    assert _get(f"{base_url}/films/keyword?{query}")[0] == 400
+
+
+def test_first_page_returns_rows_token_and_total(base_url, monkeypatch):
+    token = encode_page_token("keyword", ["ACE", 1])
+    monkeypatch.setattr(server, "with_connection",
+                        lambda func, *args, **kwargs: ([(1, "ACE", 2006, "PG", 90)], token, 7))
+    status, body = _get(f"{base_url}/films/keyword?keyword=ace&page_size=1")
+    assert status == 200
+    assert body == {"rows": [{"film_id": 1, "title": "ACE", "release_year": 2006, "rating": "PG", "length": 90}],
+                    "next_page_token": token, "total": 7}
+
+
+def test_search_error_returns_503(base_url, monkeypatch):
+    monkeypatch.setattr(server, "with_connection", lambda func, *args, **kwargs: None)
+    assert _get(f"{base_url}/films/keyword?keyword=ace")[0] == 503
+
+
+def test_saturated_server_returns_503(base_url, monkeypatch):
+    monkeypatch.setattr(server, "_slots", threading.BoundedSemaphore(1))
+    server._slots.acquire()                         # все места заняты
+    status, body = _get(f"{base_url}/films/keyword?keyword=ace")
+    assert status == 503
+    assert "перегружен" in body["error"]
+
+
+def test_unknown_path_returns_404(base_url):
+    assert _get(f"{base_url}/nope")[0] == 404
+
+
+def test_timed_out_query_is_killed(base_url, monkeypatch):
+    release = threading.Event()
+    killed = []
+
+    def slow_search(func, *args, **kwargs):
+        release.wait(5)
+        return [], None, 0
+
+    def kill(ident):
+        killed.append(ident)
+        release.set()
+        return True
+
+    monkeypatch.setattr(server, "REQUEST_TIMEOUT", 0.2)
+    monkeypatch.setattr(server, "with_connection", slow_search)
+    monkeypatch.setattr(server, "kill_query", kill)
+    assert _get(f"{base_url}/films/keyword?keyword=ace")[0] == 504
+    assert killed and killed[0] is not None          # поток пула, выполнявший запрос
@@ -0,0 +1,98 @@
+# ● test_snapshot.py — локальный снимок SQLite: те же страницы, что у MySQL, и обновление по водяным знакам
+
+from datetime import datetime
+
+import pytest
+
+import snapshot
+from mysql_connector import (search_films_by_keyword_page, search_films_by_description_page,
+                             search_films_by_genre_and_years_page, search_films_by_actor_page)
+
+UPDATED = datetime(2024, 1, 2)          # позже last_update данных базы в памяти (conftest.T0)
+OLD = datetime(2023, 1, 1)              # раньше водяного знака: такую строку инкрементальное обновление не видит
+
+QUERIES = [
+    (search_films_by_keyword_page, ("ac",)),
+    (search_films_by_description_page, ("dog",)),
+    (search_films_by_genre_and_years_page, ("Drama", 2002, 2008)),
+    (search_films_by_actor_page, ("nick",)),
+]
+
+
+@pytest.fixture
+def snap(sakila, monkeypatch, tmp_path):
+    """ Снимок во временном файле, построенный по базе в памяти. """
+    monkeypatch.setattr(snapshot, "SNAPSHOT_PATH", str(tmp_path / "snapshot.db"))
+    monkeypatch.setattr(snapshot, "_state", {"db": None, "synced_at": None, "checked_at": None,
+                                             "verified_at": None, "builder": None})
+    snapshot.refresh_snapshot(sakila)
+    yield sakila
+    snapshot._state["db"].close()
+
+
+def _same_pages(connection, all_pages):
+    """ Сравнивает страницы MySQL и снимка для всех проверочных запросов и размеров страниц. """
+    for search, args in QUERIES:
+        for page_size in (1, 7, 10):
+            assert (all_pages(search, connection, ("snapshot",), *args, page_size=page_size)
+                    == all_pages(search, connection, (), *args, page_size=page_size))
+
+
+def _local_keys(table):
+    key = ", ".join(snapshot.TABLES[table][1])
+    return set(snapshot._state["db"].execute(f"SELECT {key} FROM {table};").fetchall())
+
+
+def test_pages_match_mysql(snap, all_pages):
+    _same_pages(snap, all_pages)
+
+
+def test_incremental_refresh_applies_updates_inserts_and_deletes(snap, all_pages):
+    snap.db.execute("UPDATE film SET title = 'ZZZ ACE', last_update = ? WHERE film_id = 5;", (UPDATED,))
+    snap.db.execute("INSERT INTO film VALUES (999, 'ACE NEW', 'dog cat', 2005, 'G', 90, ?);", (UPDATED,))
+    snap.db.execute("INSERT INTO film_category VALUES (999, 3, ?);", (UPDATED,))
+    snap.db.execute("DELETE FROM film_actor WHERE film_id = 7;")
+    snap.db.execute("DELETE FROM film WHERE film_id = 8;")
+    assert snapshot.refresh_snapshot(snap) is not None
+    assert (999,) in _local_keys("film") and (8,) not in _local_keys("film")
+    assert not any(film_id == 7 for _, film_id in _local_keys("film_actor"))
+    _same_pages(snap, all_pages)
+
+
+def test_unchanged_tables_are_not_read(snap, monkeypatch):
+    reads = []
+    monkeypatch.setattr(snapshot, "_fetch", lambda *args: reads.append(args) or [])
+    monkeypatch.setattr(snapshot, "_source_checksum", lambda *args: reads.append(args) or 0)
+    assert set(snapshot.refresh_snapshot(snap).values()) == {0}
+    assert reads == []
+
+
+def test_verify_finds_delete_hidden_by_old_insert(snap):
+    # удаление вместе со вставкой строки со «старым» last_update: COUNT(*) и водяной знак прежние
+    removed = snap.db.execute("SELECT actor_id, film_id FROM film_actor LIMIT 1;").fetchone()
+    snap.db.execute("DELETE FROM film_actor WHERE actor_id = ? AND film_id = ?;", removed)
+    added = next((actor_id, 1) for actor_id in range(1, 31)
+                 if (actor_id, 1) not in _local_keys("film_actor"))
+    snap.db.execute("INSERT INTO film_actor VALUES (?, ?, ?);", (*added, OLD))
+    assert snapshot.refresh_snapshot(snap)["film_actor"] == 0
+
+    snapshot._state["verified_at"] = None           # пора периодической сверки ключей
+    assert snapshot.refresh_snapshot(snap)["film_actor"] == 2
+    assert _local_keys("film_actor") == set(snap.db.execute("SELECT actor_id, film_id FROM film_actor;"))
+
+
+def test_due_refresh_runs_in_background(snap, monkeypatch):
+    started = []
+    monkeypatch.setattr(snapshot, "_start_build", lambda: started.append(1))
+    monkeypatch.setattr(snapshot, "refresh_snapshot", lambda *args, **kwargs: pytest.fail("обновление в запросе"))
+    snapshot._state["checked_at"] = None
+    assert snapshot.get_snapshot(snap) is snapshot._state["db"]       # отвечает текущий снимок
+    assert started == [1]
+
+
+def test_first_build_is_not_awaited(snap, monkeypatch):
+    started = []
+    monkeypatch.setattr(snapshot, "_start_build", lambda: started.append(1))
+    snapshot._state["synced_at"] = None
+    assert snapshot.get_snapshot(snap) is None                        # запрос выполнит MySQL
+    assert started == [1]